@@ -1,99 +1,117 @@
 
 from flask import render_template, request, redirect, url_for, flash, jsonify
 from flask_login import login_required, current_user
-from werkzeug.security import generate_password_hash
 from datetime import datetime, date, timedelta
 from sqlalchemy import or_
 from app import app
 from models import (
     db, User, Department, MaintenanceCategory, MaintenanceTeam,
-    MaintenanceEquipment, MaintenanceRequest, Company, WorkCenter
+    MaintenanceEquipment, MaintenanceRequest, Company, WorkCenter, PreventiveSchedule,
+    MeterThreshold
 )
-from werkzeug.security import generate_password_hash
-from decorators import admin_required
+from decorators import admin_required, json_login_required
+from db_routing import replica_reads
+from password_utils import hash_password, pool_stats
+from cache_utils import reference_data
+from workflow_utils import search_criteria, board_query, allocate, card_data, stage_counts
 from email_utils import send_work_allocation_email, send_work_response_email, send_deadline_response_email, send_third_party_notification
 
+# List filters shared by the admin list pages and their exports
+_REQUEST_ORDER = (MaintenanceRequest.created_at.desc(),)
+
+def _equipment_filters(search_query):
+    if not search_query:
+        return []
+    return [or_(
+        MaintenanceEquipment.name.ilike(f'%{search_query}%'),
+        MaintenanceEquipment.serial_number.ilike(f'%{search_query}%'),
+        MaintenanceEquipment.location.ilike(f'%{search_query}%'),
+        MaintenanceEquipment.description.ilike(f'%{search_query}%')
+    )]
+
+def _equipment_order(sort):
+    if sort == 'risk':
+        return (MaintenanceEquipment.risk_score.desc().nullslast(), MaintenanceEquipment.name)
+    return (MaintenanceEquipment.name,)
+
 # Admin Dashboard
 @app.route('/admin/dashboard')
 @login_required
 @admin_required
+@replica_reads()
 def admin_dashboard():
     """Admin dashboard with system overview and KPIs"""
-    # Calculate Critical Equipment (health < 30%)
-    all_equipment = MaintenanceEquipment.query.filter_by(scrap=False).all()
-    critical_equipment = [eq for eq in all_equipment if eq.health_percentage < 30]
-    critical_count = len(critical_equipment)
-    
-    # Calculate Technician Utilization
-    technicians = User.query.filter(User.is_admin == False, User.is_active == True).all()
-    total_utilization = 0
-    active_technicians = 0
-    for tech in technicians:
-        if tech.is_worker:
-            util = tech.utilization_percentage
-            if util > 0:
-                total_utilization += util
-                active_technicians += 1
-    
-    avg_technician_load = round(total_utilization / active_technicians, 1) if active_technicians > 0 else 0
-    
-    # Get open and overdue requests
-    all_requests = MaintenanceRequest.query.all()
-    open_requests = [r for r in all_requests if r.stage not in ('repaired', 'scrap')]
-    overdue_requests = [r for r in open_requests if r.is_overdue]
-    
-    stats = {
-        'total_equipment': len(all_equipment),
-        'total_requests': len(all_requests),
-        'open_requests': len(open_requests),
-        'overdue_requests': len(overdue_requests),
-        'critical_equipment': critical_count,
-        'technician_load': avg_technician_load,
-        'total_workers': User.query.filter_by(is_admin=False, is_active=True).count(),
-        'total_teams': MaintenanceTeam.query.count(),
-        'total_categories': MaintenanceCategory.query.count(),
-        'total_departments': Department.query.count()
-    }
-    
-    # Activity table data (recent requests with all details)
-    recent_requests = MaintenanceRequest.query.order_by(
-        MaintenanceRequest.created_at.desc()
-    ).limit(10).all()
-    
-    return render_template('admin/dashboard.html', stats=stats, recent_requests=recent_requests)
+    # Loaded from inside the template's cached fragment, so a cache hit runs no queries
+    def load_dashboard():
+        # Calculate Critical Equipment (health < 30%)
+        all_equipment = MaintenanceEquipment.query.filter_by(scrap=False).all()
+        critical_equipment = [eq for eq in all_equipment if eq.health_percentage < 30]
+        critical_count = len(critical_equipment)
+        
+        # Calculate Technician Utilization
+        technicians = User.query.filter(User.is_admin == False, User.is_active == True).all()
+        total_utilization = 0
+        active_technicians = 0
+        for tech in technicians:
+            if tech.is_worker:
+                util = tech.utilization_percentage
+                if util > 0:
+                    total_utilization += util
+                    active_technicians += 1
+        
+        avg_technician_load = round(total_utilization / active_technicians, 1) if active_technicians > 0 else 0
+        
+        # Get open and overdue requests
+        all_requests = MaintenanceRequest.query.all()
+        open_requests = [r for r in all_requests if r.stage not in ('repaired', 'scrap')]
+        overdue_requests = [r for r in open_requests if r.is_overdue]
+        
+        stats = {
+            'total_equipment': len(all_equipment),
+            'total_requests': len(all_requests),
+            'open_requests': len(open_requests),
+            'overdue_requests': len(overdue_requests),
+            'critical_equipment': critical_count,
+            'technician_load': avg_technician_load,
+            'total_workers': User.query.filter_by(is_admin=False, is_active=True).count(),
+            'total_teams': MaintenanceTeam.query.count(),
+            'total_categories': MaintenanceCategory.query.count(),
+            'total_departments': Department.query.count()
+        }
+        
+        # Activity table data (recent requests with all details)
+        recent_requests = MaintenanceRequest.query.order_by(
+            MaintenanceRequest.created_at.desc()
+        ).limit(10).all()
+        
+        return stats, recent_requests
+    
+    return render_template('admin/dashboard.html', load_dashboard=load_dashboard)
 
 # Admin - Requests Management
 @app.route('/admin/requests')
 @login_required
 @admin_required
+@replica_reads()
 def admin_requests():
-    """Admin view of all requests with search"""
+    """Admin view of all requests with search; the cards load from api_request_board"""
     search_query = request.args.get('search', '').strip()
-    
-    # Base query
-    query = MaintenanceRequest.query
-    
-    # Apply search filter
-    if search_query:
-        query = query.join(MaintenanceEquipment).filter(
-            or_(
-                MaintenanceRequest.name.ilike(f'%{search_query}%'),
-                MaintenanceRequest.subject.ilike(f'%{search_query}%'),
-                MaintenanceRequest.request_type.ilike(f'%{search_query}%'),
-                MaintenanceEquipment.name.ilike(f'%{search_query}%'),
-                MaintenanceEquipment.serial_number.ilike(f'%{search_query}%')
-            )
-        )
-    
-    requests = query.order_by(MaintenanceRequest.created_at.desc()).all()
-    requests_by_stage = {
-        'new': [r for r in requests if r.stage == 'new'],
-        'in_progress': [r for r in requests if r.stage == 'in_progress'],
-        'repaired': [r for r in requests if r.stage == 'repaired'],
-        'scrap': [r for r in requests if r.stage == 'scrap']
-    }
     workers = User.query.filter_by(is_admin=False, is_active=True).all()
-    return render_template('admin/requests.html', requests_by_stage=requests_by_stage, workers=workers, search_query=search_query)
+    return render_template('admin/requests.html', workers=workers, search_query=search_query)
+
+@app.route('/admin/requests/export')
+@login_required
+@admin_required
+@replica_reads()
+def admin_requests_export():
+    """Stream the requests matching the list page search as CSV or XLSX"""
+    from export_utils import request_export_query, export_response, EXPORT_FORMATS
+    fmt = request.args.get('format', 'csv')
+    if fmt not in EXPORT_FORMATS:
+        flash('Unsupported export format', 'error')
+        return redirect(url_for('admin_requests'))
+    headers, rows = request_export_query(search_criteria(request.args.get('search', '').strip()), _REQUEST_ORDER)
+    return export_response(fmt, 'maintenance-requests', headers, rows, 'Requests')
 
 # Admin - Equipment Management
 @app.route('/admin/equipment')
@@ -102,23 +120,27 @@ def admin_requests():
 def admin_equipment():
     """Admin equipment management with search"""
     search_query = request.args.get('search', '').strip()
+    sort = request.args.get('sort', 'name')
     
-    # Base query
-    query = MaintenanceEquipment.query
-    
-    # Apply search filter
-    if search_query:
-        query = query.filter(
-            or_(
-                MaintenanceEquipment.name.ilike(f'%{search_query}%'),
-                MaintenanceEquipment.serial_number.ilike(f'%{search_query}%'),
-                MaintenanceEquipment.location.ilike(f'%{search_query}%'),
-                MaintenanceEquipment.description.ilike(f'%{search_query}%')
-            )
-        )
+    query = MaintenanceEquipment.query.filter(*_equipment_filters(search_query)).order_by(*_equipment_order(sort))
     
-    equipment = query.order_by(MaintenanceEquipment.name).all()
-    return render_template('equipment/list.html', equipment=equipment, search_query=search_query)
+    # The template runs the query inside its cached fragment
+    return render_template('equipment/list.html', load_equipment=query.all, search_query=search_query, sort=sort)
+
+@app.route('/admin/equipment/export')
+@login_required
+@admin_required
+@replica_reads()
+def admin_equipment_export():
+    """Stream the equipment matching the list page search and sort as CSV or XLSX"""
+    from export_utils import equipment_export_query, export_response, EXPORT_FORMATS
+    fmt = request.args.get('format', 'csv')
+    if fmt not in EXPORT_FORMATS:
+        flash('Unsupported export format', 'error')
+        return redirect(url_for('admin_equipment'))
+    headers, rows = equipment_export_query(_equipment_filters(request.args.get('search', '').strip()),
+                                           _equipment_order(request.args.get('sort', 'name')))
+    return export_response(fmt, 'equipment', headers, rows, 'Equipment')
 
 @app.route('/admin/equipment/new', methods=['GET', 'POST'])
 @login_required
@@ -162,8 +184,7 @@ def admin_equipment_delete(id):
 @admin_required
 def admin_teams():
     """Admin teams management"""
-    teams = MaintenanceTeam.query.all()
-    return render_template('admin/teams.html', teams=teams)
+    return render_template('admin/teams.html', load_teams=MaintenanceTeam.query.all)
 
 @app.route('/admin/teams/new', methods=['GET', 'POST'])
 @login_required
@@ -241,7 +262,7 @@ def admin_worker_new():
         worker = User(
             username=username.strip(),
             email=email.strip(),
-            password_hash=generate_password_hash(password),
+            password_hash=hash_password(password),
             full_name=full_name.strip() if full_name else None,
             phone=phone.strip() if phone else None,
             position=position.strip() if position else None,
@@ -257,9 +278,8 @@ def admin_worker_new():
         flash('Worker created successfully!', 'success')
         return redirect(url_for('admin_workers'))
     
-    departments = Department.query.all()
-    companies = Company.query.all()
-    return render_template('admin/worker_form.html', departments=departments, companies=companies)
+    refs = reference_data('departments', 'companies')
+    return render_template('admin/worker_form.html', **refs)
 
 @app.route('/admin/workers/<int:id>/edit', methods=['GET', 'POST'])
 @login_required
@@ -289,15 +309,14 @@ def admin_worker_edit(id):
                 pass
         
         if request.form.get('password'):
-            worker.password_hash = generate_password_hash(request.form.get('password'))
+            worker.password_hash = hash_password(request.form.get('password'))
         
         db.session.commit()
         flash('Worker updated successfully!', 'success')
         return redirect(url_for('admin_workers'))
     
-    departments = Department.query.all()
-    companies = Company.query.all()
-    return render_template('admin/worker_form.html', worker=worker, departments=departments, companies=companies)
+    refs = reference_data('departments', 'companies')
+    return render_template('admin/worker_form.html', worker=worker, **refs)
 
 @app.route('/admin/workers/<int:id>/delete', methods=['POST'])
 @login_required
@@ -429,9 +448,46 @@ def admin_company_delete(id):
 @admin_required
 def admin_work_centers():
     """Admin work centers management"""
+    from work_center_utils import latest_oee_by_work_center
     work_centers = WorkCenter.query.all()
     companies = Company.query.all()
-    return render_template('admin/work_centers.html', work_centers=work_centers, companies=companies)
+    latest_oee = latest_oee_by_work_center()
+    return render_template('admin/work_centers.html', work_centers=work_centers, companies=companies, latest_oee=latest_oee)
+
+@app.route('/admin/work-centers/refresh-costs', methods=['POST'])
+@login_required
+@admin_required
+def admin_work_center_refresh_costs():
+    """Recompute the previous and current month of the work center cost and OEE rollup"""
+    from work_center_utils import refresh_recent_work_center_rollup
+    try:
+        written = refresh_recent_work_center_rollup()
+        flash(f'Work center costs refreshed ({written} monthly rows).', 'success')
+    except Exception as e:
+        db.session.rollback()
+        app.logger.error(f"Failed to refresh work center rollup: {str(e)}")
+        flash(f'Error refreshing work center costs: {str(e)}', 'error')
+    return redirect(url_for('admin_work_centers'))
+
+@app.route('/admin/work-centers/costs')
+@login_required
+@admin_required
+@replica_reads()
+def admin_work_center_costs():
+    """Labor cost and OEE report from the rollup (JSON)"""
+    from work_center_utils import work_center_cost_report
+    try:
+        start = datetime.strptime(request.args['start'], '%Y-%m').date() if request.args.get('start') else None
+        end = datetime.strptime(request.args['end'], '%Y-%m').date() if request.args.get('end') else None
+        report = work_center_cost_report(
+            start_month=start,
+            end_month=end,
+            work_center_id=request.args.get('work_center_id', type=int),
+            group_by=request.args.get('group_by', 'month')
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'results': report})
 
 @app.route('/admin/work-centers/new', methods=['GET', 'POST'])
 @login_required
@@ -495,6 +551,203 @@ def admin_work_center_delete(id):
     flash('Work center deleted successfully!', 'success')
     return redirect(url_for('admin_work_centers'))
 
+# Admin - Preventive Maintenance Schedules
+@app.route('/admin/pm-schedules')
+@login_required
+@admin_required
+def admin_pm_schedules():
+    """Admin preventive maintenance schedules"""
+    schedules = PreventiveSchedule.query.order_by(PreventiveSchedule.name).all()
+    return render_template('admin/pm_schedules.html', schedules=schedules)
+
+@app.route('/admin/pm-schedules/new', methods=['GET', 'POST'])
+@login_required
+@admin_required
+def admin_pm_schedule_new():
+    """Create or edit preventive maintenance schedule"""
+    schedule_id = request.args.get('id')
+    schedule = None
+    if schedule_id:
+        schedule = PreventiveSchedule.query.get_or_404(schedule_id)
+    
+    if request.method == 'POST':
+        equipment_id = request.form.get('equipment_id') or None
+        category_id = request.form.get('category_id') or None
+        interval_days = int(request.form.get('interval_days')) if request.form.get('interval_days') else None
+        weekdays = ','.join(request.form.getlist('weekdays')) or None
+        
+        if not equipment_id and not category_id:
+            flash('Select an equipment or a category for the schedule', 'error')
+            return redirect(request.url)
+        if not weekdays and not (interval_days and interval_days > 0):
+            flash('Set an interval in days or pick at least one weekday', 'error')
+            return redirect(request.url)
+        
+        start_date = datetime.strptime(request.form.get('start_date'), '%Y-%m-%d').date() if request.form.get('start_date') else date.today()
+        if not schedule:
+            schedule = PreventiveSchedule()
+            db.session.add(schedule)
+        schedule.name = request.form.get('name')
+        schedule.subject = request.form.get('subject') or request.form.get('name')
+        schedule.equipment_id = equipment_id
+        schedule.category_id = None if equipment_id else category_id
+        schedule.interval_days = None if weekdays else interval_days
+        schedule.weekdays = weekdays
+        schedule.start_date = start_date
+        schedule.company_id = request.form.get('company_id') or None
+        schedule.is_active = 'is_active' in request.form
+        db.session.commit()
+        flash('Preventive schedule saved successfully!', 'success')
+        return redirect(url_for('admin_pm_schedules'))
+    
+    equipment = MaintenanceEquipment.query.filter_by(scrap=False).order_by(MaintenanceEquipment.name).all()
+    categories = MaintenanceCategory.query.all()
+    companies = Company.query.all()
+    return render_template('admin/pm_schedule_form.html', schedule=schedule, equipment=equipment,
+                         categories=categories, companies=companies)
+
+@app.route('/admin/pm-schedules/<int:id>/delete', methods=['POST'])
+@login_required
+@admin_required
+def admin_pm_schedule_delete(id):
+    """Delete preventive schedule (generated requests are kept)"""
+    schedule = PreventiveSchedule.query.get_or_404(id)
+    MaintenanceRequest.query.filter_by(pm_schedule_id=id).update({'pm_schedule_id': None})
+    db.session.delete(schedule)
+    db.session.commit()
+    flash('Preventive schedule deleted successfully!', 'success')
+    return redirect(url_for('admin_pm_schedules'))
+
+@app.route('/admin/pm-schedules/generate', methods=['POST'])
+@login_required
+@admin_required
+def admin_pm_schedules_generate():
+    """Generate upcoming preventive requests for all active schedules"""
+    from pm_scheduler import generate_preventive_requests
+    horizon_days = request.form.get('horizon_days', type=int) or 365
+    try:
+        result = generate_preventive_requests(horizon_days=horizon_days)
+        flash(f"Generated {result['created']} preventive request(s) until {result['horizon_end']} "
+              f"({result['skipped']} already scheduled).", 'success')
+    except Exception as e:
+        db.session.rollback()
+        app.logger.error(f"Failed to generate preventive requests: {str(e)}")
+        flash(f'Error generating preventive requests: {str(e)}', 'error')
+    return redirect(url_for('admin_pm_schedules'))
+
+# Admin - Meter Thresholds
+@app.route('/admin/meter-thresholds', methods=['GET', 'POST'])
+@login_required
+@admin_required
+def admin_meter_thresholds():
+    """List and create meter thresholds that trigger maintenance requests"""
+    from meter_utils import LIMIT_TYPES
+    if request.method == 'POST':
+        equipment_id = request.form.get('equipment_id') or None
+        category_id = request.form.get('category_id') or None
+        limit_type = request.form.get('limit_type')
+        meter = (request.form.get('meter') or '').strip()
+        
+        if not equipment_id and not category_id:
+            flash('Select an equipment or a category for the threshold', 'error')
+            return redirect(url_for('admin_meter_thresholds'))
+        if not meter or limit_type not in LIMIT_TYPES:
+            flash('Meter name and a valid limit type are required', 'error')
+            return redirect(url_for('admin_meter_thresholds'))
+        try:
+            limit_value = float(request.form.get('limit_value'))
+        except (TypeError, ValueError):
+            flash('Limit value must be a number', 'error')
+            return redirect(url_for('admin_meter_thresholds'))
+        if limit_type == 'usage' and limit_value <= 0:
+            flash('Usage interval must be greater than zero', 'error')
+            return redirect(url_for('admin_meter_thresholds'))
+        
+        threshold = MeterThreshold(
+            meter=meter,
+            equipment_id=equipment_id,
+            category_id=None if equipment_id else category_id,
+            limit_type=limit_type,
+            limit_value=limit_value,
+            request_type=request.form.get('request_type', 'corrective'),
+            subject=request.form.get('subject') or None,
+            is_active='is_active' in request.form
+        )
+        db.session.add(threshold)
+        db.session.commit()
+        flash('Meter threshold created successfully!', 'success')
+        return redirect(url_for('admin_meter_thresholds'))
+    
+    thresholds = MeterThreshold.query.order_by(MeterThreshold.meter).all()
+    equipment = MaintenanceEquipment.query.filter_by(scrap=False).order_by(MaintenanceEquipment.name).all()
+    categories = MaintenanceCategory.query.all()
+    return render_template('admin/meter_thresholds.html', thresholds=thresholds, equipment=equipment,
+                         categories=categories, limit_types=LIMIT_TYPES)
+
+@app.route('/admin/meter-thresholds/<int:id>/delete', methods=['POST'])
+@login_required
+@admin_required
+def admin_meter_threshold_delete(id):
+    """Delete meter threshold (requests it created are kept)"""
+    threshold = MeterThreshold.query.get_or_404(id)
+    db.session.delete(threshold)
+    db.session.commit()
+    flash('Meter threshold deleted successfully!', 'success')
+    return redirect(url_for('admin_meter_thresholds'))
+
+# Admin - Bulk Import
+@app.route('/admin/import', methods=['GET', 'POST'])
+@login_required
+@admin_required
+def admin_import():
+    """Bulk CSV import of equipment, workers or work centers with a per-row error report"""
+    import csv
+    from import_utils import run_import, IMPORTERS, MAX_REPORTED_ERRORS
+    report = None
+    kind = request.form.get('kind', 'equipment')
+    if request.method == 'POST':
+        upload = request.files.get('file')
+        dry_run = 'dry_run' in request.form
+        if not upload or not upload.filename:
+            flash('Choose a CSV file to import', 'error')
+            return redirect(url_for('admin_import'))
+        try:
+            report = run_import(kind, upload.stream, dry_run=dry_run)
+        except (ValueError, UnicodeDecodeError, csv.Error) as e:
+            flash(f'Import failed: {str(e)}', 'error')
+            return redirect(url_for('admin_import'))
+        except Exception as e:
+            app.logger.error(f'Bulk import of {kind} failed: {str(e)}')
+            flash(f'Import failed, nothing was saved: {str(e)}', 'error')
+            return redirect(url_for('admin_import'))
+        verb = 'would be imported' if dry_run else 'imported'
+        flash(f'{report.imported} of {report.rows} rows {verb}; {report.error_count} rejected.',
+              'success' if not report.error_count else 'warning')
+    return render_template('admin/import.html', report=report, kind=kind, importers=IMPORTERS,
+                         max_errors=MAX_REPORTED_ERRORS)
+
+# Admin - Diagnostics
+@app.route('/admin/diagnostics')
+@login_required
+@admin_required
+def admin_diagnostics():
+    """Runtime metrics for capacity tuning"""
+    from db_routing import get_replicas
+    from db_pool import pool_status
+    from fragment_cache import get_cache
+    import cache_bus
+    replicas = get_replicas()
+    pools = {'primary': pool_status(db.engine)}
+    for index, engine in enumerate(replicas.engines if replicas else []):
+        pools[f'replica_{index}'] = pool_status(engine)
+    return jsonify({
+        'password_hashing': pool_stats(),
+        'database_pools': pools,
+        'replicas': replicas.status() if replicas else [],
+        'fragment_cache': get_cache().stats(),
+        'cache_bus': cache_bus.status()
+    })
+
 # Admin - Departments Management
 @app.route('/admin/departments')
 @login_required
@@ -564,34 +817,44 @@ def admin_department_delete(id):
 def admin_allocate_request(id):
     """Allocate work request to a worker"""
     request_obj = MaintenanceRequest.query.get_or_404(id)
-    worker_id = request.form.get('worker_id')
-    
-    if not worker_id:
-        flash('Please select a worker', 'error')
+    try:
+        worker = allocate(request_obj, request.form.get('worker_id'))
+    except ValueError as e:
+        flash(str(e), 'error')
         return redirect(url_for('admin_requests'))
     
-    worker = User.query.get(worker_id)
-    if not worker or worker.is_admin:
-        flash('Invalid worker selected', 'error')
-        return redirect(url_for('admin_requests'))
+    db.session.commit()
+    _send_allocation_email(request_obj, worker)
     
-    # Allocate request
-    request_obj.allocation_status = 'allocated'
-    request_obj.allocated_to_id = worker_id
-    request_obj.allocated_at = datetime.utcnow()
-    request_obj.technician_id = worker_id
-    request_obj.assigned_user_id = worker_id
+    flash(f'Work allocated to {worker.full_name or worker.username} successfully!', 'success')
+    return redirect(url_for('admin_requests'))
+
+@app.route('/api/requests/<int:id>/allocate', methods=['POST'])
+@json_login_required(admin=True)
+def api_allocate_request(id):
+    """Allocate from the kanban without a page reload; returns the card and column counts"""
+    request_obj = MaintenanceRequest.query.get(id)
+    if not request_obj:
+        return jsonify({'error': 'Request not found'}), 404
+    data = request.get_json(silent=True) or request.form
+    try:
+        worker = allocate(request_obj, data.get('worker_id'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
     db.session.commit()
+    _send_allocation_email(request_obj, worker)
     
-    # Send email notification
+    return jsonify({
+        'request': card_data(request_obj),
+        'counts': stage_counts(board_query(data.get('search', '').strip()))
+    })
+
+def _send_allocation_email(request_obj, worker):
     try:
         send_work_allocation_email(request_obj, worker)
     except Exception as e:
         app.logger.error(f"Failed to send allocation email: {str(e)}")
-    
-    flash(f'Work allocated to {worker.full_name or worker.username} successfully!', 'success')
-    return redirect(url_for('admin_requests'))
 
 @app.route('/admin/requests/<int:id>/deadline-response', methods=['POST'])
 @login_required
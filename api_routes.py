@@ -0,0 +1,59 @@
+"""
+Versioned API Routes for GearGuard
+Bounded, cursor-paginated read endpoints for integration scripts
+"""
+
+from flask import request, jsonify
+from app import app
+from models import MaintenanceEquipment
+from decorators import api_token_required
+from http_cache_utils import conditional_json
+from api_utils import (
+    parse_fields, parse_limit, parse_ids, parse_choices, request_page, equipment_batch,
+    REQUEST_FIELDS, DEFAULT_REQUEST_FIELDS, EQUIPMENT_FIELDS, DEFAULT_EQUIPMENT_FIELDS,
+    REQUEST_STAGES, REQUEST_TYPES
+)
+
+def _request_listing(equipment_id=None):
+    try:
+        fields = parse_fields(request.args.get('fields'), REQUEST_FIELDS, DEFAULT_REQUEST_FIELDS)
+        limit = parse_limit(request.args.get('limit'))
+        items, next_cursor = request_page(
+            fields, limit,
+            cursor=request.args.get('cursor'),
+            equipment_id=equipment_id,
+            stages=parse_choices(request.args.get('stage'), REQUEST_STAGES, 'stage'),
+            types=parse_choices(request.args.get('type'), REQUEST_TYPES, 'type')
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return conditional_json({'data': items, 'next_cursor': next_cursor, 'limit': limit})
+
+@app.route('/api/v1/requests')
+@api_token_required('API_READ_TOKEN', allow_users=True)
+def api_v1_requests():
+    """Maintenance requests, newest first; filter with equipment_id, stage and type"""
+    equipment_id = request.args.get('equipment_id')
+    if equipment_id is not None and not equipment_id.isdigit():
+        return jsonify({'error': 'equipment_id must be an integer'}), 400
+    return _request_listing(int(equipment_id) if equipment_id else None)
+
+@app.route('/api/v1/equipment/<int:id>/requests')
+@api_token_required('API_READ_TOKEN', allow_users=True)
+def api_v1_equipment_requests(id):
+    """Requests for one equipment, newest first"""
+    if not MaintenanceEquipment.query.with_entities(MaintenanceEquipment.id).filter_by(id=id).first():
+        return jsonify({'error': 'Equipment not found'}), 404
+    return _request_listing(id)
+
+@app.route('/api/v1/equipment')
+@api_token_required('API_READ_TOKEN', allow_users=True)
+def api_v1_equipment():
+    """Batch equipment lookup: ids=1,2,3 answered with a single query"""
+    try:
+        fields = parse_fields(request.args.get('fields'), EQUIPMENT_FIELDS, DEFAULT_EQUIPMENT_FIELDS)
+        ids = parse_ids(request.args.get('ids'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    items, missing = equipment_batch(ids, fields)
+    return conditional_json({'data': items, 'missing': missing})
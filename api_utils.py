@@ -0,0 +1,130 @@
+"""
+Read API helpers for GearGuard
+Field projection, keyset cursors and bounded limits for the versioned JSON API
+"""
+
+import base64
+import binascii
+from datetime import date, datetime
+from models import db, MaintenanceEquipment, MaintenanceRequest
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+MAX_BATCH_IDS = 100
+
+REQUEST_STAGES = ('new', 'in_progress', 'repaired', 'scrap')
+REQUEST_TYPES = ('corrective', 'preventive')
+
+# Columns clients may ask for with fields=; only the chosen columns are selected
+REQUEST_FIELDS = {name: getattr(MaintenanceRequest, name) for name in (
+    'id', 'name', 'subject', 'request_type', 'stage', 'equipment_id', 'category_id', 'team_id',
+    'technician_id', 'assigned_user_id', 'work_center_id', 'pm_schedule_id', 'scheduled_date',
+    'duration', 'start_date', 'end_date', 'created_at', 'updated_at'
+)}
+DEFAULT_REQUEST_FIELDS = ('id', 'name', 'subject', 'request_type', 'stage', 'scheduled_date', 'created_at')
+
+EQUIPMENT_FIELDS = {name: getattr(MaintenanceEquipment, name) for name in (
+    'id', 'name', 'serial_number', 'location', 'health_percentage', 'risk_score', 'scrap',
+    'purchase_date', 'category_id', 'team_id', 'technician_id', 'department_id', 'company_id',
+    'work_center_id', 'created_at', 'updated_at'
+)}
+DEFAULT_EQUIPMENT_FIELDS = ('id', 'name', 'serial_number', 'category_id', 'team_id', 'technician_id',
+                            'work_center_id', 'health_percentage', 'scrap')
+
+def parse_fields(raw, allowed, default):
+    """Field names from a comma-separated fields= value; id is always included"""
+    if not raw:
+        return list(default)
+    fields = ['id']
+    for name in raw.split(','):
+        name = name.strip()
+        if not name or name in fields:
+            continue
+        if name not in allowed:
+            raise ValueError(f'Unknown field: {name}')
+        fields.append(name)
+    return fields
+
+def parse_limit(raw):
+    """Page size clamped to 1..MAX_LIMIT"""
+    if raw in (None, ''):
+        return DEFAULT_LIMIT
+    try:
+        limit = int(raw)
+    except ValueError:
+        raise ValueError('limit must be an integer')
+    return max(1, min(limit, MAX_LIMIT))
+
+def parse_ids(raw):
+    """Unique integer IDs from ids=1,2,3 in the order given"""
+    ids = []
+    for part in (raw or '').split(','):
+        part = part.strip()
+        if not part:
+            continue
+        if not part.isdigit():
+            raise ValueError(f'Invalid id: {part}')
+        value = int(part)
+        if value not in ids:
+            ids.append(value)
+    if not ids:
+        raise ValueError('ids is required')
+    if len(ids) > MAX_BATCH_IDS:
+        raise ValueError(f'At most {MAX_BATCH_IDS} ids per call')
+    return ids
+
+def parse_choices(raw, allowed, name):
+    """Comma-separated filter values checked against allowed"""
+    values = [value.strip() for value in (raw or '').split(',') if value.strip()]
+    for value in values:
+        if value not in allowed:
+            raise ValueError(f'Invalid {name}: {value}')
+    return values
+
+def encode_cursor(last_id):
+    """Opaque cursor for the page after the row with last_id"""
+    return base64.urlsafe_b64encode(f'id:{last_id}'.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    try:
+        decoded = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        prefix, value = decoded.split(':', 1)
+        if prefix != 'id':
+            raise ValueError
+        return int(value)
+    except (ValueError, binascii.Error, UnicodeDecodeError):
+        raise ValueError('Invalid cursor')
+
+def _json_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+def _serialize(row, fields):
+    return {name: _json_value(value) for name, value in zip(fields, row)}
+
+def request_page(fields, limit, cursor=None, equipment_id=None, stages=None, types=None):
+    """One page of requests, newest first, keyed on id.
+
+    Returns (items, next_cursor); next_cursor is None on the last page.
+    """
+    query = db.session.query(*[REQUEST_FIELDS[name] for name in fields])
+    if equipment_id is not None:
+        query = query.filter(MaintenanceRequest.equipment_id == equipment_id)
+    if stages:
+        query = query.filter(MaintenanceRequest.stage.in_(stages))
+    if types:
+        query = query.filter(MaintenanceRequest.request_type.in_(types))
+    if cursor:
+        query = query.filter(MaintenanceRequest.id < decode_cursor(cursor))
+    # One extra row tells us whether another page exists without a COUNT
+    rows = query.order_by(MaintenanceRequest.id.desc()).limit(limit + 1).all()
+    next_cursor = encode_cursor(rows[limit - 1][0]) if len(rows) > limit else None
+    return [_serialize(row, fields) for row in rows[:limit]], next_cursor
+
+def equipment_batch(ids, fields):
+    """Equipment rows for ids in one query; returns (items in requested order, missing ids)"""
+    rows = db.session.query(*[EQUIPMENT_FIELDS[name] for name in fields]) \
+        .filter(MaintenanceEquipment.id.in_(ids)).all()
+    found = {row[0]: _serialize(row, fields) for row in rows}
+    return [found[i] for i in ids if i in found], [i for i in ids if i not in found]
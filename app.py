@@ -21,9 +21,38 @@ from config import Config
 app = Flask(__name__)
 app.config.from_object(Config)
 
-# Initialize db with app
+# Behind a reverse proxy every request comes from the proxy's address; take the client's
+# address and scheme from the headers set by the trusted proxies instead
+if app.config['TRUSTED_PROXY_COUNT']:
+    from werkzeug.middleware.proxy_fix import ProxyFix
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['TRUSTED_PROXY_COUNT'],
+                            x_proto=app.config['TRUSTED_PROXY_COUNT'])
+
+# Initialize db with app (pool options must be in place before the engine is created)
+import db_pool
+db_pool.configure(app)
 db.init_app(app)
 
+# Route read-only views to replicas when configured
+import db_routing
+db_routing.init_app(app)
+
+# Scope queries to the signed-in user's company when enabled
+import tenant_utils
+tenant_utils.init_app(app)
+
+# {% cache %} template fragments
+import fragment_cache
+fragment_cache.init_app(app)
+
+# Keep per-process caches coherent across worker processes
+import cache_bus
+cache_bus.init_app(app)
+
+# Live request events, including those committed by other worker processes
+import request_events
+request_events.init_app(app)
+
 # Initialize Flask-Mail
 mail = Mail(app)
 
@@ -41,12 +70,21 @@ from routes import *
 from admin_routes import *
 from user_routes import *
 from worker_routes import *
+from api_routes import *
 
 def create_tables():
     """Create database tables and initial admin user"""
     with app.app_context():
         db.create_all()
         
+        # Reports read live and archived requests through this view
+        from archive_utils import history_view_sql
+        db.session.execute(db.text(history_view_sql()))
+        # Request names continue after any MR numbers already in the tables
+        from models import REQUEST_NAME_SEQ_SYNC_SQL
+        db.session.execute(db.text(REQUEST_NAME_SEQ_SYNC_SQL))
+        db.session.commit()
+        
         # Create default company if not exists
         default_company = Company.query.filter_by(name='My Company (San Francisco)').first()
         if not default_company:
@@ -170,5 +208,10 @@ def create_demo_data():
 if __name__ == '__main__':
     with app.app_context():
         create_tables()
+    # Skip the reloader's parent process so jobs run once
+    if app.config['BACKGROUND_TASKS_ENABLED'] and os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        from background_tasks import register_default_tasks, start_background_tasks
+        register_default_tasks(app)
+        start_background_tasks(app)
     app.run(debug=True, host='0.0.0.0', port=5000)
 
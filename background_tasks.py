@@ -0,0 +1,83 @@
+"""
+Background maintenance jobs for GearGuard
+Runs periodic housekeeping tasks on a daemon thread in the dev server, or as a
+standalone process (python background_tasks.py) next to gunicorn
+"""
+
+import threading
+import time
+
+_tasks = []
+_started = False
+_lock = threading.Lock()
+
+def register_task(name, interval_seconds, func):
+    """Register func to run every interval_seconds inside an app context"""
+    _tasks[:] = [task for task in _tasks if task['name'] != name]
+    _tasks.append({'name': name, 'interval': interval_seconds, 'func': func, 'next_run': 0.0})
+
+def _run_pending(app):
+    now = time.monotonic()
+    for task in _tasks:
+        if now < task['next_run']:
+            continue
+        task['next_run'] = now + task['interval']
+        with app.app_context():
+            try:
+                task['func']()
+            except Exception as e:
+                from models import db
+                db.session.rollback()
+                app.logger.error(f"Background task {task['name']} failed: {str(e)}")
+
+def _loop(app, poll_seconds):
+    while True:
+        _run_pending(app)
+        time.sleep(poll_seconds)
+
+def run_once(app):
+    """Run every registered task now, e.g. from cron; returns the names that ran"""
+    for task in _tasks:
+        task['next_run'] = 0.0
+    _run_pending(app)
+    return [task['name'] for task in _tasks]
+
+def start_background_tasks(app, poll_seconds=30):
+    """Start the scheduler thread once per process"""
+    global _started
+    with _lock:
+        if _started or not _tasks:
+            return
+        _started = True
+    thread = threading.Thread(target=_loop, args=(app, poll_seconds), name='gearguard-background', daemon=True)
+    thread.start()
+
+def register_default_tasks(app):
+    """Register the built-in housekeeping jobs using intervals from config"""
+    from health_history_utils import compact_health_history
+    from risk_utils import run_nightly_risk_scoring
+    from email_utils import purge_expired_otps
+    from rate_limiter import purge_rate_limit_buckets
+    from archive_utils import archive_closed_requests
+    from fragment_cache import purge_fragment_cache
+    from work_center_utils import refresh_recent_work_center_rollup
+    register_task('health_history_compaction', app.config['HEALTH_COMPACTION_INTERVAL'], compact_health_history)
+    register_task('risk_scoring', app.config['RISK_SCORING_INTERVAL'], run_nightly_risk_scoring)
+    register_task('otp_purge', app.config['OTP_PURGE_INTERVAL'], purge_expired_otps)
+    register_task('rate_limit_purge', 3600, purge_rate_limit_buckets)
+    register_task('request_archival', app.config['ARCHIVE_INTERVAL'], archive_closed_requests)
+    register_task('fragment_cache_purge', 3600, purge_fragment_cache)
+    register_task('work_center_rollup', app.config['WORK_CENTER_ROLLUP_INTERVAL'], refresh_recent_work_center_rollup)
+
+if __name__ == '__main__':
+    # Production web servers (gunicorn) never start the in-process thread: run this
+    # alongside them, as one process for the whole deployment
+    import sys
+    from app import app
+    register_default_tasks(app)
+    if '--once' in sys.argv:
+        ran = run_once(app)
+        print(f"[OK] Ran {len(ran)} background tasks: {', '.join(ran)}")
+    else:
+        print(f"[OK] Running {len(_tasks)} background tasks; press Ctrl+C to stop")
+        _loop(app, 30)
@@ -0,0 +1,170 @@
+"""
+Cache invalidation bus for GearGuard
+Publishes changed tables over PostgreSQL NOTIFY so every worker process drops its stale cache entries
+"""
+
+import json
+import os
+import select
+import socket
+import threading
+import time
+from flask import has_app_context, current_app
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+from models import db
+from cache_utils import bump_versions, bump_all_versions, add_version_publisher
+
+CHANNEL = 'gearguard_cache'
+NOTIFY_SQL = text("SELECT pg_notify(:channel, :payload)")
+HEARTBEAT_SECONDS = 30
+
+_handlers = {}
+_enabled = False
+_listener = None
+_listener_lock = threading.Lock()
+
+def origin():
+    """Identifies this worker process, so it can skip its own messages"""
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+def is_enabled():
+    return _enabled
+
+def listen(channel, callback):
+    """Call callback(payload) for every message another process sends on channel"""
+    _handlers.setdefault(channel, []).append(callback)
+
+def notify(connection, channel, payload):
+    """Queue a message on connection; PostgreSQL delivers it when that transaction commits"""
+    connection.execute(NOTIFY_SQL, {'channel': channel, 'payload': json.dumps({**payload, 'origin': origin()})})
+
+def _on_invalidate(payload):
+    bump_versions(payload.get('tables', []), publish=False)
+
+@event.listens_for(Session, 'before_commit')
+def _publish_commit(session):
+    if not _enabled:
+        return
+    # Flush now so changes from the final flush are in the message too
+    session.flush()
+    changed = session.info.get('changed_entities')
+    if changed:
+        notify(session.connection(), CHANNEL, {'tables': sorted(changed)})
+
+def _publish_bump(names):
+    # Versions bumped by hand after raw SQL or COPY; sent on a connection of its own
+    if not _enabled or not has_app_context():
+        return
+    try:
+        with db.engine.begin() as conn:
+            notify(conn, CHANNEL, {'tables': sorted(names)})
+    except Exception as e:
+        current_app.logger.warning(f'Cache bus publish failed: {str(e)}')
+
+class Listener(threading.Thread):
+    """Daemon thread holding one LISTEN connection for the process"""
+
+    def __init__(self, app):
+        super().__init__(name='gearguard-cache-bus', daemon=True)
+        self.app = app
+        self.pid = os.getpid()
+        self.connected = False
+        self.received = 0
+
+    def _connect(self):
+        url = self.app.config['CACHE_BUS_URL']
+        with self.app.app_context():
+            engine = db.engine
+        if url:
+            from sqlalchemy.engine import make_url
+            url = make_url(url)
+        else:
+            url = engine.url
+        args, kwargs = engine.dialect.create_connect_args(url)
+        connection = engine.dialect.loaded_dbapi.connect(*args, **kwargs)
+        connection.autocommit = True
+        return connection
+
+    def _dispatch(self, channel, raw):
+        try:
+            payload = json.loads(raw)
+        except ValueError:
+            return
+        if payload.get('origin') == origin():
+            return
+        self.received += 1
+        for callback in _handlers.get(channel, []):
+            try:
+                callback(payload)
+            except Exception as e:
+                self.app.logger.error(f'Cache bus handler for {channel} failed: {str(e)}')
+
+    def _listen(self):
+        connection = self._connect()
+        try:
+            cursor = connection.cursor()
+            for channel in _handlers:
+                cursor.execute(f'LISTEN {channel}')
+            self.connected = True
+            # Anything committed while we were not listening was missed
+            bump_all_versions()
+            while True:
+                if select.select([connection], [], [], HEARTBEAT_SECONDS) == ([], [], []):
+                    # Detects connections dropped without a FIN
+                    cursor.execute('SELECT 1')
+                    continue
+                connection.poll()
+                while connection.notifies:
+                    message = connection.notifies.pop(0)
+                    self._dispatch(message.channel, message.payload)
+        finally:
+            self.connected = False
+            connection.close()
+
+    def run(self):
+        delay = 1
+        while True:
+            started = time.monotonic()
+            try:
+                self._listen()
+            except Exception as e:
+                self.app.logger.warning(f'Cache bus listener disconnected: {str(e)}')
+            if time.monotonic() - started > 60:
+                delay = 1
+            time.sleep(delay)
+            delay = min(delay * 2, 30)
+
+def ensure_listener(app):
+    """Start the listener once per process (gunicorn forks workers after import)"""
+    global _listener
+    if _listener is not None and _listener.pid == os.getpid():
+        return _listener
+    with _listener_lock:
+        if _listener is None or _listener.pid != os.getpid():
+            _listener = Listener(app)
+            _listener.start()
+    return _listener
+
+def status():
+    """Listener state for the diagnostics endpoint"""
+    if not _enabled:
+        return {'enabled': False}
+    return {
+        'enabled': True,
+        'connected': bool(_listener and _listener.connected),
+        'messages_received': _listener.received if _listener else 0
+    }
+
+def init_app(app):
+    """Publish table changes on commit and listen for other processes' changes"""
+    global _enabled
+    if not app.config['CACHE_BUS_ENABLED']:
+        return
+    _enabled = True
+    listen(CHANNEL, _on_invalidate)
+    add_version_publisher(_publish_bump)
+
+    @app.before_request
+    def start_cache_bus():
+        ensure_listener(app)
@@ -0,0 +1,158 @@
+"""
+Caching helpers for GearGuard
+Entity version registry bumped on commit, and a reference-data cache for form dropdowns
+"""
+
+import threading
+import time
+from collections import namedtuple
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from models import db, MaintenanceCategory, MaintenanceTeam, User, Department, Company, WorkCenter
+from tenant_utils import current_tenant
+
+RefItem = namedtuple('RefItem', ['id', 'label', 'detail'])
+
+_versions = {}
+_versions_lock = threading.Lock()
+
+def entity_version(name):
+    """Current version of an entity (table name); changes whenever a commit touches it"""
+    return _versions.get(name, 0)
+
+_publishers = []
+
+def add_version_publisher(func):
+    """Also pass entity names bumped by bump_versions() to func, e.g. to tell other processes"""
+    _publishers.append(func)
+
+def bump_versions(names, publish=True):
+    """Mark entities as changed so cached data built from them is rebuilt"""
+    names = list(names)
+    with _versions_lock:
+        for name in names:
+            _versions[name] = _versions.get(name, 0) + 1
+    if publish:
+        for func in _publishers:
+            func(names)
+
+def bump_all_versions():
+    """Invalidate everything, e.g. after invalidation messages may have been missed"""
+    bump_versions(set(db.metadata.tables) | set(_versions), publish=False)
+
+def _changed(session):
+    return session.info.setdefault('changed_entities', set())
+
+@event.listens_for(Session, 'after_flush')
+def _track_flush(session, flush_context):
+    changed = _changed(session)
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        table = getattr(obj, '__tablename__', None)
+        if table:
+            changed.add(table)
+
+@event.listens_for(Session, 'do_orm_execute')
+def _track_bulk(orm_execute_state):
+    # Query.update()/delete() and update(Model) statements bypass the flush
+    if (orm_execute_state.is_update or orm_execute_state.is_delete) and orm_execute_state.bind_mapper:
+        _changed(orm_execute_state.session).add(orm_execute_state.bind_mapper.local_table.name)
+
+@event.listens_for(Session, 'after_commit')
+def _bump_on_commit(session):
+    changed = session.info.pop('changed_entities', None)
+    if changed:
+        # Other processes hear about ORM commits from the transaction itself (cache_bus)
+        bump_versions(changed, publish=False)
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_on_rollback(session):
+    session.info.pop('changed_entities', None)
+
+def _user_label(full_name, username):
+    return full_name or username
+
+# name -> (source table, loader returning RefItems ordered for display)
+REFERENCE_LOADERS = {
+    'categories': ('maintenance_category', lambda: [
+        RefItem(row[0], row[1], None) for row in
+        db.session.query(MaintenanceCategory.id, MaintenanceCategory.name).order_by(MaintenanceCategory.name)
+    ]),
+    'teams': ('maintenance_team', lambda: [
+        RefItem(row[0], row[1], None) for row in
+        db.session.query(MaintenanceTeam.id, MaintenanceTeam.name).order_by(MaintenanceTeam.name)
+    ]),
+    'users': ('user', lambda: [
+        RefItem(row[0], _user_label(row[1], row[2]), row[3]) for row in
+        db.session.query(User.id, User.full_name, User.username, User.position)
+        .filter(User.is_active == True).order_by(User.full_name, User.username)
+    ]),
+    'departments': ('department', lambda: [
+        RefItem(row[0], row[1], None) for row in
+        db.session.query(Department.id, Department.name).order_by(Department.name)
+    ]),
+    'companies': ('company', lambda: [
+        RefItem(row[0], row[1], None) for row in
+        db.session.query(Company.id, Company.name).order_by(Company.name)
+    ]),
+    'work_centers': ('work_center', lambda: [
+        RefItem(row[0], row[1], row[2]) for row in
+        db.session.query(WorkCenter.id, WorkCenter.name, WorkCenter.code).order_by(WorkCenter.name)
+    ]),
+}
+
+class TTLCache:
+    """Small thread-safe cache whose entries expire after ttl seconds"""
+
+    def __init__(self, ttl, maxsize=1024):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        entry = self._data.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            return None
+        return entry[1]
+
+    def set(self, key, value):
+        now = time.monotonic()
+        with self._lock:
+            if len(self._data) >= self.maxsize:
+                for stale in [k for k, (expires, _) in self._data.items() if expires < now]:
+                    del self._data[stale]
+                while len(self._data) >= self.maxsize:
+                    del self._data[next(iter(self._data))]
+            self._data[key] = (now + self.ttl, value)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+_reference_cache = {}
+_reference_lock = threading.Lock()
+
+def reference_data(*names):
+    """Dropdown data as lists of RefItem(id, label, detail), keyed by name.
+
+    Entries are reused until a commit in this process changes the source
+    table, or until REFERENCE_CACHE_TTL seconds pass so changes made by other
+    worker processes show up too. Each tenant has its own entries.
+    """
+    ttl = current_app.config['REFERENCE_CACHE_TTL']
+    now = time.monotonic()
+    tenant_id = current_tenant()
+    result = {}
+    for name in names:
+        table, loader = REFERENCE_LOADERS[name]
+        version = entity_version(table)
+        cached = _reference_cache.get((name, tenant_id))
+        if cached and cached[0] == version and now - cached[1] < ttl:
+            result[name] = cached[2]
+            continue
+        items = tuple(loader())
+        with _reference_lock:
+            _reference_cache[(name, tenant_id)] = (version, now, items)
+        result[name] = items
+    return result
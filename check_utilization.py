@@ -4,11 +4,12 @@ Check utilization statistics after generating requests
 
 from app import app
 from models import MaintenanceRequest, User, MaintenanceEquipment
+from db_routing import replica_reads
 from datetime import datetime
 
 def check_utilization():
     """Display utilization statistics"""
-    with app.app_context():
+    with app.app_context(), replica_reads():
         reqs = MaintenanceRequest.query.all()
         workers = User.query.filter_by(is_admin=False, is_active=True).all()
         equipment = MaintenanceEquipment.query.all()
@@ -41,10 +41,8 @@ class Config:
         )
     
     SQLALCHEMY_TRACK_MODIFICATIONS = False
-    SQLALCHEMY_ENGINE_OPTIONS = {
-        'pool_pre_ping': True,
-        'pool_recycle': 300,
-    }
+    # Extra create_engine options; pool settings come from the DB_* values below (see db_pool.py)
+    SQLALCHEMY_ENGINE_OPTIONS = {}
     
     # Flask-Mail Configuration
     MAIL_SERVER = os.environ.get('MAIL_SERVER', 'smtp.gmail.com')
@@ -57,4 +55,89 @@ class Config:
     
     # OTP Configuration
     OTP_EXPIRY_MINUTES = 10
-
+    OTP_PURGE_INTERVAL = int(os.environ.get('OTP_PURGE_INTERVAL', 3600))
+    OTP_PURGE_BATCH_SIZE = int(os.environ.get('OTP_PURGE_BATCH_SIZE', 5000))
+    
+    # Meter reading ingest API
+    METER_API_TOKEN = os.environ.get('METER_API_TOKEN')
+    METER_INGEST_MAX_BATCH = int(os.environ.get('METER_INGEST_MAX_BATCH', 10000))
+    
+    # Background housekeeping jobs
+    BACKGROUND_TASKS_ENABLED = os.environ.get('BACKGROUND_TASKS_ENABLED', 'true').lower() in ['true', 'on', '1']
+    HEALTH_COMPACTION_INTERVAL = int(os.environ.get('HEALTH_COMPACTION_INTERVAL', 300))
+    
+    # Nightly failure-risk scoring; assets at or above the threshold get a preventive inspection (0 disables)
+    RISK_SCORING_INTERVAL = int(os.environ.get('RISK_SCORING_INTERVAL', 86400))
+    RISK_INSPECTION_THRESHOLD = float(os.environ.get('RISK_INSPECTION_THRESHOLD', 70))
+    
+    # Work center cost and OEE rollup; the job refreshes the previous and current month
+    WORK_CENTER_ROLLUP_INTERVAL = int(os.environ.get('WORK_CENTER_ROLLUP_INTERVAL', 3600))
+    
+    # Rate limiting for login, registration and OTP endpoints ('memory' or 'postgres')
+    RATE_LIMIT_ENABLED = os.environ.get('RATE_LIMIT_ENABLED', 'true').lower() in ['true', 'on', '1']
+    RATE_LIMIT_STORAGE = os.environ.get('RATE_LIMIT_STORAGE', 'memory')
+    # Reverse proxies in front of the app (nginx in front of gunicorn = 1). Client IPs for rate
+    # limiting and logs are then read from X-Forwarded-For; leave 0 when clients connect directly
+    TRUSTED_PROXY_COUNT = int(os.environ.get('TRUSTED_PROXY_COUNT', 0))
+    
+    # Password hashing (werkzeug method string, e.g. 'scrypt' or 'pbkdf2:sha256:600000')
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt')
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 4))
+    PASSWORD_HASH_QUEUE_LIMIT = int(os.environ.get('PASSWORD_HASH_QUEUE_LIMIT', 32))
+    PASSWORD_HASH_TIMEOUT = float(os.environ.get('PASSWORD_HASH_TIMEOUT', 10))
+    
+    # Seconds before cached dropdown data is reloaded even without a local change
+    REFERENCE_CACHE_TTL = int(os.environ.get('REFERENCE_CACHE_TTL', 60))
+    
+    # Token for integration scripts reading the /api/v1 endpoints (logged-in users need no token)
+    API_READ_TOKEN = os.environ.get('API_READ_TOKEN')
+    
+    # Read replicas (comma-separated URLs) for read-only views and reports; empty sends everything to the primary
+    SQLALCHEMY_REPLICA_URIS = [uri.strip() for uri in os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if uri.strip()]
+    REPLICA_MAX_LAG_SECONDS = float(os.environ.get('REPLICA_MAX_LAG_SECONDS', 5))
+    REPLICA_LAG_CHECK_INTERVAL = float(os.environ.get('REPLICA_LAG_CHECK_INTERVAL', 5))
+    # After a write, the user's following requests read from the primary for this long
+    REPLICA_PIN_SECONDS = float(os.environ.get('REPLICA_PIN_SECONDS', 5))
+    
+    # Connection pool (per worker process). DB_POOL_PRE_PING: 'always', 'idle' (only connections idle
+    # longer than DB_POOL_PING_IDLE_SECONDS) or 'off'. DB_PGBOUNCER disables the local pool for PgBouncer
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 10))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 10))
+    DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', 30))
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))
+    DB_POOL_PRE_PING = os.environ.get('DB_POOL_PRE_PING', 'idle').lower()
+    DB_POOL_PING_IDLE_SECONDS = float(os.environ.get('DB_POOL_PING_IDLE_SECONDS', 30))
+    DB_STATEMENT_TIMEOUT_MS = int(os.environ.get('DB_STATEMENT_TIMEOUT_MS', 0))
+    DB_PGBOUNCER = os.environ.get('DB_PGBOUNCER', 'false').lower() in ['true', 'on', '1']
+    
+    # Closed requests older than this many months move to maintenance_request_archive (0 disables)
+    ARCHIVE_AFTER_MONTHS = int(os.environ.get('ARCHIVE_AFTER_MONTHS', 24))
+    ARCHIVE_BATCH_SIZE = int(os.environ.get('ARCHIVE_BATCH_SIZE', 500))
+    ARCHIVE_MAX_BATCHES = int(os.environ.get('ARCHIVE_MAX_BATCHES', 200))
+    ARCHIVE_INTERVAL = int(os.environ.get('ARCHIVE_INTERVAL', 3600))
+    
+    # Scope ORM queries to the signed-in user's company (several plants sharing one database);
+    # users without a company, background jobs and scripts stay unscoped
+    TENANT_SCOPING = os.environ.get('TENANT_SCOPING', 'false').lower() in ['true', 'on', '1']
+    
+    # {% cache %} template fragments: in-process LRU of FRAGMENT_CACHE_SIZE entries (TTL 0 disables),
+    # optionally shared between workers through FRAGMENT_CACHE_SHARED ('file' or 'postgres')
+    FRAGMENT_CACHE_TTL = int(os.environ.get('FRAGMENT_CACHE_TTL', 300))
+    FRAGMENT_CACHE_SIZE = int(os.environ.get('FRAGMENT_CACHE_SIZE', 512))
+    FRAGMENT_CACHE_SHARED = os.environ.get('FRAGMENT_CACHE_SHARED', '').lower()
+    FRAGMENT_CACHE_DIR = os.environ.get('FRAGMENT_CACHE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'fragments'))
+    
+    # Cross-process cache invalidation over PostgreSQL LISTEN/NOTIFY. LISTEN needs a session-level
+    # connection, so behind PgBouncer in transaction mode point CACHE_BUS_URL at the database directly
+    CACHE_BUS_ENABLED = os.environ.get('CACHE_BUS_ENABLED', 'true').lower() in ['true', 'on', '1']
+    CACHE_BUS_URL = os.environ.get('CACHE_BUS_URL')
+    
+    # Live request events (/events/requests). Each open stream occupies a worker thread, so streams are
+    # capped per process and closed after SSE_STREAM_SECONDS; browsers reconnect and resume automatically.
+    # WEB_THREADS is the thread count of one worker process (gunicorn --threads); the cap leaves
+    # SSE_RESERVED_THREADS of them for page requests. Sync workers (one thread) get no streams at all
+    WEB_THREADS = int(os.environ.get('WEB_THREADS', 8))
+    SSE_RESERVED_THREADS = int(os.environ.get('SSE_RESERVED_THREADS', 2))
+    SSE_MAX_SUBSCRIBERS = int(os.environ.get('SSE_MAX_SUBSCRIBERS', max(WEB_THREADS - SSE_RESERVED_THREADS, 0)))
+    SSE_STREAM_SECONDS = int(os.environ.get('SSE_STREAM_SECONDS', 300))
+    SSE_HEARTBEAT_SECONDS = int(os.environ.get('SSE_HEARTBEAT_SECONDS', 15))
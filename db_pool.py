@@ -0,0 +1,168 @@
+"""
+Connection pool setup for GearGuard
+Builds engine options from the DB_* settings and records pool telemetry for diagnostics
+"""
+
+import bisect
+import threading
+import time
+from sqlalchemy import event, exc
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool, NullPool
+
+# Upper bounds (ms) of the checkout latency histogram buckets; the last bucket is open-ended
+LATENCY_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000)
+
+_settings = {'ping': 'idle', 'ping_idle_seconds': 30.0, 'statement_timeout_ms': 0, 'pgbouncer': False}
+
+class PoolMetrics:
+    """Checkout counters and latency histogram for one pool"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.pings = 0
+        self.invalidated = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.histogram = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+
+    def observe(self, seconds):
+        with self._lock:
+            self.checkouts += 1
+            self.wait_seconds += seconds
+            self.max_wait_seconds = max(self.max_wait_seconds, seconds)
+            self.histogram[bisect.bisect_left(LATENCY_BUCKETS_MS, seconds * 1000)] += 1
+
+    def count(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def snapshot(self):
+        with self._lock:
+            labels = [f'<={bound}ms' for bound in LATENCY_BUCKETS_MS] + [f'>{LATENCY_BUCKETS_MS[-1]}ms']
+            return {
+                'checkouts': self.checkouts,
+                'timeouts': self.timeouts,
+                'pings': self.pings,
+                'invalidated': self.invalidated,
+                'avg_checkout_ms': round(self.wait_seconds / (self.checkouts or 1) * 1000, 3),
+                'max_checkout_ms': round(self.max_wait_seconds * 1000, 3),
+                'checkout_histogram': dict(zip(labels, self.histogram))
+            }
+
+class _TimedCheckout:
+    """Pool mixin timing every checkout, including waits for a free slot and new connects"""
+
+    @property
+    def metrics(self):
+        if '_metrics' not in self.__dict__:
+            self.__dict__['_metrics'] = PoolMetrics()
+        return self.__dict__['_metrics']
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            self.metrics.count('timeouts')
+            raise
+        self.metrics.observe(time.perf_counter() - started)
+        return connection
+
+class InstrumentedQueuePool(_TimedCheckout, QueuePool):
+    pass
+
+class InstrumentedNullPool(_TimedCheckout, NullPool):
+    pass
+
+def engine_options(config):
+    """create_engine options for the configured pool mode.
+
+    In PgBouncer mode the application keeps no pool of its own (PgBouncer
+    does the pooling) and avoids startup parameters, which transaction
+    pooling rejects; the statement timeout is applied per transaction.
+    """
+    options = {}
+    if config['DB_PGBOUNCER']:
+        options['poolclass'] = InstrumentedNullPool
+    else:
+        options.update(
+            poolclass=InstrumentedQueuePool,
+            pool_size=config['DB_POOL_SIZE'],
+            max_overflow=config['DB_MAX_OVERFLOW'],
+            pool_timeout=config['DB_POOL_TIMEOUT'],
+            pool_recycle=config['DB_POOL_RECYCLE'],
+            pool_pre_ping=config['DB_POOL_PRE_PING'] == 'always'
+        )
+        if config['DB_STATEMENT_TIMEOUT_MS']:
+            options['connect_args'] = {'options': f"-c statement_timeout={config['DB_STATEMENT_TIMEOUT_MS']}"}
+    return options
+
+def configure(app):
+    """Merge pool options into SQLALCHEMY_ENGINE_OPTIONS; call before db.init_app"""
+    config = app.config
+    if config['DB_POOL_PRE_PING'] not in ('always', 'idle', 'off'):
+        raise ValueError("DB_POOL_PRE_PING must be 'always', 'idle' or 'off'")
+    _settings.update(
+        ping=config['DB_POOL_PRE_PING'],
+        ping_idle_seconds=config['DB_POOL_PING_IDLE_SECONDS'],
+        statement_timeout_ms=config['DB_STATEMENT_TIMEOUT_MS'],
+        pgbouncer=config['DB_PGBOUNCER']
+    )
+    config['SQLALCHEMY_ENGINE_OPTIONS'] = {**engine_options(config), **config.get('SQLALCHEMY_ENGINE_OPTIONS', {})}
+
+@event.listens_for(InstrumentedQueuePool, 'checkin')
+def _remember_checkin(dbapi_connection, connection_record):
+    if connection_record is not None:
+        connection_record.info['checked_in_at'] = time.monotonic()
+
+@event.listens_for(InstrumentedQueuePool, 'checkout')
+def _ping_if_idle(dbapi_connection, connection_record, connection_proxy):
+    """Ping only connections that sat idle long enough to have been dropped"""
+    if _settings['ping'] != 'idle':
+        return
+    checked_in_at = connection_record.info.get('checked_in_at')
+    if checked_in_at is None or time.monotonic() - checked_in_at < _settings['ping_idle_seconds']:
+        return
+    connection_proxy._pool.metrics.count('pings')
+    try:
+        cursor = dbapi_connection.cursor()
+        cursor.execute('SELECT 1')
+        cursor.close()
+        dbapi_connection.rollback()
+    except Exception:
+        # The pool discards this connection and retries with a fresh one
+        raise exc.DisconnectionError()
+
+@event.listens_for(InstrumentedQueuePool, 'invalidate')
+@event.listens_for(InstrumentedNullPool, 'invalidate')
+def _count_invalidation(dbapi_connection, connection_record, exception):
+    pool = getattr(connection_record, '_ConnectionRecord__pool', None)
+    if pool is not None:
+        pool.metrics.count('invalidated')
+
+@event.listens_for(Engine, 'begin')
+def _transaction_statement_timeout(conn):
+    # Transaction pooling cannot carry session settings, so set the timeout per transaction
+    if _settings['pgbouncer'] and _settings['statement_timeout_ms']:
+        cursor = conn.connection.dbapi_connection.cursor()
+        cursor.execute(f"SET LOCAL statement_timeout = {int(_settings['statement_timeout_ms'])}")
+        cursor.close()
+
+def pool_status(engine):
+    """Live pool state plus checkout telemetry for the diagnostics endpoint"""
+    pool = engine.pool
+    status = {'pool': type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        status.update(
+            size=pool.size(),
+            checked_out=pool.checkedout(),
+            checked_in=pool.checkedin(),
+            overflow=max(pool.overflow(), 0),
+            max_overflow=pool._max_overflow
+        )
+    if isinstance(pool, _TimedCheckout):
+        status.update(pool.metrics.snapshot())
+    return status
@@ -0,0 +1,156 @@
+"""
+Read/write routing for GearGuard
+Sends read-only views and reports to lag-checked PostgreSQL replicas, everything else to the primary
+"""
+
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from flask import current_app, g, has_app_context, has_request_context, session as http_session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import create_engine, event, text
+
+_replica_reads = ContextVar('replica_reads', default=False)
+
+LAG_SQL = text("""
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+""")
+
+@contextmanager
+def replica_reads():
+    """Allow SELECTs in this block (or decorated view) to go to a replica.
+
+    Works as `with replica_reads():` in scripts and as `@replica_reads()` on
+    views. Writes, SELECT ... FOR UPDATE and reads after the session has
+    flushed still use the primary.
+    """
+    token = _replica_reads.set(True)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+class ReplicaSet:
+    """Replica engines with cached lag measurements and round-robin selection"""
+
+    def __init__(self, uris, engine_options, max_lag, check_interval):
+        self.uris = list(uris)
+        self.engines = [create_engine(uri, **engine_options) for uri in self.uris]
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self._lag = {}
+        self._lock = threading.Lock()
+        self._order = itertools.count()
+
+    def _measure_lag(self, index):
+        with self.engines[index].connect() as conn:
+            return float(conn.execute(LAG_SQL).scalar())
+
+    def lag(self, index):
+        """Replication lag in seconds, re-measured every check_interval; None when unreachable"""
+        now = time.monotonic()
+        checked = self._lag.get(index)
+        if checked and now - checked[0] < self.check_interval:
+            return checked[1]
+        try:
+            lag = self._measure_lag(index)
+        except Exception as e:
+            current_app.logger.warning(f'Replica {index} lag check failed: {str(e)}')
+            lag = None
+        with self._lock:
+            self._lag[index] = (now, lag)
+        return lag
+
+    def choose(self):
+        """Next replica within max_lag, or None to fall back to the primary"""
+        if not self.engines:
+            return None
+        start = next(self._order)
+        for offset in range(len(self.engines)):
+            index = (start + offset) % len(self.engines)
+            lag = self.lag(index)
+            if lag is not None and lag <= self.max_lag:
+                return self.engines[index]
+        return None
+
+    def status(self):
+        """Replica health for the diagnostics endpoint"""
+        return [{
+            'replica': index,
+            'host': engine.url.host,
+            'lag_seconds': self._lag.get(index, (None, None))[1],
+            'max_lag_seconds': self.max_lag
+        } for index, engine in enumerate(self.engines)]
+
+def get_replicas():
+    return current_app.extensions.get('db_replicas')
+
+def _pinned_to_primary():
+    if not has_request_context():
+        return False
+    return g.get('db_wrote', False) or http_session.get('_primary_until', 0) > time.time()
+
+class RoutingSession(Session):
+    """Flask-SQLAlchemy session that can route plain SELECTs to a replica"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and self._can_use_replica(clause):
+            engine = get_replicas().choose()
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def _can_use_replica(self, clause):
+        if not _replica_reads.get() or not has_app_context() or not get_replicas():
+            return False
+        if self._flushing or self.info.get('wrote'):
+            # Read our own writes from the primary for the rest of the session
+            return False
+        if clause is None or not getattr(clause, 'is_select', False):
+            return False
+        if getattr(clause, '_for_update_arg', None) is not None:
+            return False
+        return not _pinned_to_primary()
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _mark_write(session, flush_context):
+    session.info['wrote'] = True
+
+@event.listens_for(RoutingSession, 'do_orm_execute')
+def _mark_bulk_write(orm_execute_state):
+    if orm_execute_state.is_update or orm_execute_state.is_delete or orm_execute_state.is_insert:
+        orm_execute_state.session.info['wrote'] = True
+
+@event.listens_for(RoutingSession, 'after_commit')
+def _pin_after_write(session):
+    if session.info.pop('wrote', False) and has_request_context():
+        g.db_wrote = True
+
+@event.listens_for(RoutingSession, 'after_rollback')
+def _forget_write(session):
+    session.info.pop('wrote', None)
+
+def init_app(app):
+    """Create replica engines from config and pin writers' next requests to the primary"""
+    uris = app.config['SQLALCHEMY_REPLICA_URIS']
+    if not uris:
+        return
+    app.extensions['db_replicas'] = ReplicaSet(
+        uris,
+        app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {}),
+        app.config['REPLICA_MAX_LAG_SECONDS'],
+        app.config['REPLICA_LAG_CHECK_INTERVAL']
+    )
+
+    @app.after_request
+    def pin_primary_after_write(response):
+        # The redirect after a POST must not show data from before the write
+        if g.get('db_wrote'):
+            http_session['_primary_until'] = time.time() + app.config['REPLICA_PIN_SECONDS']
+        return response
@@ -0,0 +1,34 @@
+"""
+Database helpers for GearGuard
+Bulk loading utilities shared by ingest and import jobs
+"""
+
+import csv
+import io
+from models import db
+
+def copy_rows(table_name, columns, rows):
+    """Load rows into a table with PostgreSQL COPY inside the current session transaction.
+
+    Rows are sequences matching `columns`; None and empty strings load as NULL.
+    Returns the number of rows copied.
+    """
+    if not rows:
+        return 0
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerows(rows)
+    buffer.seek(0)
+
+    column_list = ', '.join(columns)
+    cursor = db.session.connection().connection.cursor()
+    try:
+        cursor.copy_expert(f'COPY {table_name} ({column_list}) FROM STDIN WITH (FORMAT csv)', buffer)
+    finally:
+        cursor.close()
+    return len(rows)
+
+def violated_constraint(error):
+    """Name of the constraint behind an IntegrityError, when the driver reports it"""
+    diag = getattr(error.orig, 'diag', None)
+    return getattr(diag, 'constraint_name', None)
@@ -3,7 +3,8 @@ Decorators for role-based access control
 """
 
 from functools import wraps
-from flask import redirect, url_for, flash
+import hmac
+from flask import redirect, url_for, flash, request, jsonify, current_app
 from flask_login import current_user
 
 def admin_required(f):
@@ -29,4 +30,40 @@ def user_or_admin_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+def api_token_required(config_key, allow_users=False):
+    """Decorator for machine-facing endpoints.
 
+    Accepts the token configured under config_key in the X-API-Token header,
+    or a logged-in administrator (any logged-in user when allow_users is set).
+    Responds with JSON instead of redirecting.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            expected = current_app.config.get(config_key)
+            supplied = request.headers.get('X-API-Token')
+            if expected and supplied and hmac.compare_digest(supplied, expected):
+                return f(*args, **kwargs)
+            if current_user.is_authenticated and (allow_users or current_user.is_admin):
+                return f(*args, **kwargs)
+            return jsonify({'error': 'Invalid or missing API token'}), 401
+        return decorated_function
+    return decorator
+
+
+def json_login_required(admin=False):
+    """Decorator for JSON endpoints called from pages.
+
+    Like login_required (admin_required when admin is set), but answers
+    401/403 with a JSON error instead of redirecting to an HTML page.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if not current_user.is_authenticated:
+                return jsonify({'error': 'Please log in'}), 401
+            if admin and not current_user.is_admin:
+                return jsonify({'error': 'Administrator privileges required'}), 403
+            return f(*args, **kwargs)
+        return decorated_function
+    return decorator
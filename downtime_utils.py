@@ -0,0 +1,168 @@
+"""
+Downtime and availability calculations for GearGuard
+Merges overlapping repair intervals per equipment so downtime is never double-counted
+"""
+
+from datetime import datetime
+import numpy as np
+from sqlalchemy import or_
+from models import db, MaintenanceEquipment, request_history
+
+GROUP_COLUMNS = {
+    'equipment': MaintenanceEquipment.id,
+    'work_center': MaintenanceEquipment.work_center_id,
+    'category': MaintenanceEquipment.category_id,
+}
+
+def merge_intervals(intervals):
+    """Merge overlapping (start, end) intervals with a sort-and-sweep pass"""
+    merged = []
+    for start, end in sorted(intervals):
+        if end <= start:
+            continue
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1][1] = end
+        else:
+            merged.append([start, end])
+    return [tuple(interval) for interval in merged]
+
+def fetch_downtime_intervals(window_start, window_end, equipment_ids=None):
+    """Load repair intervals overlapping the window as (equipment_ids, starts, ends) arrays.
+
+    Times are seconds relative to window_start and clipped to the window.
+    Requests still being worked on count as down until now.
+    """
+    now = datetime.utcnow()
+    # Closed work may have been archived, so read from the history view
+    history = request_history.c
+    query = db.session.query(
+        history.equipment_id,
+        history.start_date,
+        history.end_date
+    ).filter(
+        history.start_date.isnot(None),
+        history.start_date < window_end,
+        or_(history.end_date.is_(None), history.end_date > window_start)
+    )
+    if equipment_ids is not None:
+        query = query.filter(history.equipment_id.in_(list(equipment_ids)))
+
+    rows = query.all()
+    window_seconds = (window_end - window_start).total_seconds()
+    eq_ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+    starts = np.fromiter(((row[1] - window_start).total_seconds() for row in rows), dtype=np.float64, count=len(rows))
+    ends = np.fromiter(((min(row[2] or now, window_end) - window_start).total_seconds() for row in rows), dtype=np.float64, count=len(rows))
+
+    np.clip(starts, 0, window_seconds, out=starts)
+    np.clip(ends, 0, window_seconds, out=ends)
+    return eq_ids, starts, ends
+
+def merged_downtime(eq_ids, starts, ends, window_seconds):
+    """Merge intervals for the whole fleet in one vectorized pass.
+
+    Each equipment is shifted onto its own stretch of a single timeline, so a
+    global running maximum of end times acts as the per-equipment sweep.
+    Returns (unique_equipment_ids, downtime_seconds).
+    """
+    if len(eq_ids) == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+
+    unique_ids, codes = np.unique(eq_ids, return_inverse=True)
+    offset = codes * (window_seconds + 1.0)
+    shifted_starts = starts + offset
+    shifted_ends = np.maximum(ends, starts) + offset
+
+    order = np.argsort(shifted_starts, kind='stable')
+    shifted_starts = shifted_starts[order]
+    shifted_ends = shifted_ends[order]
+    codes = codes[order]
+
+    running_end = np.maximum.accumulate(shifted_ends)
+    block_starts = np.empty(len(order), dtype=bool)
+    block_starts[0] = True
+    block_starts[1:] = shifted_starts[1:] > running_end[:-1]
+
+    first = np.flatnonzero(block_starts)
+    block_lengths = np.maximum.reduceat(shifted_ends, first) - shifted_starts[first]
+    downtime = np.bincount(codes[first], weights=block_lengths, minlength=len(unique_ids))
+    return unique_ids, downtime
+
+def equipment_downtime(equipment_id, window_start, window_end):
+    """Total merged downtime in hours for a single equipment"""
+    eq_ids, starts, ends = fetch_downtime_intervals(window_start, window_end, [equipment_id])
+    merged = merge_intervals(zip(starts.tolist(), ends.tolist()))
+    return sum(end - start for start, end in merged) / 3600.0
+
+def equipment_availability(equipment_id, window_start, window_end):
+    """Availability percentage for a single equipment over the window"""
+    window_hours = (window_end - window_start).total_seconds() / 3600.0
+    if window_hours <= 0:
+        return 100.0
+    downtime_hours = equipment_downtime(equipment_id, window_start, window_end)
+    return round(max(0.0, 100.0 * (1 - downtime_hours / window_hours)), 2)
+
+def availability_report(window_start, window_end, group_by='equipment', include_scrap=False):
+    """Availability per equipment, work center or category over the window.
+
+    Group availability is total up-time divided by total scheduled time of
+    all equipment in the group.
+    """
+    if group_by not in GROUP_COLUMNS:
+        raise ValueError(f"Unsupported group_by '{group_by}'. Use one of: {', '.join(GROUP_COLUMNS)}")
+
+    window_seconds = (window_end - window_start).total_seconds()
+    if window_seconds <= 0:
+        raise ValueError('Window end must be after window start')
+
+    fleet_query = db.session.query(MaintenanceEquipment.id, GROUP_COLUMNS[group_by])
+    if not include_scrap:
+        fleet_query = fleet_query.filter(MaintenanceEquipment.scrap == False)
+    fleet = fleet_query.all()
+    if not fleet:
+        return []
+
+    fleet_ids = np.fromiter((row[0] for row in fleet), dtype=np.int64, count=len(fleet))
+    group_keys = np.fromiter((row[1] if row[1] is not None else -1 for row in fleet), dtype=np.int64, count=len(fleet))
+
+    eq_ids, starts, ends = fetch_downtime_intervals(window_start, window_end)
+    down_ids, down_seconds = merged_downtime(eq_ids, starts, ends, window_seconds)
+
+    # Align per-equipment downtime with the fleet (equipment without requests has none)
+    fleet_downtime = np.zeros(len(fleet_ids), dtype=np.float64)
+    if len(down_ids):
+        positions = np.searchsorted(down_ids, fleet_ids)
+        positions = np.minimum(positions, len(down_ids) - 1)
+        matched = down_ids[positions] == fleet_ids
+        fleet_downtime[matched] = down_seconds[positions[matched]]
+
+    groups, group_codes = np.unique(group_keys, return_inverse=True)
+    group_downtime = np.bincount(group_codes, weights=fleet_downtime, minlength=len(groups))
+    group_sizes = np.bincount(group_codes, minlength=len(groups))
+    availability = 100.0 * (1 - group_downtime / (group_sizes * window_seconds))
+
+    names = _group_names(group_by, [int(key) for key in groups if key != -1])
+    report = []
+    for key, downtime, size, percent in zip(groups.tolist(), group_downtime.tolist(), group_sizes.tolist(), availability.tolist()):
+        report.append({
+            'id': key if key != -1 else None,
+            'name': names.get(key, 'Unassigned'),
+            'equipment_count': size,
+            'downtime_hours': round(downtime / 3600.0, 2),
+            'availability': round(max(0.0, percent), 2)
+        })
+    report.sort(key=lambda row: row['availability'])
+    return report
+
+def _group_names(group_by, ids):
+    """Look up display names for report groups"""
+    from models import WorkCenter, MaintenanceCategory
+    model = {
+        'equipment': MaintenanceEquipment,
+        'work_center': WorkCenter,
+        'category': MaintenanceCategory,
+    }[group_by]
+    if not ids:
+        return {}
+    rows = db.session.query(model.id, model.name).filter(model.id.in_(ids)).all()
+    return {row[0]: row[1] for row in rows}
@@ -8,6 +8,7 @@ from flask_mail import Message
 from app import app, mail
 from models import db, OTP, User
 from datetime import datetime, timedelta
+from sqlalchemy import update, delete
 import random
 import string
 
@@ -17,10 +18,10 @@ def generate_otp(length=6):
 
 def create_otp(email, purpose='password_reset'):
     """Create and store OTP in database"""
-    # Invalidate any existing OTPs for this email and purpose
-    existing_otps = OTP.query.filter_by(email=email, purpose=purpose, used=False).all()
-    for otp in existing_otps:
-        otp.used = True
+    # Invalidate any existing OTPs for this email and purpose in one statement
+    OTP.query.filter_by(email=email, purpose=purpose, used=False).update(
+        {'used': True}, synchronize_session=False
+    )
     
     # Create new OTP
     otp_code = generate_otp()
@@ -38,25 +39,38 @@ def create_otp(email, purpose='password_reset'):
     return otp_code
 
 def verify_otp(email, otp_code, purpose='password_reset'):
-    """Verify OTP code"""
-    otp = OTP.query.filter_by(
-        email=email,
-        otp_code=otp_code,
-        purpose=purpose,
-        used=False
-    ).order_by(OTP.created_at.desc()).first()
-    
-    if not otp:
-        return False
-    
-    if not otp.is_valid():
-        return False
-    
-    # Mark as used
-    otp.used = True
+    """Verify OTP code and consume it.
+
+    The check and the update are a single UPDATE ... RETURNING, so when two
+    requests race with the same code only one of them succeeds.
+    """
+    stmt = update(OTP).where(
+        OTP.email == email,
+        OTP.purpose == purpose,
+        OTP.used == False,
+        OTP.otp_code == otp_code,
+        OTP.expires_at > datetime.utcnow()
+    ).values(used=True).returning(OTP.id).execution_options(synchronize_session=False)
+    otp_id = db.session.execute(stmt).scalar()
     db.session.commit()
     
-    return True
+    return otp_id is not None
+
+def purge_expired_otps(batch_size=None):
+    """Delete expired OTPs in small batches so the purge never holds long locks.
+
+    Returns the number of rows deleted.
+    """
+    batch_size = batch_size or app.config['OTP_PURGE_BATCH_SIZE']
+    cutoff = datetime.utcnow()
+    expired = db.select(OTP.id).where(OTP.expires_at < cutoff).limit(batch_size).scalar_subquery()
+    deleted = 0
+    while True:
+        result = db.session.execute(delete(OTP).where(OTP.id.in_(expired)).execution_options(synchronize_session=False))
+        db.session.commit()
+        deleted += result.rowcount
+        if result.rowcount < batch_size:
+            return deleted
 
 def send_email(subject, recipients, template, company=None, **kwargs):
     """Send email using Flask-Mail with company-specific or global configuration"""
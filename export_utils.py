@@ -0,0 +1,262 @@
+"""
+Export utilities for GearGuard
+Streams equipment and request rows as CSV or XLSX using server-side cursors
+"""
+
+import csv
+import io
+import re
+import zipfile
+from datetime import date, datetime
+from decimal import Decimal
+from xml.sax.saxutils import escape
+from flask import Response, stream_with_context
+from sqlalchemy import func
+from sqlalchemy.orm import aliased
+from models import (
+    db, User, Department, MaintenanceCategory, MaintenanceTeam,
+    MaintenanceEquipment, MaintenanceRequest, Company, WorkCenter
+)
+
+YIELD_PER = 2000
+CHUNK_ROWS = 500
+XLSX_MAX_ROWS = 1048576  # Excel's per-sheet limit, header row included
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+}
+
+def _user_name(user):
+    return func.coalesce(user.full_name, user.username)
+
+def equipment_export_query(criteria, order_by):
+    """Equipment rows as flat tuples with related names resolved in SQL.
+
+    Returns (headers, query); the query streams through a server-side
+    cursor, and only plain columns are selected so no ORM objects pile up
+    in the session while exporting.
+    """
+    technician = aliased(User)
+    owner = aliased(User)
+    columns = [
+        ('ID', MaintenanceEquipment.id),
+        ('Name', MaintenanceEquipment.name),
+        ('Serial Number', MaintenanceEquipment.serial_number),
+        ('Category', MaintenanceCategory.name),
+        ('Company', Company.name),
+        ('Department', Department.name),
+        ('Team', MaintenanceTeam.name),
+        ('Technician', _user_name(technician)),
+        ('Owner', _user_name(owner)),
+        ('Work Center', WorkCenter.name),
+        ('Location', MaintenanceEquipment.location),
+        ('Used In Location', MaintenanceEquipment.used_in_location),
+        ('Purchase Date', MaintenanceEquipment.purchase_date),
+        ('Assigned Date', MaintenanceEquipment.assigned_date),
+        ('Health %', MaintenanceEquipment.health_percentage),
+        ('Risk Score', MaintenanceEquipment.risk_score),
+        ('Scrap', MaintenanceEquipment.scrap),
+        ('Scrap Date', MaintenanceEquipment.scrap_date),
+        ('Created At', MaintenanceEquipment.created_at)
+    ]
+    query = db.session.query(*[column for _, column in columns]) \
+        .select_from(MaintenanceEquipment) \
+        .outerjoin(MaintenanceCategory, MaintenanceEquipment.category_id == MaintenanceCategory.id) \
+        .outerjoin(Company, MaintenanceEquipment.company_id == Company.id) \
+        .outerjoin(Department, MaintenanceEquipment.department_id == Department.id) \
+        .outerjoin(MaintenanceTeam, MaintenanceEquipment.team_id == MaintenanceTeam.id) \
+        .outerjoin(technician, MaintenanceEquipment.technician_id == technician.id) \
+        .outerjoin(owner, MaintenanceEquipment.owner_id == owner.id) \
+        .outerjoin(WorkCenter, MaintenanceEquipment.work_center_id == WorkCenter.id) \
+        .filter(*criteria).order_by(*order_by)
+    return [header for header, _ in columns], query.yield_per(YIELD_PER)
+
+def request_export_query(criteria, order_by):
+    """Maintenance request rows as flat tuples; see equipment_export_query"""
+    technician = aliased(User)
+    assigned = aliased(User)
+    columns = [
+        ('Reference', MaintenanceRequest.name),
+        ('Subject', MaintenanceRequest.subject),
+        ('Type', MaintenanceRequest.request_type),
+        ('Stage', MaintenanceRequest.stage),
+        ('Equipment', MaintenanceEquipment.name),
+        ('Serial Number', MaintenanceEquipment.serial_number),
+        ('Category', MaintenanceCategory.name),
+        ('Team', MaintenanceTeam.name),
+        ('Technician', _user_name(technician)),
+        ('Assigned User', _user_name(assigned)),
+        ('Work Center', WorkCenter.name),
+        ('Scheduled Date', MaintenanceRequest.scheduled_date),
+        ('Duration (h)', MaintenanceRequest.duration),
+        ('Start Date', MaintenanceRequest.start_date),
+        ('End Date', MaintenanceRequest.end_date),
+        ('Created At', MaintenanceRequest.created_at)
+    ]
+    query = db.session.query(*[column for _, column in columns]) \
+        .select_from(MaintenanceRequest) \
+        .join(MaintenanceEquipment, MaintenanceRequest.equipment_id == MaintenanceEquipment.id) \
+        .outerjoin(MaintenanceCategory, MaintenanceRequest.category_id == MaintenanceCategory.id) \
+        .outerjoin(MaintenanceTeam, MaintenanceRequest.team_id == MaintenanceTeam.id) \
+        .outerjoin(technician, MaintenanceRequest.technician_id == technician.id) \
+        .outerjoin(assigned, MaintenanceRequest.assigned_user_id == assigned.id) \
+        .outerjoin(WorkCenter, MaintenanceRequest.work_center_id == WorkCenter.id) \
+        .filter(*criteria).order_by(*order_by)
+    return [header for header, _ in columns], query.yield_per(YIELD_PER)
+
+def _csv_value(value):
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    if isinstance(value, str) and value[:1] in ('=', '+', '-', '@', '\t', '\r'):
+        # Keep spreadsheet apps from evaluating user-entered text as a formula
+        return "'" + value
+    return value
+
+def stream_csv(headers, rows):
+    """Yield CSV text in chunks of CHUNK_ROWS rows"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(headers)
+    for count, row in enumerate(rows, 1):
+        writer.writerow([_csv_value(value) for value in row])
+        if count % CHUNK_ROWS == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+_ILLEGAL_XML = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+def _column_letter(index):
+    letters = ''
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(65 + remainder) + letters
+    return letters
+
+def _xlsx_cell(ref, value):
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return f'<c r="{ref}" t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float, Decimal)):
+        return f'<c r="{ref}"><v>{value}</v></c>'
+    if isinstance(value, datetime):
+        value = value.strftime('%Y-%m-%d %H:%M:%S')
+    elif isinstance(value, date):
+        value = value.isoformat()
+    text = escape(_ILLEGAL_XML.sub('', str(value)))
+    return f'<c r="{ref}" t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+def _xlsx_row(number, letters, values):
+    cells = ''.join(_xlsx_cell(f'{letter}{number}', value) for letter, value in zip(letters, values))
+    return f'<row r="{number}">{cells}</row>'
+
+class _StreamSink:
+    """Write-only file object zipfile can target; drained after every chunk"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+_SHEET_START = ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>')
+_SHEET_END = '</sheetData></worksheet>'
+
+def _xlsx_parts(sheet_count, sheet_name):
+    """Workbook, relationship and content type parts, written once the sheet count is known"""
+    names = [sheet_name if sheet_count == 1 else f'{sheet_name} {i}' for i in range(1, sheet_count + 1)]
+    sheets = ''.join(f'<sheet name="{escape(name)}" sheetId="{i}" r:id="rId{i}"/>' for i, name in enumerate(names, 1))
+    sheet_rels = ''.join(
+        f'<Relationship Id="rId{i}" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        f'Target="worksheets/sheet{i}.xml"/>' for i in range(1, sheet_count + 1))
+    overrides = ''.join(
+        f'<Override PartName="/xl/worksheets/sheet{i}.xml" '
+        f'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        for i in range(1, sheet_count + 1))
+    header = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    return {
+        '[Content_Types].xml': header +
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/xl/workbook.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+            + overrides + '</Types>',
+        '_rels/.rels': header +
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+            'Target="xl/workbook.xml"/></Relationships>',
+        'xl/workbook.xml': header +
+            '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+            'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+            f'<sheets>{sheets}</sheets></workbook>',
+        'xl/_rels/workbook.xml.rels': header +
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            + sheet_rels + '</Relationships>'
+    }
+
+def stream_xlsx(headers, rows, sheet_name='Export'):
+    """Yield an XLSX workbook built row by row.
+
+    Cells use inline strings so no shared-string table has to be held in
+    memory; the zip is written without seeking, and exports larger than one
+    sheet allows continue on further sheets.
+    """
+    sink = _StreamSink()
+    letters = [_column_letter(i) for i in range(len(headers))]
+    archive = zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_DEFLATED)
+    sheet_count = 0
+    sheet = None
+    row_number = XLSX_MAX_ROWS
+    for count, row in enumerate(rows, 1):
+        if row_number >= XLSX_MAX_ROWS:
+            if sheet:
+                sheet.write(_SHEET_END.encode())
+                sheet.close()
+            sheet_count += 1
+            sheet = archive.open(f'xl/worksheets/sheet{sheet_count}.xml', 'w', force_zip64=True)
+            sheet.write((_SHEET_START + _xlsx_row(1, letters, headers)).encode())
+            row_number = 1
+        row_number += 1
+        sheet.write(_xlsx_row(row_number, letters, row).encode())
+        if count % CHUNK_ROWS == 0:
+            yield sink.drain()
+    if sheet is None:
+        sheet_count = 1
+        sheet = archive.open('xl/worksheets/sheet1.xml', 'w')
+        sheet.write((_SHEET_START + _xlsx_row(1, letters, headers)).encode())
+    sheet.write(_SHEET_END.encode())
+    sheet.close()
+    for name, content in _xlsx_parts(sheet_count, sheet_name).items():
+        archive.writestr(name, content)
+    archive.close()
+    yield sink.drain()
+
+def export_response(fmt, filename, headers, rows, sheet_name='Export'):
+    """Streaming download response; the generator keeps the request context for the cursor"""
+    # Execute now so the query runs under the view's routing (replica) context
+    rows = iter(rows)
+    if fmt == 'xlsx':
+        body = stream_xlsx(headers, rows, sheet_name)
+    else:
+        body = stream_csv(headers, rows)
+    stamp = datetime.utcnow().strftime('%Y%m%d-%H%M')
+    return Response(
+        stream_with_context(body),
+        mimetype=EXPORT_FORMATS[fmt],
+        headers={'Content-Disposition': f'attachment; filename="{filename}-{stamp}.{fmt}"'}
+    )
@@ -0,0 +1,237 @@
+"""
+Fragment caching for GearGuard
+{% cache %} template blocks kept in an in-process LRU, optionally shared through a directory or PostgreSQL
+"""
+
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app
+from jinja2 import nodes
+from jinja2.ext import Extension
+from markupsafe import Markup
+from sqlalchemy import text
+from models import db
+from http_cache_utils import version_tag
+from tenant_utils import current_tenant
+
+class MemoryStore:
+    """Per-process LRU of rendered fragments"""
+
+    def __init__(self, maxsize=512):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, html, ttl):
+        with self._lock:
+            self._entries[key] = (time.time() + ttl, html)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def purge(self):
+        now = time.time()
+        with self._lock:
+            stale = [key for key, (expires_at, _) in self._entries.items() if expires_at < now]
+            for key in stale:
+                del self._entries[key]
+        return len(stale)
+
+class FileStore:
+    """Fragments shared by the workers of one host, one file per key"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, f'{key}.html')
+
+    def get(self, key):
+        try:
+            with open(self._path(key), encoding='utf-8') as f:
+                expires_at = float(f.readline())
+                if expires_at >= time.time():
+                    return f.read()
+        except (OSError, ValueError):
+            return None
+        return None
+
+    def set(self, key, html, ttl):
+        # Write to a temporary file and rename, so readers never see a partial fragment
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(f'{time.time() + ttl}\n{html}')
+        os.replace(temp_path, self._path(key))
+
+    def purge(self):
+        removed = 0
+        now = time.time()
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            try:
+                if name.endswith('.tmp'):
+                    # Left behind by a worker that died mid-write
+                    expired = os.path.getmtime(path) < now - 3600
+                else:
+                    with open(path, encoding='utf-8') as f:
+                        expired = float(f.readline()) < now
+                if expired:
+                    os.remove(path)
+                    removed += 1
+            except (OSError, ValueError):
+                continue
+        return removed
+
+class PostgresStore:
+    """Fragments shared by all workers in the fragment_cache_entry table.
+
+    Uses its own connections so cache traffic never joins the request's
+    transaction.
+    """
+
+    GET_SQL = text("SELECT html FROM fragment_cache_entry WHERE key = :key AND expires_at >= :now")
+    SET_SQL = text("""
+        INSERT INTO fragment_cache_entry (key, html, expires_at) VALUES (:key, :html, :expires_at)
+        ON CONFLICT (key) DO UPDATE SET html = EXCLUDED.html, expires_at = EXCLUDED.expires_at
+    """)
+
+    def get(self, key):
+        with db.engine.connect() as conn:
+            return conn.execute(self.GET_SQL, {'key': key, 'now': time.time()}).scalar()
+
+    def set(self, key, html, ttl):
+        with db.engine.begin() as conn:
+            conn.execute(self.SET_SQL, {'key': key, 'html': html, 'expires_at': time.time() + ttl})
+
+    def purge(self):
+        with db.engine.begin() as conn:
+            result = conn.execute(text("DELETE FROM fragment_cache_entry WHERE expires_at < :now"), {'now': time.time()})
+        return result.rowcount
+
+class FragmentCache:
+    """In-process LRU in front of an optional shared store"""
+
+    def __init__(self, local, shared=None):
+        self.local = local
+        self.shared = shared
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        html = self.local.get(key)
+        if html is None and self.shared is not None:
+            try:
+                html = self.shared.get(key)
+            except Exception as e:
+                current_app.logger.warning(f'Shared fragment cache read failed: {str(e)}')
+                html = None
+            if html is not None:
+                self.local.set(key, html, current_app.config['FRAGMENT_CACHE_TTL'])
+        if html is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return html
+
+    def set(self, key, html, ttl):
+        self.local.set(key, html, ttl)
+        if self.shared is not None:
+            try:
+                self.shared.set(key, html, ttl)
+            except Exception as e:
+                current_app.logger.warning(f'Shared fragment cache write failed: {str(e)}')
+
+    def purge(self):
+        removed = self.local.purge()
+        if self.shared is not None:
+            removed += self.shared.purge()
+        return removed
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'local_entries': len(self.local)}
+
+def get_cache():
+    """Cache configured by FRAGMENT_CACHE_*, created once per app"""
+    cache = current_app.extensions.get('fragment_cache')
+    if cache is None:
+        config = current_app.config
+        shared = None
+        if config['FRAGMENT_CACHE_SHARED'] == 'file':
+            shared = FileStore(config['FRAGMENT_CACHE_DIR'])
+        elif config['FRAGMENT_CACHE_SHARED'] == 'postgres':
+            shared = PostgresStore()
+        cache = FragmentCache(MemoryStore(config['FRAGMENT_CACHE_SIZE']), shared)
+        current_app.extensions['fragment_cache'] = cache
+    return cache
+
+def fragment_key(name, depends, vary):
+    """Key for a fragment: changes when any table it depends on is committed to.
+
+    The tenant is part of every key, so scoped users never see another
+    company's fragment.
+    """
+    parts = (name, current_tenant(), version_tag(*depends), tuple(vary))
+    return hashlib.sha1(repr(parts).encode()).hexdigest()
+
+def cached_fragment(name, depends, vary, render):
+    """Rendered fragment from the cache, or render() it and store the result"""
+    ttl = current_app.config['FRAGMENT_CACHE_TTL']
+    if ttl <= 0:
+        return render()
+    cache = get_cache()
+    key = fragment_key(name, depends, vary)
+    html = cache.get(key)
+    if html is None:
+        html = str(render())
+        cache.set(key, html, ttl)
+    return html
+
+class FragmentCacheExtension(Extension):
+    """{% cache 'name', depends=('table', ...), vary=(value, ...) %} ... {% endcache %}
+
+    depends lists the tables the block reads; vary lists request values that
+    change its output (search text, sort order). Queries belong inside the
+    block, through loaders passed by the view, so a hit skips them too.
+    """
+
+    tags = {'cache'}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        args = [parser.parse_expression()]
+        kwargs = []
+        while parser.stream.skip_if('comma'):
+            key = parser.stream.expect('name').value
+            parser.stream.expect('assign')
+            kwargs.append(nodes.Keyword(key, parser.parse_expression()))
+        body = parser.parse_statements(('name:endcache',), drop_needle=True)
+        return nodes.CallBlock(self.call_method('_render', args, kwargs), [], [], body).set_lineno(lineno)
+
+    def _render(self, name, depends=(), vary=(), caller=None):
+        return Markup(cached_fragment(name, depends, vary, caller))
+
+def purge_fragment_cache():
+    """Background job: drop expired fragments"""
+    return get_cache().purge()
+
+def init_app(app):
+    app.jinja_env.add_extension(FragmentCacheExtension)
@@ -0,0 +1,174 @@
+"""
+Equipment health history for GearGuard
+Downsamples raw health points into minute, hour and day rollups and serves trend data
+"""
+
+from datetime import datetime, timedelta
+from sqlalchemy import func, literal
+from sqlalchemy.dialects.postgresql import insert
+from models import db, EquipmentHealthPoint, EquipmentHealthRollup
+
+# (resolution, bucket size, how long the level is kept); None keeps it forever
+ROLLUP_LEVELS = (
+    ('minute', timedelta(minutes=1), timedelta(days=30)),
+    ('hour', timedelta(hours=1), timedelta(days=365)),
+    ('day', timedelta(days=1), None),
+)
+RAW_RETENTION = timedelta(days=7)
+MAX_CHART_POINTS = 1000
+
+def bucket_start(value, resolution):
+    """Start of the minute, hour or day bucket containing value"""
+    if resolution == 'minute':
+        return value.replace(second=0, microsecond=0)
+    if resolution == 'hour':
+        return value.replace(minute=0, second=0, microsecond=0)
+    if resolution == 'day':
+        return value.replace(hour=0, minute=0, second=0, microsecond=0)
+    raise ValueError(f'Unknown resolution: {resolution}')
+
+def _rollup_from_raw(resolution, until):
+    """Aggregate raw points of closed buckets into the first rollup level"""
+    last = db.session.query(func.max(EquipmentHealthRollup.bucket)).filter(
+        EquipmentHealthRollup.resolution == resolution
+    ).scalar()
+    bucket = func.date_trunc(resolution, EquipmentHealthPoint.recorded_at)
+    select = db.session.query(
+        EquipmentHealthPoint.equipment_id,
+        literal(resolution),
+        bucket,
+        func.min(EquipmentHealthPoint.value),
+        func.max(EquipmentHealthPoint.value),
+        func.avg(EquipmentHealthPoint.value),
+        func.count(EquipmentHealthPoint.id)
+    ).filter(EquipmentHealthPoint.recorded_at < until)
+    if last:
+        select = select.filter(EquipmentHealthPoint.recorded_at >= last)
+    return select.group_by(EquipmentHealthPoint.equipment_id, bucket)
+
+def _rollup_from_level(source, resolution, until):
+    """Aggregate a finer rollup level into a coarser one, weighting averages by sample count"""
+    last = db.session.query(func.max(EquipmentHealthRollup.bucket)).filter(
+        EquipmentHealthRollup.resolution == resolution
+    ).scalar()
+    bucket = func.date_trunc(resolution, EquipmentHealthRollup.bucket)
+    total = func.sum(EquipmentHealthRollup.sample_count)
+    select = db.session.query(
+        EquipmentHealthRollup.equipment_id,
+        literal(resolution),
+        bucket,
+        func.min(EquipmentHealthRollup.min_value),
+        func.max(EquipmentHealthRollup.max_value),
+        func.sum(EquipmentHealthRollup.avg_value * EquipmentHealthRollup.sample_count) / total,
+        total
+    ).filter(
+        EquipmentHealthRollup.resolution == source,
+        EquipmentHealthRollup.bucket < until
+    )
+    if last:
+        select = select.filter(EquipmentHealthRollup.bucket >= last)
+    return select.group_by(EquipmentHealthRollup.equipment_id, bucket)
+
+def _upsert_rollup(select):
+    """INSERT ... SELECT into the rollup table, replacing recomputed buckets"""
+    columns = ['equipment_id', 'resolution', 'bucket', 'min_value', 'max_value', 'avg_value', 'sample_count']
+    stmt = insert(EquipmentHealthRollup).from_select(columns, select)
+    stmt = stmt.on_conflict_do_update(
+        constraint='uq_equipment_health_rollup_bucket',
+        set_={column: stmt.excluded[column] for column in columns[3:]}
+    )
+    return db.session.execute(stmt).rowcount
+
+def compact_health_history(now=None):
+    """Roll closed buckets up one level at a time and apply retention.
+
+    Each level is rebuilt from its last stored bucket onwards, so the job is
+    idempotent and can run as often as needed. Raw points and finer levels are
+    only deleted once they are older than their retention window, long after
+    they have been rolled up. Returns a summary dict.
+    """
+    now = now or datetime.utcnow()
+    summary = {}
+
+    source = None
+    for resolution, _, _ in ROLLUP_LEVELS:
+        until = bucket_start(now, resolution)
+        if source is None:
+            select = _rollup_from_raw(resolution, until)
+        else:
+            select = _rollup_from_level(source, resolution, until)
+        summary[resolution] = _upsert_rollup(select)
+        source = resolution
+
+    summary['raw_deleted'] = EquipmentHealthPoint.query.filter(
+        EquipmentHealthPoint.recorded_at < now - RAW_RETENTION
+    ).delete(synchronize_session=False)
+    for resolution, _, retention in ROLLUP_LEVELS:
+        if retention:
+            summary[f'{resolution}_deleted'] = EquipmentHealthRollup.query.filter(
+                EquipmentHealthRollup.resolution == resolution,
+                EquipmentHealthRollup.bucket < now - retention
+            ).delete(synchronize_session=False)
+
+    db.session.commit()
+    return summary
+
+def choose_resolution(start, end, now=None):
+    """Finest level that keeps the chart under MAX_CHART_POINTS and still covers start"""
+    now = now or datetime.utcnow()
+    if end - start <= timedelta(days=1) and start >= now - RAW_RETENTION:
+        return 'raw'
+    for resolution, size, retention in ROLLUP_LEVELS:
+        if (end - start) / size <= MAX_CHART_POINTS and (retention is None or start >= now - retention):
+            return resolution
+    return ROLLUP_LEVELS[-1][0]
+
+def health_history(equipment_id, start, end, resolution=None):
+    """Health trend between start and end from the level that fits the range.
+
+    Raw points newer than the last rolled-up bucket are appended so the
+    chart reaches the present between compaction runs.
+    """
+    if end <= start:
+        raise ValueError('end must be after start')
+    resolution = resolution or choose_resolution(start, end)
+
+    points = []
+    raw_from = start
+    if resolution != 'raw':
+        if resolution not in {level[0] for level in ROLLUP_LEVELS}:
+            raise ValueError(f'Unknown resolution: {resolution}')
+        size = next(level[1] for level in ROLLUP_LEVELS if level[0] == resolution)
+        rows = db.session.query(
+            EquipmentHealthRollup.bucket,
+            EquipmentHealthRollup.min_value,
+            EquipmentHealthRollup.max_value,
+            EquipmentHealthRollup.avg_value
+        ).filter(
+            EquipmentHealthRollup.equipment_id == equipment_id,
+            EquipmentHealthRollup.resolution == resolution,
+            EquipmentHealthRollup.bucket >= bucket_start(start, resolution),
+            EquipmentHealthRollup.bucket < end
+        ).order_by(EquipmentHealthRollup.bucket).all()
+        points = [{
+            't': bucket.isoformat(),
+            'min': min_value,
+            'max': max_value,
+            'avg': round(avg_value, 2)
+        } for bucket, min_value, max_value, avg_value in rows]
+        if rows:
+            raw_from = max(start, rows[-1][0] + size)
+
+    raw = db.session.query(EquipmentHealthPoint.recorded_at, EquipmentHealthPoint.value).filter(
+        EquipmentHealthPoint.equipment_id == equipment_id,
+        EquipmentHealthPoint.recorded_at >= raw_from,
+        EquipmentHealthPoint.recorded_at < end
+    ).order_by(EquipmentHealthPoint.recorded_at).all()
+    points.extend({'t': recorded_at.isoformat(), 'min': value, 'max': value, 'avg': value} for recorded_at, value in raw)
+    return resolution, points
+
+if __name__ == '__main__':
+    from app import app
+    with app.app_context():
+        result = compact_health_history()
+        print(f"[OK] Health history compacted: {result}")
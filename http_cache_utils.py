@@ -0,0 +1,72 @@
+"""
+HTTP caching helpers for GearGuard
+ETag/Last-Modified validators and 304 Not Modified answers for detail pages and JSON APIs
+"""
+
+import hashlib
+import time
+from datetime import timezone
+from flask import current_app, request, session, jsonify, make_response
+from flask_login import current_user
+from cache_utils import entity_version
+
+def make_etag(*parts):
+    """Stable strong ETag value for the given parts"""
+    return hashlib.sha1(repr(parts).encode()).hexdigest()[:32]
+
+def version_tag(*tables):
+    """Entity versions for tables a page reads related rows from.
+
+    Versions are per process, so a time bucket of REFERENCE_CACHE_TTL seconds
+    is included: edits made through another worker show up within the same
+    window the reference-data cache already allows.
+    """
+    bucket = int(time.time() // current_app.config['REFERENCE_CACHE_TTL'])
+    return tuple(entity_version(table) for table in tables) + (bucket,)
+
+def _http_date(value):
+    # Columns hold naive UTC; HTTP dates have whole-second precision
+    return value.replace(tzinfo=timezone.utc, microsecond=0) if value else None
+
+def _is_fresh(etag, last_modified):
+    if request.if_none_match:
+        return request.if_none_match.contains(etag)
+    since = request.if_modified_since
+    return bool(last_modified and since and last_modified <= since)
+
+def _add_validators(response, etag, last_modified):
+    response.set_etag(etag)
+    if last_modified:
+        response.last_modified = last_modified
+    # Pages are per user: clients may keep a copy but must revalidate every time
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+def conditional_page(parts, last_modified, render):
+    """Answer 304 when the client's copy is current, otherwise render() with validators attached.
+
+    parts must cover everything the page shows (row timestamps, related
+    entity versions); the current user is added automatically. last_modified
+    is the newest updated_at among the rows shown.
+    """
+    if session.get('_flashes'):
+        # Pending flash messages are one-off content that must be rendered
+        return render()
+    etag = make_etag(getattr(current_user, 'id', None), *parts)
+    last_modified = _http_date(last_modified)
+    if request.method in ('GET', 'HEAD') and _is_fresh(etag, last_modified):
+        return _add_validators(current_app.response_class(status=304), etag, last_modified)
+    return _add_validators(make_response(render()), etag, last_modified)
+
+def conditional_json(payload):
+    """jsonify(payload) with an ETag from the body; 304 when the client already has it.
+
+    Saves serializing to the wire and client-side reprocessing for polling
+    dashboards; callers should keep the query behind it cheap.
+    """
+    response = jsonify(payload)
+    response.add_etag()
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
@@ -0,0 +1,351 @@
+"""
+Import utilities for GearGuard
+Streams CSV files of equipment, workers or work centers into the database in validated chunks
+"""
+
+import csv
+import io
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from sqlalchemy import func, text
+from models import (
+    db, User, Department, MaintenanceCategory, MaintenanceTeam,
+    MaintenanceEquipment, Company, WorkCenter
+)
+from db_utils import copy_rows
+from cache_utils import bump_versions
+
+IMPORT_CHUNK_SIZE = 5000
+MAX_REPORTED_ERRORS = 1000
+MAX_TEXT_LENGTH = 10000
+
+# Imported workers get a hash werkzeug can never match; they set a password via "Forgot password"
+UNUSABLE_PASSWORD = '!imported'
+
+def _normalize_header(name):
+    return (name or '').strip().lower().replace(' ', '_')
+
+def _key(value):
+    return value.strip().lower() if value else None
+
+def _name_map(*columns):
+    """Map lower-cased values of the given columns to the row id"""
+    mapping = {}
+    model_id = columns[0].class_.id
+    for row in db.session.query(model_id, *columns):
+        for value in row[1:]:
+            if value:
+                mapping.setdefault(value.strip().lower(), row[0])
+    return mapping
+
+class _Importer:
+    """One entity type: header spec, row parser and duplicate keys.
+
+    Subclasses set model, table, columns (COPY order), required headers,
+    optional headers and unique_keys as (label, column name, model column) tuples.
+    """
+
+    model = None
+    table = None
+    columns = ()
+    required = ()
+    optional = ()
+    unique_keys = ()
+
+    def __init__(self):
+        self.now = datetime.utcnow()
+        self.lookups = {}
+
+    def prepare(self):
+        """Load the name -> id maps used to resolve references"""
+
+    def parse(self, row):
+        """Return a tuple in `columns` order or raise ValueError with a readable message"""
+        raise NotImplementedError
+
+    def before_load(self):
+        pass
+
+    def after_load(self, count):
+        pass
+
+    def _text(self, row, name, required=False):
+        value = (row.get(name) or '').strip()
+        if not value:
+            if required:
+                raise ValueError(f'{name} is required')
+            return None
+        # String columns carry their own limit; Text columns get a sanity cap
+        max_length = self.model.__table__.c[name].type.length or MAX_TEXT_LENGTH
+        if len(value) > max_length:
+            raise ValueError(f'{name} is longer than {max_length} characters')
+        return value
+
+    def _reference(self, row, name, lookup, required=False):
+        value = (row.get(name) or '').strip()
+        if not value:
+            if required:
+                raise ValueError(f'{name} is required')
+            return None
+        found = self.lookups[lookup].get(value.lower())
+        if found is None:
+            raise ValueError(f'Unknown {name}: {value}')
+        return found
+
+    def _date(self, row, name):
+        value = (row.get(name) or '').strip()
+        if not value:
+            return None
+        try:
+            return datetime.strptime(value, '%Y-%m-%d').date()
+        except ValueError:
+            raise ValueError(f'{name} must be a date in YYYY-MM-DD format')
+
+    def _number(self, row, name, low=None, high=None, default=None):
+        value = (row.get(name) or '').strip()
+        if not value:
+            return default
+        try:
+            number = Decimal(value)
+        except InvalidOperation:
+            raise ValueError(f'{name} must be a number')
+        if (low is not None and number < low) or (high is not None and number > high):
+            raise ValueError(f'{name} must be between {low} and {high}')
+        return number
+
+class EquipmentImporter(_Importer):
+    model = MaintenanceEquipment
+    table = 'maintenance_equipment'
+    columns = ('name', 'serial_number', 'category_id', 'team_id', 'technician_id', 'company_id',
+               'department_id', 'work_center_id', 'location', 'used_in_location', 'description',
+               'warranty_information', 'purchase_date', 'assigned_date', 'health_percentage',
+               'scrap', 'created_at', 'updated_at')
+    required = ('name', 'serial_number', 'team')
+    optional = ('category', 'technician', 'company', 'department', 'work_center', 'location',
+                'used_in_location', 'description', 'warranty_information', 'purchase_date',
+                'assigned_date', 'health_percentage')
+    unique_keys = (('serial number', 'serial_number', MaintenanceEquipment.serial_number),)
+
+    def prepare(self):
+        self.lookups = {
+            'categories': _name_map(MaintenanceCategory.name),
+            'teams': _name_map(MaintenanceTeam.name),
+            'companies': _name_map(Company.name),
+            'departments': _name_map(Department.name),
+            'work_centers': _name_map(WorkCenter.name, WorkCenter.code),
+            'users': _name_map(User.username, User.email, User.employee_id)
+        }
+
+    def parse(self, row):
+        return (
+            self._text(row, 'name', required=True),
+            self._text(row, 'serial_number', required=True),
+            self._reference(row, 'category', 'categories'),
+            self._reference(row, 'team', 'teams', required=True),
+            self._reference(row, 'technician', 'users'),
+            self._reference(row, 'company', 'companies'),
+            self._reference(row, 'department', 'departments'),
+            self._reference(row, 'work_center', 'work_centers'),
+            self._text(row, 'location'),
+            self._text(row, 'used_in_location'),
+            self._text(row, 'description'),
+            self._text(row, 'warranty_information'),
+            self._date(row, 'purchase_date'),
+            self._date(row, 'assigned_date'),
+            int(self._number(row, 'health_percentage', 0, 100, default=100)),
+            False,
+            self.now,
+            self.now
+        )
+
+    def before_load(self):
+        self.max_id = db.session.query(func.max(MaintenanceEquipment.id)).scalar() or 0
+
+    def after_load(self, count):
+        # COPY skips the ORM insert event, so start the health history in one statement
+        db.session.execute(text("""
+            INSERT INTO equipment_health_point (equipment_id, recorded_at, value)
+            SELECT id, created_at, health_percentage FROM maintenance_equipment
+            WHERE id > :max_id AND created_at = :now AND health_percentage IS NOT NULL
+        """), {'max_id': self.max_id, 'now': self.now})
+
+class WorkerImporter(_Importer):
+    model = User
+    table = 'user'
+    columns = ('username', 'email', 'password_hash', 'full_name', 'phone', 'position', 'employee_id',
+               'department_id', 'company_id', 'hire_date', 'is_admin', 'is_portal_user',
+               'is_third_party', 'email_verified', 'is_active', 'created_at', 'updated_at')
+    required = ('email',)
+    optional = ('username', 'full_name', 'phone', 'position', 'employee_id', 'department', 'company', 'hire_date')
+    unique_keys = (('employee ID', 'employee_id', User.employee_id),
+                   ('email', 'email', User.email),
+                   ('username', 'username', User.username))
+
+    def prepare(self):
+        self.lookups = {
+            'companies': _name_map(Company.name),
+            'departments': _name_map(Department.name)
+        }
+
+    def parse(self, row):
+        email = self._text(row, 'email', required=True)
+        if '@' not in email:
+            raise ValueError(f'Invalid email: {email}')
+        username = self._text(row, 'username')
+        if not username:
+            # The email doubles as the username, which has the shorter column
+            max_length = User.__table__.c.username.type.length
+            if len(email) > max_length:
+                raise ValueError(f'email is longer than {max_length} characters and cannot be the username; '
+                                 'set a username')
+            username = email
+        return (
+            username,
+            email,
+            UNUSABLE_PASSWORD,
+            self._text(row, 'full_name'),
+            self._text(row, 'phone'),
+            self._text(row, 'position'),
+            self._text(row, 'employee_id'),
+            self._reference(row, 'department', 'departments'),
+            self._reference(row, 'company', 'companies'),
+            self._date(row, 'hire_date'),
+            False, False, False, False, True,
+            self.now,
+            self.now
+        )
+
+class WorkCenterImporter(_Importer):
+    model = WorkCenter
+    table = 'work_center'
+    columns = ('name', 'code', 'tag', 'cost_per_hour', 'capacity_time_efficiency', 'oee_target',
+               'description', 'company_id', 'created_at', 'updated_at')
+    required = ('name',)
+    optional = ('code', 'tag', 'cost_per_hour', 'capacity_time_efficiency', 'oee_target', 'description', 'company')
+    unique_keys = (('name', 'name', WorkCenter.name),)
+
+    def prepare(self):
+        self.lookups = {'companies': _name_map(Company.name)}
+
+    def parse(self, row):
+        return (
+            self._text(row, 'name', required=True),
+            self._text(row, 'code'),
+            self._text(row, 'tag'),
+            self._number(row, 'cost_per_hour', 0, Decimal('99999999.99'), default=Decimal('1.00')),
+            self._number(row, 'capacity_time_efficiency', 0, 999, default=Decimal('100.00')),
+            self._number(row, 'oee_target', 0, 100),
+            self._text(row, 'description'),
+            self._reference(row, 'company', 'companies'),
+            self.now,
+            self.now
+        )
+
+IMPORTERS = {
+    'equipment': EquipmentImporter,
+    'workers': WorkerImporter,
+    'work_centers': WorkCenterImporter
+}
+
+class ImportReport:
+    """Counts and per-line errors for one import run"""
+
+    def __init__(self):
+        self.rows = 0
+        self.imported = 0
+        self.error_count = 0
+        self.errors = []
+
+    def add_error(self, line, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'line': line, 'error': message})
+
+def _existing(column, values):
+    """Lower-cased values already present in the database"""
+    if not values:
+        return set()
+    rows = db.session.query(func.lower(column)).filter(func.lower(column).in_(list(values)))
+    return {row[0] for row in rows}
+
+def _flush(importer, chunk, seen, report, dry_run):
+    """Drop rows clashing with the database or earlier rows, then COPY the rest"""
+    positions = {name: importer.columns.index(name) for _, name, _ in importer.unique_keys}
+    taken = {}
+    for _, name, column in importer.unique_keys:
+        values = {_key(values[positions[name]]) for _, values in chunk if values[positions[name]]}
+        taken[name] = _existing(column, values)
+
+    rows = []
+    for line, values in chunk:
+        clash = None
+        for label, name, _ in importer.unique_keys:
+            key = _key(values[positions[name]])
+            if not key:
+                continue
+            if key in taken[name]:
+                clash = f'Duplicate {label}: {values[positions[name]]} already exists'
+            elif key in seen[name]:
+                clash = f'Duplicate {label}: {values[positions[name]]} appears earlier in the file'
+            if clash:
+                break
+        if clash:
+            report.add_error(line, clash)
+            continue
+        for _, name, _ in importer.unique_keys:
+            key = _key(values[positions[name]])
+            if key:
+                seen[name].add(key)
+        rows.append(values)
+
+    if rows and not dry_run:
+        copy_rows(f'"{importer.table}"', importer.columns, rows)
+    report.imported += len(rows)
+
+def run_import(kind, stream, dry_run=False):
+    """Import a CSV file object (bytes) of the given kind.
+
+    Rows are validated and de-duplicated in chunks of IMPORT_CHUNK_SIZE and
+    loaded with COPY in a single transaction, so memory stays bounded and a
+    failed load leaves nothing behind. Invalid rows are skipped and reported
+    by line number. With dry_run nothing is written.
+    """
+    if kind not in IMPORTERS:
+        raise ValueError(f'Unknown import type: {kind}')
+    importer = IMPORTERS[kind]()
+    reader = csv.DictReader(io.TextIOWrapper(stream, encoding='utf-8-sig', newline=''))
+    if not reader.fieldnames:
+        raise ValueError('The file is empty')
+    reader.fieldnames = [_normalize_header(name) for name in reader.fieldnames]
+    missing = [name for name in importer.required if name not in reader.fieldnames]
+    if missing:
+        raise ValueError(f'Missing required column(s): {", ".join(missing)}')
+
+    importer.prepare()
+    importer.before_load()
+    report = ImportReport()
+    seen = {name: set() for _, name, _ in importer.unique_keys}
+    chunk = []
+    try:
+        for row in reader:
+            report.rows += 1
+            try:
+                chunk.append((reader.line_num, importer.parse(row)))
+            except ValueError as e:
+                report.add_error(reader.line_num, str(e))
+            if len(chunk) >= IMPORT_CHUNK_SIZE:
+                _flush(importer, chunk, seen, report, dry_run)
+                chunk = []
+        if chunk:
+            _flush(importer, chunk, seen, report, dry_run)
+        if dry_run or not report.imported:
+            db.session.rollback()
+            return report
+        importer.after_load(report.imported)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    # COPY bypasses the session events that track changed tables
+    bump_versions([importer.table, 'equipment_health_point'] if kind == 'equipment' else [importer.table])
+    return report
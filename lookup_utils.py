@@ -0,0 +1,89 @@
+"""
+Typeahead lookups for GearGuard
+Indexed prefix search over equipment and users with short-lived result caching
+"""
+
+from sqlalchemy import func, or_
+from models import db, MaintenanceEquipment, User
+from cache_utils import TTLCache, entity_version
+from tenant_utils import current_tenant
+
+MAX_RESULTS = 50
+_results = TTLCache(ttl=30, maxsize=2000)
+
+def _prefix_pattern(query):
+    """LIKE pattern matching values that start with query, wildcards escaped"""
+    escaped = query.lower().replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return escaped + '%'
+
+def _cached(kind, table, query, limit, extra, loader):
+    # Keyed on the table version so local edits show up before the TTL runs out
+    key = (kind, current_tenant(), entity_version(table), query.lower(), limit, extra)
+    results = _results.get(key)
+    if results is None:
+        results = loader()
+        _results.set(key, results)
+    return results
+
+def search_equipment(query, limit=20, include_scrap=False):
+    """Equipment whose name or serial number starts with query"""
+    query = (query or '').strip()
+    limit = max(1, min(limit, MAX_RESULTS))
+
+    def load():
+        rows = db.session.query(
+            MaintenanceEquipment.id,
+            MaintenanceEquipment.name,
+            MaintenanceEquipment.serial_number,
+            MaintenanceEquipment.category_id,
+            MaintenanceEquipment.team_id,
+            MaintenanceEquipment.technician_id,
+            MaintenanceEquipment.work_center_id,
+            func.coalesce(User.full_name, User.username)
+        ).outerjoin(User, MaintenanceEquipment.technician_id == User.id)
+        if query:
+            pattern = _prefix_pattern(query)
+            rows = rows.filter(or_(
+                func.lower(MaintenanceEquipment.name).like(pattern, escape='\\'),
+                func.lower(MaintenanceEquipment.serial_number).like(pattern, escape='\\')
+            ))
+        if not include_scrap:
+            rows = rows.filter(MaintenanceEquipment.scrap == False)
+        rows = rows.order_by(MaintenanceEquipment.name).limit(limit)
+        return [{
+            'id': row[0],
+            'label': row[1],
+            'detail': row[2],
+            'category_id': row[3],
+            'team_id': row[4],
+            'technician_id': row[5],
+            'technician': row[7],
+            'work_center_id': row[6]
+        } for row in rows]
+
+    return _cached('equipment', 'maintenance_equipment', query, limit, include_scrap, load)
+
+def search_users(query, limit=20, include_inactive=False):
+    """Users whose full name, username or employee ID starts with query"""
+    query = (query or '').strip()
+    limit = max(1, min(limit, MAX_RESULTS))
+
+    def load():
+        rows = db.session.query(User.id, User.full_name, User.username, User.employee_id)
+        if query:
+            pattern = _prefix_pattern(query)
+            rows = rows.filter(or_(
+                func.lower(User.full_name).like(pattern, escape='\\'),
+                func.lower(User.username).like(pattern, escape='\\'),
+                func.lower(User.employee_id).like(pattern, escape='\\')
+            ))
+        if not include_inactive:
+            rows = rows.filter(User.is_active == True)
+        rows = rows.order_by(User.full_name, User.username).limit(limit)
+        return [{
+            'id': row[0],
+            'label': row[1] or row[2],
+            'detail': row[3]
+        } for row in rows]
+
+    return _cached('users', 'user', query, limit, include_inactive, load)
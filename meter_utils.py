@@ -0,0 +1,195 @@
+"""
+Meter and usage-based maintenance triggers for GearGuard
+Ingests batches of meter readings and raises requests when thresholds are crossed
+"""
+
+import math
+from datetime import datetime, timezone
+from sqlalchemy import or_, tuple_
+from sqlalchemy.dialects.postgresql import insert
+from models import (
+    db, MaintenanceEquipment, MaintenanceRequest, MeterThreshold, MeterThresholdState,
+    allocate_request_names
+)
+from db_utils import copy_rows
+
+LIMIT_TYPES = ('above', 'below', 'usage')
+READING_COLUMNS = ('equipment_id', 'meter', 'value', 'recorded_at')
+
+def _recorded_at(value, now):
+    """Naive UTC datetime for an ISO timestamp; offsets are converted, naive values are taken as UTC"""
+    if not value:
+        return now
+    recorded_at = datetime.fromisoformat(value)
+    if recorded_at.tzinfo is not None:
+        recorded_at = recorded_at.astimezone(timezone.utc).replace(tzinfo=None)
+    return recorded_at
+
+def parse_readings(payload, max_batch):
+    """Validate a JSON payload of readings.
+
+    Accepts a list or {"readings": [...]} with equipment_id, meter, value and an
+    optional ISO recorded_at. Returns (rows, errors) where rows are tuples in
+    READING_COLUMNS order and errors are {'index', 'error'} dicts.
+    """
+    readings = payload.get('readings') if isinstance(payload, dict) else payload
+    if not isinstance(readings, list):
+        raise ValueError('Expected a list of readings')
+    if len(readings) > max_batch:
+        raise ValueError(f'Batch too large: {len(readings)} readings (maximum {max_batch})')
+
+    now = datetime.utcnow()
+    rows = []
+    errors = []
+    for index, reading in enumerate(readings):
+        try:
+            equipment_id = int(reading['equipment_id'])
+            meter = str(reading['meter']).strip()[:50]
+            value = float(reading['value'])
+            if not math.isfinite(value):
+                raise ValueError(f'value must be a finite number, got {value}')
+            recorded_at = _recorded_at(reading.get('recorded_at'), now)
+            if not meter:
+                raise ValueError('meter is required')
+        except (KeyError, TypeError, ValueError) as e:
+            errors.append({'index': index, 'error': f'Invalid reading: {str(e)}'})
+            continue
+        rows.append((index, (equipment_id, meter, value, recorded_at)))
+
+    # Drop readings for unknown equipment with one lookup for the whole batch
+    equipment_ids = {row[0] for _, row in rows}
+    known = {row[0] for row in db.session.query(MaintenanceEquipment.id).filter(MaintenanceEquipment.id.in_(equipment_ids))} if equipment_ids else set()
+    valid = []
+    for index, row in rows:
+        if row[0] in known:
+            valid.append(row)
+        else:
+            errors.append({'index': index, 'error': f'Unknown equipment_id {row[0]}'})
+    return valid, errors
+
+def ingest_readings(rows):
+    """Store readings with COPY and evaluate thresholds in the same transaction.
+
+    Returns the list of maintenance requests created.
+    """
+    copy_rows('meter_reading', READING_COLUMNS, rows)
+    created = evaluate_thresholds(rows)
+    db.session.commit()
+    return created
+
+def _crossed(threshold, state, value):
+    """Check one reading against a threshold and update the state in place"""
+    if threshold.limit_type == 'usage':
+        if state.baseline is None:
+            state.baseline = value
+            return False
+        if value < state.baseline:
+            # Counter was reset or replaced
+            state.baseline = value
+            return False
+        if value - state.baseline >= threshold.limit_value:
+            state.baseline = value
+            return True
+        return False
+
+    outside = value > threshold.limit_value if threshold.limit_type == 'above' else value < threshold.limit_value
+    if outside and not state.triggered:
+        state.triggered = True
+        return True
+    if not outside:
+        state.triggered = False
+    return False
+
+def evaluate_thresholds(rows):
+    """Evaluate only the new readings against the stored per-equipment state.
+
+    Readings older than the last evaluated reading for a threshold are stored
+    but not re-evaluated.
+    """
+    if not rows:
+        return []
+    equipment_ids = {row[0] for row in rows}
+    meters = {row[1] for row in rows}
+
+    equipment = {
+        row[0]: row for row in db.session.query(
+            MaintenanceEquipment.id,
+            MaintenanceEquipment.category_id,
+            MaintenanceEquipment.team_id,
+            MaintenanceEquipment.technician_id,
+            MaintenanceEquipment.work_center_id,
+            MaintenanceEquipment.scrap
+        ).filter(MaintenanceEquipment.id.in_(equipment_ids))
+    }
+    category_ids = {row[1] for row in equipment.values() if row[1]}
+
+    thresholds = MeterThreshold.query.filter(
+        MeterThreshold.is_active == True,
+        MeterThreshold.meter.in_(meters),
+        or_(
+            MeterThreshold.equipment_id.in_(equipment_ids),
+            MeterThreshold.category_id.in_(category_ids) if category_ids else False
+        )
+    ).all()
+    if not thresholds:
+        return []
+
+    by_key = {}
+    for threshold in thresholds:
+        if threshold.equipment_id:
+            by_key.setdefault((threshold.equipment_id, threshold.meter), []).append(threshold)
+        else:
+            for eq_id, row in equipment.items():
+                if row[1] == threshold.category_id:
+                    by_key.setdefault((eq_id, threshold.meter), []).append(threshold)
+
+    read = {(row[0], row[1]) for row in rows}
+    pairs = sorted({(threshold.id, eq_id) for key, items in by_key.items() if key in read for threshold in items})
+    if not pairs:
+        return []
+    # Create missing states up front; a concurrent ingest creating the same pair is not an error
+    db.session.execute(
+        insert(MeterThresholdState.__table__).on_conflict_do_nothing(constraint='uq_meter_threshold_state'),
+        [{'threshold_id': threshold_id, 'equipment_id': eq_id, 'triggered': False} for threshold_id, eq_id in pairs]
+    )
+    # Locked in a fixed order so concurrent ingests evaluate one pair at a time without deadlocks
+    states = {
+        (state.threshold_id, state.equipment_id): state
+        for state in MeterThresholdState.query.filter(
+            tuple_(MeterThresholdState.threshold_id, MeterThresholdState.equipment_id).in_(pairs)
+        ).order_by(MeterThresholdState.threshold_id, MeterThresholdState.equipment_id).with_for_update().populate_existing().all()
+    }
+
+    triggered = []
+    for equipment_id, meter, value, recorded_at in sorted(rows, key=lambda row: row[3]):
+        for threshold in by_key.get((equipment_id, meter), ()):
+            state = states[(threshold.id, equipment_id)]
+            if state.last_recorded_at and recorded_at < state.last_recorded_at:
+                continue
+            if _crossed(threshold, state, value) and not equipment[equipment_id][5]:
+                triggered.append((threshold, state, equipment_id, value, recorded_at))
+            state.last_value = value
+            state.last_recorded_at = recorded_at
+
+    created = []
+    names = allocate_request_names(len(triggered)) if triggered else []
+    for (threshold, state, equipment_id, value, recorded_at), name in zip(triggered, names):
+        eq = equipment[equipment_id]
+        subject = threshold.subject or f'{threshold.meter} {threshold.limit_type} limit reached'
+        request_obj = MaintenanceRequest(
+            name=name,
+            subject=f'{subject} ({threshold.meter}={value:g})'[:200],
+            request_type=threshold.request_type,
+            equipment_id=equipment_id,
+            category_id=eq[1],
+            team_id=eq[2],
+            technician_id=eq[3],
+            assigned_user_id=eq[3],
+            work_center_id=eq[4],
+            scheduled_date=recorded_at
+        )
+        db.session.add(request_obj)
+        db.session.flush()
+        state.last_request_id = request_obj.id
+        created.append(request_obj)
+    return created
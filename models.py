@@ -1,9 +1,10 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
 from datetime import datetime, date
-from sqlalchemy import event
+from sqlalchemy import event, func, or_
+from db_routing import RoutingSession
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 team_members = db.Table('team_members',
     db.Column('team_id', db.Integer, db.ForeignKey('maintenance_team.id'), primary_key=True),
     db.Column('user_id', db.Integer, db.ForeignKey('user.id'), primary_key=True)
@@ -11,6 +12,12 @@ team_members = db.Table('team_members',
 
 class User(UserMixin, db.Model):
     __tablename__ = 'user'
+    USERNAME_CONSTRAINT = 'user_username_key'
+    EMAIL_CONSTRAINT = 'user_email_key'
+    __table_args__ = (
+        # Lets LIKE 'prefix%' username lookups use an index regardless of collation
+        db.Index('ix_user_username_pattern', 'username', postgresql_ops={'username': 'varchar_pattern_ops'}),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
@@ -57,9 +64,45 @@ class User(UserMixin, db.Model):
     def is_worker(self):
         return len(self.teams) > 0 or self.position is not None
     
+    @classmethod
+    def allocate_username(cls, base):
+        """Free username: base itself, or base followed by the lowest unused number.
+
+        A single prefix query returns the suffix of every taken base/baseN
+        name, so the cost does not grow with the number of collisions. Two
+        concurrent sign-ups can still pick the same name; callers retry when
+        USERNAME_CONSTRAINT is violated.
+        """
+        base = base[:70]  # Leave room for the counter within the column size
+        pattern = base.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+        suffix = func.substr(cls.username, len(base) + 1)
+        taken = {row[0] for row in db.session.query(suffix).filter(
+            cls.username.like(pattern, escape='\\'),
+            or_(suffix == '', suffix.op('~')('^[1-9][0-9]*$'))
+        )}
+        return cls.first_free_username(base, taken)
+    
+    @staticmethod
+    def first_free_username(base, taken_suffixes):
+        """base if '' is not taken, else base plus the lowest counter not in taken_suffixes"""
+        if '' not in taken_suffixes:
+            return base
+        counter = 1
+        while str(counter) in taken_suffixes:
+            counter += 1
+        return f'{base}{counter}'
+    
     def __repr__(self):
         return f'<User {self.username} ({self.role})>'
 
+# Case-insensitive prefix indexes for the typeahead lookups
+db.Index('ix_user_full_name_prefix', func.lower(User.full_name).label('full_name_lower'),
+         postgresql_ops={'full_name_lower': 'text_pattern_ops'})
+db.Index('ix_user_username_prefix', func.lower(User.username).label('username_lower'),
+         postgresql_ops={'username_lower': 'text_pattern_ops'})
+db.Index('ix_user_employee_id_prefix', func.lower(User.employee_id).label('employee_id_lower'),
+         postgresql_ops={'employee_id_lower': 'text_pattern_ops'})
+
 class Company(db.Model):
     """Company model"""
     __tablename__ = 'company'
@@ -183,6 +226,34 @@ class WorkCenter(db.Model):
     def __repr__(self):
         return f'<WorkCenter {self.name}>'
 
+class WorkCenterCostRollup(db.Model):
+    """Monthly labor cost and OEE rollup per work center"""
+    __tablename__ = 'work_center_cost_rollup'
+    __table_args__ = (
+        db.UniqueConstraint('work_center_id', 'month', name='uq_work_center_cost_rollup_month'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    work_center_id = db.Column(db.Integer, db.ForeignKey('work_center.id'), nullable=False)
+    month = db.Column(db.Date, nullable=False, index=True)  # First day of the month
+    request_count = db.Column(db.Integer, default=0)
+    repaired_count = db.Column(db.Integer, default=0)
+    scrap_count = db.Column(db.Integer, default=0)
+    labor_hours = db.Column(db.Float, default=0)
+    labor_cost = db.Column(db.Numeric(14, 2), default=0)
+    downtime_hours = db.Column(db.Float, default=0)
+    availability = db.Column(db.Numeric(5, 2))  # Percentage
+    performance = db.Column(db.Numeric(5, 2))  # Capacity time efficiency percentage
+    quality = db.Column(db.Numeric(5, 2))  # Repaired share of closed requests
+    oee = db.Column(db.Numeric(5, 2))  # Actual OEE percentage
+    oee_target = db.Column(db.Numeric(5, 2))  # Target at refresh time
+    refreshed_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    work_center = db.relationship('WorkCenter', backref=db.backref('cost_rollups', lazy=True))
+    
+    def __repr__(self):
+        return f'<WorkCenterCostRollup {self.work_center_id} {self.month}>'
+
 class MaintenanceEquipment(db.Model):
     """Equipment Model"""
     __tablename__ = 'maintenance_equipment'
@@ -211,6 +282,10 @@ class MaintenanceEquipment(db.Model):
     # Status
     scrap = db.Column(db.Boolean, default=False)
     
+    # Failure risk (0-100), refreshed by the nightly scoring job in risk_utils
+    risk_score = db.Column(db.Float)
+    risk_scored_at = db.Column(db.DateTime)
+    
     # Timestamps
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -232,12 +307,92 @@ class MaintenanceEquipment(db.Model):
         """Check if equipment health is critical (< 30%)"""
         return self.health_percentage < 30
     
+    @property
+    def risk_level(self):
+        """Risk band from the latest score: high, medium, low or None if not scored yet"""
+        if self.risk_score is None:
+            return None
+        if self.risk_score >= 70:
+            return 'high'
+        if self.risk_score >= 40:
+            return 'medium'
+        return 'low'
+    
     def __repr__(self):
         return f'<MaintenanceEquipment {self.name}>'
 
+db.Index('ix_equipment_name_prefix', func.lower(MaintenanceEquipment.name).label('name_lower'),
+         postgresql_ops={'name_lower': 'text_pattern_ops'})
+db.Index('ix_equipment_serial_prefix', func.lower(MaintenanceEquipment.serial_number).label('serial_lower'),
+         postgresql_ops={'serial_lower': 'text_pattern_ops'})
+
+class PreventiveSchedule(db.Model):
+    """Recurrence rule for preventive maintenance on one equipment or a whole category"""
+    __tablename__ = 'preventive_schedule'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(200), nullable=False)
+    subject = db.Column(db.String(200), nullable=False)  # Subject of generated requests
+    equipment_id = db.Column(db.Integer, db.ForeignKey('maintenance_equipment.id'))
+    category_id = db.Column(db.Integer, db.ForeignKey('maintenance_category.id'))
+    interval_days = db.Column(db.Integer)  # Every N days
+    weekdays = db.Column(db.String(20))  # Comma-separated weekday numbers (0=Monday)
+    start_date = db.Column(db.Date, nullable=False, default=date.today)
+    generated_until = db.Column(db.Date)  # Last date occurrences were generated for
+    is_active = db.Column(db.Boolean, default=True)
+    company_id = db.Column(db.Integer, db.ForeignKey('company.id'))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    equipment = db.relationship('MaintenanceEquipment', backref=db.backref('preventive_schedules', lazy=True))
+    category = db.relationship('MaintenanceCategory', backref=db.backref('preventive_schedules', lazy=True))
+    
+    @property
+    def weekday_list(self):
+        if not self.weekdays:
+            return []
+        return sorted({int(day) for day in self.weekdays.split(',') if day.strip().isdigit() and int(day) < 7})
+    
+    @property
+    def rule_description(self):
+        if self.weekday_list:
+            names = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
+            return 'Every ' + ', '.join(names[day] for day in self.weekday_list)
+        if self.interval_days:
+            return f'Every {self.interval_days} day(s)'
+        return '-'
+    
+    def __repr__(self):
+        return f'<PreventiveSchedule {self.name}>'
+
+# Tenant-leading indexes: scoped pages (see tenant_utils) read only their company's slice
+TENANT_INDEXES = [
+    db.Index('ix_user_company_name', User.company_id, User.full_name),
+    db.Index('ix_department_company_name', Department.company_id, Department.name),
+    db.Index('ix_category_company_name', MaintenanceCategory.company_id, MaintenanceCategory.name),
+    db.Index('ix_team_company_name', MaintenanceTeam.company_id, MaintenanceTeam.name),
+    db.Index('ix_work_center_company_name', WorkCenter.company_id, WorkCenter.name),
+    db.Index('ix_equipment_company_name', MaintenanceEquipment.company_id, MaintenanceEquipment.name),
+    db.Index('ix_equipment_company_id', MaintenanceEquipment.company_id, MaintenanceEquipment.id),
+    db.Index('ix_equipment_company_category', MaintenanceEquipment.company_id, MaintenanceEquipment.category_id),
+    db.Index('ix_equipment_company_team', MaintenanceEquipment.company_id, MaintenanceEquipment.team_id),
+    db.Index('ix_preventive_schedule_company', PreventiveSchedule.company_id, PreventiveSchedule.is_active),
+]
+
 class MaintenanceRequest(db.Model):
     """Maintenance Request Model"""
     __tablename__ = 'maintenance_request'
+    __table_args__ = (
+        # One generated occurrence per schedule, equipment and date
+        db.Index('uq_request_pm_occurrence', 'pm_schedule_id', 'equipment_id', 'scheduled_date', unique=True),
+        # Keyset pagination of an equipment's requests, newest first
+        db.Index('ix_request_equipment_id_desc', 'equipment_id', db.text('id DESC')),
+        # Open work stays a small index even as closed history grows
+        db.Index('ix_request_open_stage_created', 'stage', 'created_at',
+                 postgresql_where=db.text("stage IN ('new', 'in_progress')")),
+        # Keyset pages of a kanban column, newest first
+        db.Index('ix_request_stage_id_desc', 'stage', db.text('id DESC')),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(50), unique=True, nullable=False)
@@ -252,6 +407,7 @@ class MaintenanceRequest(db.Model):
     assigned_user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
     maintenance_for_id = db.Column(db.Integer, db.ForeignKey('user.id'))  # Maintenance For (user)
     work_center_id = db.Column(db.Integer, db.ForeignKey('work_center.id'))  # Work Center for the request
+    pm_schedule_id = db.Column(db.Integer, db.ForeignKey('preventive_schedule.id'))  # Generated by a preventive schedule
     
     # Scheduling
     scheduled_date = db.Column(db.DateTime)
@@ -275,6 +431,18 @@ class MaintenanceRequest(db.Model):
             return datetime.utcnow() > self.scheduled_date
         return False
     
+    @property
+    def labor_cost(self):
+        """Labor cost from hours spent and the hourly rate of the equipment's work center.
+
+        Uses the same attribution as the work center cost rollup, so the request
+        and the cost report always agree.
+        """
+        work_center = self.equipment.work_center if self.equipment else None
+        if not self.duration or not work_center:
+            return None
+        return round(self.duration * float(work_center.cost_per_hour or 0), 2)
+    
     def auto_fill_from_equipment(self):
         """Auto-fill category, team, and technician from equipment"""
         if self.equipment:
@@ -316,16 +484,133 @@ class MaintenanceRequest(db.Model):
     # Relationships for allocation
     allocated_to = db.relationship('User', foreign_keys=[allocated_to_id], backref='allocated_requests', lazy=True)
     maintenance_for = db.relationship('User', foreign_keys=[maintenance_for_id], backref='maintenance_requests_for', lazy=True)
+    pm_schedule = db.relationship('PreventiveSchedule', backref=db.backref('requests', lazy='dynamic'), lazy=True)
     
     def __repr__(self):
         return f'<MaintenanceRequest {self.name}>'
 
+def _request_columns(*extra):
+    """Constraint-free copies of the maintenance_request columns plus extra columns"""
+    return [
+        db.Column(column.name, column.type, primary_key=column.primary_key, nullable=column.nullable, autoincrement=False)
+        for column in MaintenanceRequest.__table__.columns
+    ] + list(extra)
+
+# Closed requests moved out of maintenance_request by archive_utils; no foreign keys so history
+# never blocks deleting the equipment, users or teams it mentions
+maintenance_request_archive = db.Table(
+    'maintenance_request_archive',
+    *_request_columns(db.Column('archived_at', db.DateTime, nullable=False, default=datetime.utcnow)),
+    db.Index('ix_request_archive_equipment_created', 'equipment_id', 'created_at'),
+    db.Index('ix_request_archive_work_center_created', 'work_center_id', 'created_at')
+)
+
+# Live and archived requests together, for history and reports. It is a view created by
+# update_database_schema.py, so it lives in its own MetaData and create_all() skips it
+request_history = db.Table(
+    'maintenance_request_history', db.MetaData(),
+    *_request_columns(db.Column('archived', db.Boolean))
+)
+
+class MeterReading(db.Model):
+    """Counter or sensor reading for equipment (append-only time series)"""
+    __tablename__ = 'meter_reading'
+    __table_args__ = (
+        db.Index('ix_meter_reading_equipment_meter_time', 'equipment_id', 'meter', 'recorded_at'),
+    )
+    
+    id = db.Column(db.BigInteger, primary_key=True)
+    equipment_id = db.Column(db.Integer, db.ForeignKey('maintenance_equipment.id'), nullable=False)
+    meter = db.Column(db.String(50), nullable=False)  # e.g. runtime_hours, cycles, temperature
+    value = db.Column(db.Float, nullable=False)
+    recorded_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<MeterReading {self.equipment_id} {self.meter}={self.value}>'
+
+class MeterThreshold(db.Model):
+    """Limit on a meter that raises a maintenance request when crossed"""
+    __tablename__ = 'meter_threshold'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    meter = db.Column(db.String(50), nullable=False, index=True)
+    equipment_id = db.Column(db.Integer, db.ForeignKey('maintenance_equipment.id'))
+    category_id = db.Column(db.Integer, db.ForeignKey('maintenance_category.id'))
+    limit_type = db.Column(db.String(10), nullable=False, default='above')  # above, below, usage
+    limit_value = db.Column(db.Float, nullable=False)
+    request_type = db.Column(db.String(20), nullable=False, default='corrective')  # corrective or preventive
+    subject = db.Column(db.String(200))
+    is_active = db.Column(db.Boolean, default=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    equipment = db.relationship('MaintenanceEquipment', backref=db.backref('meter_thresholds', lazy=True))
+    category = db.relationship('MaintenanceCategory', backref=db.backref('meter_thresholds', lazy=True))
+    
+    @property
+    def rule_description(self):
+        if self.limit_type == 'usage':
+            return f'Every {self.limit_value:g} {self.meter}'
+        return f'{self.meter} {">" if self.limit_type == "above" else "<"} {self.limit_value:g}'
+    
+    def __repr__(self):
+        return f'<MeterThreshold {self.meter} {self.limit_type} {self.limit_value}>'
+
+class MeterThresholdState(db.Model):
+    """Per-equipment evaluation state so thresholds are checked incrementally"""
+    __tablename__ = 'meter_threshold_state'
+    __table_args__ = (
+        db.UniqueConstraint('threshold_id', 'equipment_id', name='uq_meter_threshold_state'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    threshold_id = db.Column(db.Integer, db.ForeignKey('meter_threshold.id', ondelete='CASCADE'), nullable=False)
+    equipment_id = db.Column(db.Integer, db.ForeignKey('maintenance_equipment.id'), nullable=False)
+    last_value = db.Column(db.Float)
+    last_recorded_at = db.Column(db.DateTime)
+    baseline = db.Column(db.Float)  # Counter value at the last usage trigger
+    triggered = db.Column(db.Boolean, default=False)  # Limit currently crossed (re-armed when back in range)
+    last_request_id = db.Column(db.Integer, db.ForeignKey('maintenance_request.id', ondelete='SET NULL'))
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class EquipmentHealthPoint(db.Model):
+    """Raw health value recorded every time equipment health changes"""
+    __tablename__ = 'equipment_health_point'
+    __table_args__ = (
+        db.Index('ix_equipment_health_point_equipment_time', 'equipment_id', 'recorded_at'),
+    )
+    
+    id = db.Column(db.BigInteger, primary_key=True)
+    equipment_id = db.Column(db.Integer, db.ForeignKey('maintenance_equipment.id', ondelete='CASCADE'), nullable=False)
+    recorded_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    value = db.Column(db.SmallInteger, nullable=False)
+
+class EquipmentHealthRollup(db.Model):
+    """Downsampled health history: min/max/avg per minute, hour or day bucket"""
+    __tablename__ = 'equipment_health_rollup'
+    __table_args__ = (
+        db.UniqueConstraint('equipment_id', 'resolution', 'bucket', name='uq_equipment_health_rollup_bucket'),
+    )
+    
+    id = db.Column(db.BigInteger, primary_key=True)
+    equipment_id = db.Column(db.Integer, db.ForeignKey('maintenance_equipment.id', ondelete='CASCADE'), nullable=False)
+    resolution = db.Column(db.String(10), nullable=False)  # minute, hour, day
+    bucket = db.Column(db.DateTime, nullable=False)  # Bucket start
+    min_value = db.Column(db.SmallInteger, nullable=False)
+    max_value = db.Column(db.SmallInteger, nullable=False)
+    avg_value = db.Column(db.Float, nullable=False)
+    sample_count = db.Column(db.Integer, nullable=False)
+
 class OTP(db.Model):
     """OTP Model for password reset and email verification"""
     __tablename__ = 'otp'
+    __table_args__ = (
+        # Covers create/verify lookups; expires_at drives the purge job
+        db.Index('ix_otp_email_purpose_used', 'email', 'purpose', 'used'),
+        db.Index('ix_otp_expires_at', 'expires_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
-    email = db.Column(db.String(120), nullable=False, index=True)
+    email = db.Column(db.String(120), nullable=False)
     otp_code = db.Column(db.String(6), nullable=False)
     purpose = db.Column(db.String(20), nullable=False)  # password_reset, email_verification
     used = db.Column(db.Boolean, default=False)
@@ -339,6 +624,49 @@ class OTP(db.Model):
     def __repr__(self):
         return f'<OTP {self.email} - {self.purpose}>'
 
+class RateLimitBucket(db.Model):
+    """Shared token bucket for the PostgreSQL rate limiter store"""
+    __tablename__ = 'rate_limit_bucket'
+    
+    key = db.Column(db.String(255), primary_key=True)
+    tokens = db.Column(db.Float, nullable=False)
+    updated_at = db.Column(db.Float, nullable=False, index=True)  # Unix time of the last refill
+
+class FragmentCacheEntry(db.Model):
+    """Rendered template fragment for the shared PostgreSQL fragment cache"""
+    __tablename__ = 'fragment_cache_entry'
+    
+    key = db.Column(db.String(64), primary_key=True)  # SHA-1 of name, tenant, versions and vary values
+    html = db.Column(db.Text, nullable=False)
+    expires_at = db.Column(db.Float, nullable=False, index=True)  # Unix time
+
+# Request numbers (MR00001, ...) come from one sequence shared by single inserts and bulk
+# generators, so concurrent writers never hand out the same name and nothing scans the table
+request_name_seq = db.Sequence('request_name_seq', metadata=db.metadata)
+
+REQUEST_NAME_SEQ_SYNC_SQL = """
+    SELECT setval('request_name_seq', GREATEST(
+        (SELECT CASE WHEN is_called THEN last_value ELSE last_value - 1 END FROM request_name_seq),
+        (SELECT COALESCE(MAX(CAST(SUBSTRING(name FROM 3) AS BIGINT)), 0) FROM (
+            SELECT name FROM maintenance_request
+            UNION ALL
+            SELECT name FROM maintenance_request_archive
+        ) used WHERE name ~ '^MR[0-9]+$')
+    ) + 1, false)
+"""
+
+def allocate_request_names(count, connection=None):
+    """Reserve `count` ascending request names (MR00001, ...) in one round trip.
+
+    Numbers taken by a transaction that rolls back are not reused.
+    """
+    if count <= 0:
+        return []
+    rows = (connection or db.session).execute(
+        db.text("SELECT nextval('request_name_seq') FROM generate_series(1, :count)"), {'count': count}
+    )
+    return [f'MR{num:05d}' for num in sorted(row[0] for row in rows)]
+
 # Event listeners for auto-fill
 @event.listens_for(MaintenanceRequest, 'before_insert')
 def receive_before_insert(mapper, connection, target):
@@ -346,15 +674,28 @@ def receive_before_insert(mapper, connection, target):
     target.auto_fill_from_equipment()
     # Generate request name if not set
     if not target.name or target.name == 'New':
-        last_request = db.session.query(MaintenanceRequest).order_by(MaintenanceRequest.id.desc()).first()
-        if last_request:
-            try:
-                last_num = int(last_request.name.replace('MR', ''))
-                target.name = f'MR{last_num + 1:05d}'
-            except:
-                target.name = 'MR00001'
-        else:
-            target.name = 'MR00001'
+        target.name = allocate_request_names(1, connection)[0]
+
+def _record_health_point(connection, target):
+    """Append a health point when the equipment health value changes"""
+    if target.health_percentage is None:
+        return
+    connection.execute(EquipmentHealthPoint.__table__.insert().values(
+        equipment_id=target.id,
+        recorded_at=datetime.utcnow(),
+        value=target.health_percentage
+    ))
+
+@event.listens_for(MaintenanceEquipment, 'after_insert')
+def receive_equipment_after_insert(mapper, connection, target):
+    """Start the health history of new equipment"""
+    _record_health_point(connection, target)
+
+@event.listens_for(MaintenanceEquipment, 'after_update')
+def receive_equipment_after_update(mapper, connection, target):
+    """Keep health history instead of losing overwritten values"""
+    if db.inspect(target).attrs.health_percentage.history.has_changes():
+        _record_health_point(connection, target)
 
 @event.listens_for(MaintenanceRequest, 'before_update')
 def receive_before_update(mapper, connection, target):
@@ -0,0 +1,140 @@
+"""
+Password hashing service for GearGuard
+Runs hashing in a bounded worker pool with configurable method and transparent rehash on login
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from flask import current_app
+from werkzeug.security import generate_password_hash, check_password_hash
+
+class HashingBusy(Exception):
+    """Raised when the hashing queue is full; callers should ask the user to retry"""
+
+class HashingPool:
+    """Thread pool with a hard cap on queued work and simple timing metrics.
+
+    hashlib releases the GIL while computing scrypt/pbkdf2, so worker threads
+    hash in parallel while the cap keeps a login storm from piling up
+    unbounded work behind ordinary page requests.
+    """
+
+    def __init__(self, workers, queue_limit, timeout):
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash')
+        self._slots = threading.BoundedSemaphore(workers + queue_limit)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._stats = {'submitted': 0, 'completed': 0, 'rejected': 0, 'timed_out': 0,
+                       'wait_seconds': 0.0, 'hash_seconds': 0.0, 'max_wait_seconds': 0.0}
+
+    def run(self, func, *args):
+        """Run func(*args) on the pool and wait for the result"""
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._stats['rejected'] += 1
+            raise HashingBusy('Password hashing queue is full')
+        with self._lock:
+            self._in_flight += 1
+            self._stats['submitted'] += 1
+        queued_at = time.perf_counter()
+        future = self._executor.submit(self._timed, func, args, queued_at)
+        future.add_done_callback(self._release)
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            with self._lock:
+                self._stats['timed_out'] += 1
+            raise HashingBusy('Password hashing timed out')
+
+    def _timed(self, func, args, queued_at):
+        started = time.perf_counter()
+        result = func(*args)
+        finished = time.perf_counter()
+        with self._lock:
+            wait = started - queued_at
+            self._stats['completed'] += 1
+            self._stats['wait_seconds'] += wait
+            self._stats['hash_seconds'] += finished - started
+            self._stats['max_wait_seconds'] = max(self._stats['max_wait_seconds'], wait)
+        return result
+
+    def _release(self, future):
+        with self._lock:
+            self._in_flight -= 1
+        self._slots.release()
+
+    def stats(self):
+        with self._lock:
+            completed = self._stats['completed'] or 1
+            return {
+                'workers': self.workers,
+                'queue_limit': self.queue_limit,
+                'in_flight': self._in_flight,
+                'queued': max(self._in_flight - self.workers, 0),
+                'submitted': self._stats['submitted'],
+                'completed': self._stats['completed'],
+                'rejected': self._stats['rejected'],
+                'timed_out': self._stats['timed_out'],
+                'avg_wait_ms': round(self._stats['wait_seconds'] / completed * 1000, 2),
+                'max_wait_ms': round(self._stats['max_wait_seconds'] * 1000, 2),
+                'avg_hash_ms': round(self._stats['hash_seconds'] / completed * 1000, 2),
+            }
+
+_pool = None
+_pool_lock = threading.Lock()
+_method_prefixes = {}
+
+def get_pool():
+    """Process-wide hashing pool sized from config"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                config = current_app.config
+                _pool = HashingPool(config['PASSWORD_HASH_WORKERS'], config['PASSWORD_HASH_QUEUE_LIMIT'],
+                                    config['PASSWORD_HASH_TIMEOUT'])
+    return _pool
+
+def _method():
+    return current_app.config['PASSWORD_HASH_METHOD']
+
+def _method_prefix(method):
+    """Full parameter string werkzeug stores for a method, e.g. 'scrypt' -> 'scrypt:32768:8:1'"""
+    if method not in _method_prefixes:
+        _method_prefixes[method] = generate_password_hash('', method=method).split('$', 1)[0]
+    return _method_prefixes[method]
+
+def hash_password(password):
+    """Hash a password with the configured method on the pool"""
+    return get_pool().run(generate_password_hash, password, _method())
+
+def verify_password(password_hash, password):
+    """Check a password against a stored hash on the pool"""
+    if not password_hash:
+        return False
+    return get_pool().run(check_password_hash, password_hash, password)
+
+def needs_rehash(password_hash):
+    """True when a stored hash uses a different method or cost than configured"""
+    return password_hash.split('$', 1)[0] != _method_prefix(_method())
+
+def verify_and_upgrade(user, password):
+    """Verify the user's password and rehash it when the configured parameters changed.
+
+    The new hash is assigned to user.password_hash; the caller commits.
+    """
+    if not verify_password(user.password_hash, password):
+        return False
+    if needs_rehash(user.password_hash):
+        user.password_hash = hash_password(password)
+    return True
+
+def pool_stats():
+    """Metrics for the diagnostics endpoint"""
+    stats = get_pool().stats()
+    stats['method'] = _method_prefix(_method())
+    return stats
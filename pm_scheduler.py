@@ -0,0 +1,190 @@
+"""
+Preventive maintenance scheduler for GearGuard
+Expands recurrence rules into upcoming preventive requests over a horizon
+"""
+
+import heapq
+from datetime import datetime, date, time, timedelta
+from sqlalchemy.dialects.postgresql import insert
+from models import (
+    db, PreventiveSchedule, MaintenanceEquipment, MaintenanceRequest, allocate_request_names
+)
+
+SCHEDULED_TIME = time(8, 0)  # Generated requests are due at the start of the shift
+INSERT_BATCH_SIZE = 5000
+
+def _rule(schedule):
+    """Compact (start_date, interval_days, weekdays) tuple for a schedule"""
+    return (schedule.start_date or date.today(), schedule.interval_days or 0, frozenset(schedule.weekday_list))
+
+def first_due(rule, from_date):
+    """First due date on or after from_date.
+
+    Interval rules are anchored on the schedule start date, so the same dates
+    come out on every run and regeneration stays idempotent.
+    """
+    start, interval, weekdays = rule
+    day = max(from_date, start)
+    if weekdays:
+        for offset in range(7):
+            candidate = day + timedelta(days=offset)
+            if candidate.weekday() in weekdays:
+                return candidate
+        return None
+    if interval <= 0:
+        return None
+    steps = -(-(day - start).days // interval)
+    return start + timedelta(days=steps * interval)
+
+def _schedule_targets(schedules):
+    """Equipment rows each schedule applies to, loaded as plain tuples"""
+    columns = (
+        MaintenanceEquipment.id,
+        MaintenanceEquipment.category_id,
+        MaintenanceEquipment.team_id,
+        MaintenanceEquipment.technician_id,
+        MaintenanceEquipment.work_center_id,
+    )
+    equipment_ids = {s.equipment_id for s in schedules if s.equipment_id}
+    category_ids = {s.category_id for s in schedules if not s.equipment_id and s.category_id}
+
+    by_id = {}
+    by_category = {}
+    if equipment_ids:
+        for row in db.session.query(*columns).filter(
+            MaintenanceEquipment.id.in_(equipment_ids),
+            MaintenanceEquipment.scrap == False
+        ):
+            by_id[row[0]] = row
+    if category_ids:
+        for row in db.session.query(*columns).filter(
+            MaintenanceEquipment.category_id.in_(category_ids),
+            MaintenanceEquipment.scrap == False
+        ):
+            by_category.setdefault(row[1], []).append(row)
+            by_id[row[0]] = row
+
+    targets = {}
+    for schedule in schedules:
+        if schedule.equipment_id:
+            targets[schedule.id] = [by_id[schedule.equipment_id]] if schedule.equipment_id in by_id else []
+        else:
+            targets[schedule.id] = by_category.get(schedule.category_id, [])
+    return targets
+
+def _existing_occurrences(schedule_ids, window_start, window_end):
+    """(schedule_id, equipment_id, scheduled_date) keys already generated in the window"""
+    rows = db.session.query(
+        MaintenanceRequest.pm_schedule_id,
+        MaintenanceRequest.equipment_id,
+        MaintenanceRequest.scheduled_date
+    ).filter(
+        MaintenanceRequest.pm_schedule_id.in_(schedule_ids),
+        MaintenanceRequest.scheduled_date >= window_start,
+        MaintenanceRequest.scheduled_date <= window_end
+    )
+    return {(row[0], row[1], row[2]) for row in rows}
+
+def _insert_batch(batch):
+    """Bulk insert one batch of occurrences with names from the request name sequence"""
+    names = allocate_request_names(len(batch))
+    for row, name in zip(batch, names):
+        row['name'] = name
+    stmt = insert(MaintenanceRequest.__table__).on_conflict_do_nothing(
+        index_elements=['pm_schedule_id', 'equipment_id', 'scheduled_date']
+    )
+    db.session.execute(stmt, batch)
+
+def plan_occurrences(targets, rules, today, horizon_end, existing=()):
+    """Occurrences from today to horizon_end in date order.
+
+    A priority queue holds the next due date of every (schedule, equipment)
+    pair. Yields (scheduled_at, schedule_id, equipment_row, exists) where
+    exists marks keys already in `existing`.
+    """
+    queue = []
+    for schedule_id, equipment_rows in targets.items():
+        rule = rules[schedule_id]
+        for row in equipment_rows:
+            due = first_due(rule, today)
+            if due and due <= horizon_end:
+                queue.append((due, schedule_id, row[0], row))
+    heapq.heapify(queue)
+
+    while queue:
+        due, schedule_id, equipment_id, row = heapq.heappop(queue)
+        scheduled_at = datetime.combine(due, SCHEDULED_TIME)
+        yield scheduled_at, schedule_id, row, (schedule_id, equipment_id, scheduled_at) in existing
+
+        following = first_due(rules[schedule_id], due + timedelta(days=1))
+        if following and following <= horizon_end:
+            heapq.heappush(queue, (following, schedule_id, equipment_id, row))
+
+def generate_preventive_requests(horizon_days=365, today=None, schedule_ids=None):
+    """Generate preventive requests for active schedules up to today + horizon_days.
+
+    Occurrences come out of plan_occurrences() in date order and receive
+    ascending request numbers. Occurrences that already exist are skipped,
+    making repeated runs safe. Returns a summary dict.
+    """
+    today = today or date.today()
+    horizon_end = today + timedelta(days=horizon_days)
+
+    query = PreventiveSchedule.query.filter(PreventiveSchedule.is_active == True)
+    if schedule_ids:
+        query = query.filter(PreventiveSchedule.id.in_(schedule_ids))
+    schedules = [s for s in query.all() if s.interval_days or s.weekday_list]
+    summary = {'schedules': len(schedules), 'created': 0, 'skipped': 0, 'horizon_end': horizon_end.isoformat()}
+    if not schedules:
+        return summary
+
+    by_schedule = {s.id: s for s in schedules}
+    rules = {s.id: _rule(s) for s in schedules}
+    targets = _schedule_targets(schedules)
+    existing = _existing_occurrences(
+        list(by_schedule),
+        datetime.combine(today, time.min),
+        datetime.combine(horizon_end, time.max)
+    )
+
+    batch = []
+    for scheduled_at, schedule_id, row, exists in plan_occurrences(targets, rules, today, horizon_end, existing):
+        if exists:
+            summary['skipped'] += 1
+            continue
+        batch.append({
+            'subject': by_schedule[schedule_id].subject,
+            'request_type': 'preventive',
+            'stage': 'new',
+            'equipment_id': row[0],
+            'category_id': row[1],
+            'team_id': row[2],
+            'technician_id': row[3],
+            'assigned_user_id': row[3],
+            'work_center_id': row[4],
+            'scheduled_date': scheduled_at,
+            'pm_schedule_id': schedule_id,
+        })
+        if len(batch) >= INSERT_BATCH_SIZE:
+            _insert_batch(batch)
+            summary['created'] += len(batch)
+            batch = []
+
+    if batch:
+        _insert_batch(batch)
+        summary['created'] += len(batch)
+
+    for schedule in schedules:
+        schedule.generated_until = horizon_end
+    db.session.commit()
+    return summary
+
+if __name__ == '__main__':
+    import sys
+    from app import app
+    horizon = int(sys.argv[1]) if len(sys.argv) > 1 else 365
+    with app.app_context():
+        result = generate_preventive_requests(horizon_days=horizon)
+        print(f"[OK] Preventive maintenance generated until {result['horizon_end']}: "
+              f"{result['created']} created, {result['skipped']} already existed "
+              f"({result['schedules']} schedules)")
@@ -0,0 +1,140 @@
+"""
+Rate limiting for GearGuard
+Token buckets keyed on client IP and email, kept in process or shared through PostgreSQL
+"""
+
+import threading
+import time
+from functools import wraps
+from flask import current_app, request, session, flash, redirect, url_for
+from sqlalchemy import text
+from models import db
+
+def refill(tokens, updated_at, now, capacity, period):
+    """Tokens available at `now` for a bucket that refills `capacity` tokens every `period` seconds"""
+    return min(capacity, tokens + (now - updated_at) * capacity / period)
+
+class MemoryStore:
+    """Per-process buckets; fast, but every worker process keeps its own counts"""
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def consume(self, key, capacity, period, cost=1.0):
+        """Take `cost` tokens; returns (allowed, seconds until enough tokens are available)"""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.get(key, (capacity, now))
+            tokens = refill(tokens, updated_at, now, capacity, period)
+            if tokens >= cost:
+                self._buckets[key] = (tokens - cost, now)
+                allowed, retry_after = True, 0.0
+            else:
+                self._buckets[key] = (tokens, now)
+                allowed, retry_after = False, (cost - tokens) * period / capacity
+            if len(self._buckets) > self.max_keys:
+                self._prune(now, period)
+        return allowed, retry_after
+
+    def _prune(self, now, period):
+        # Buckets untouched for a full period are back to capacity and can be forgotten
+        stale = [key for key, (_, updated_at) in self._buckets.items() if now - updated_at >= period]
+        for key in stale:
+            del self._buckets[key]
+
+    def purge(self, max_age=3600):
+        now = time.monotonic()
+        with self._lock:
+            self._prune(now, max_age)
+        return 0
+
+class PostgresStore:
+    """Buckets shared by all workers in the rate_limit_bucket table.
+
+    Refill and consumption happen in one conditional upsert on a separate
+    connection, so concurrent workers never double-spend tokens and the
+    request's own transaction is untouched.
+    """
+
+    CONSUME_SQL = text("""
+        INSERT INTO rate_limit_bucket (key, tokens, updated_at)
+        VALUES (:key, :capacity - :cost, :now)
+        ON CONFLICT (key) DO UPDATE SET
+            tokens = LEAST(:capacity, rate_limit_bucket.tokens + (:now - rate_limit_bucket.updated_at) * :capacity / :period) - :cost,
+            updated_at = :now
+        WHERE LEAST(:capacity, rate_limit_bucket.tokens + (:now - rate_limit_bucket.updated_at) * :capacity / :period) >= :cost
+        RETURNING tokens
+    """)
+    TOKENS_SQL = text("SELECT tokens, updated_at FROM rate_limit_bucket WHERE key = :key")
+
+    def consume(self, key, capacity, period, cost=1.0):
+        now = time.time()
+        params = {'key': key, 'capacity': float(capacity), 'period': float(period), 'cost': float(cost), 'now': now}
+        with db.engine.begin() as conn:
+            if conn.execute(self.CONSUME_SQL, params).first() is not None:
+                return True, 0.0
+            row = conn.execute(self.TOKENS_SQL, {'key': key}).first()
+        tokens = refill(row[0], row[1], now, capacity, period) if row else 0.0
+        return False, max(cost - tokens, 0.0) * period / capacity
+
+    def purge(self, max_age=3600):
+        """Delete buckets idle for longer than max_age seconds"""
+        with db.engine.begin() as conn:
+            result = conn.execute(text("DELETE FROM rate_limit_bucket WHERE updated_at < :cutoff"),
+                                  {'cutoff': time.time() - max_age})
+        return result.rowcount
+
+def get_store():
+    """Store configured by RATE_LIMIT_STORAGE, created once per app"""
+    store = current_app.extensions.get('rate_limiter')
+    if store is None:
+        if current_app.config['RATE_LIMIT_STORAGE'] == 'postgres':
+            store = PostgresStore()
+        else:
+            store = MemoryStore()
+        current_app.extensions['rate_limiter'] = store
+    return store
+
+def _client_email(session_key=None):
+    if session_key:
+        email = session.get(session_key)
+    else:
+        email = request.form.get('email') or session.get('verify_email') or session.get('reset_email')
+    return email.strip().lower() if email else None
+
+def rate_limit(scope, per_ip, per_email=None, fallback_endpoint=None, email_session_key=None):
+    """Throttle POSTs to a view before it does any database or hashing work.
+
+    per_ip and per_email are (capacity, period_seconds) token buckets. When a
+    bucket is empty the user is redirected to fallback_endpoint (default: the
+    same view) with a flash message and a Retry-After header. The email comes
+    from the form or the session; email_session_key pins it to one session key.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if request.method != 'POST' or not current_app.config['RATE_LIMIT_ENABLED']:
+                return f(*args, **kwargs)
+            store = get_store()
+            checks = [(f'{scope}:ip:{request.remote_addr}', per_ip)]
+            email = _client_email(email_session_key)
+            if per_email and email:
+                checks.append((f'{scope}:email:{email}', per_email))
+            for key, (capacity, period) in checks:
+                allowed, retry_after = store.consume(key, capacity, period)
+                if not allowed:
+                    wait = max(int(retry_after + 0.999), 1)
+                    current_app.logger.warning(f'Rate limit hit for {key}')
+                    flash(f'Too many attempts. Please wait {wait} seconds and try again.', 'error')
+                    response = redirect(url_for(fallback_endpoint or request.endpoint))
+                    response.headers['Retry-After'] = str(wait)
+                    return response
+            return f(*args, **kwargs)
+        return decorated_function
+    return decorator
+
+def purge_rate_limit_buckets():
+    """Background job: forget buckets that have been idle for an hour"""
+    return get_store().purge()
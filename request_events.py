@@ -0,0 +1,208 @@
+"""
+Live request events for GearGuard
+Collects maintenance request changes at commit and streams them to browsers as Server-Sent Events
+"""
+
+import json
+import queue
+import threading
+import time
+import uuid
+from collections import deque
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from models import MaintenanceRequest
+import cache_bus
+
+CHANNEL = 'gearguard_requests'
+
+# Changed attribute -> event type, in order of precedence when one flush changes several
+TRACKED_ATTRIBUTES = (
+    ('stage', 'stage_changed'),
+    ('allocated_to_id', 'allocated'),
+    ('worker_response', 'responded'),
+)
+
+def _snapshot(request_obj, event_type, old_stage=None):
+    equipment = request_obj.equipment
+    return {
+        'type': event_type,
+        'request_id': request_obj.id,
+        'name': request_obj.name,
+        'subject': request_obj.subject,
+        'stage': request_obj.stage,
+        'old_stage': old_stage,
+        'allocation_status': request_obj.allocation_status,
+        'worker_response': request_obj.worker_response,
+        'equipment_name': equipment.name if equipment else None,
+        'company_id': equipment.company_id if equipment else None,
+        'assigned_user_id': request_obj.assigned_user_id,
+        'technician_id': request_obj.technician_id,
+        'allocated_to_id': request_obj.allocated_to_id
+    }
+
+def _changes(request_obj):
+    state = inspect(request_obj)
+    for attribute, event_type in TRACKED_ATTRIBUTES:
+        history = state.attrs[attribute].history
+        if history.has_changes():
+            old = history.deleted[0] if history.deleted else None
+            return event_type, old if attribute == 'stage' else None
+    return None, None
+
+@event.listens_for(Session, 'after_flush')
+def _collect(session, flush_context):
+    pending = session.info.setdefault('request_events', {})
+    for obj in session.new:
+        if isinstance(obj, MaintenanceRequest):
+            pending[obj.id] = _snapshot(obj, 'created')
+    for obj in session.dirty:
+        if not isinstance(obj, MaintenanceRequest):
+            continue
+        event_type, old_stage = _changes(obj)
+        if not event_type:
+            continue
+        previous = pending.get(obj.id)
+        if previous:
+            # Changed again in the same transaction: keep the first event type, send fresh values
+            event_type, old_stage = previous['type'], previous['old_stage']
+        pending[obj.id] = _snapshot(obj, event_type, old_stage)
+    if pending and cache_bus.is_enabled():
+        # Sent inside the transaction: other processes only hear about committed changes
+        connection = session.connection()
+        for request_event in pending.values():
+            if not request_event.get('notified'):
+                cache_bus.notify(connection, CHANNEL, request_event)
+                request_event['notified'] = True
+
+@event.listens_for(Session, 'after_commit')
+def _deliver(session):
+    for request_event in session.info.pop('request_events', {}).values():
+        request_event.pop('notified', None)
+        broker.publish(request_event)
+
+@event.listens_for(Session, 'after_rollback')
+def _discard(session):
+    session.info.pop('request_events', None)
+
+class Subscriber:
+    """One open event stream and what its user may see"""
+
+    def __init__(self, user_id, is_admin, tenant_id, maxsize=200):
+        self.user_id = user_id
+        self.is_admin = is_admin
+        self.tenant_id = tenant_id
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.overflowed = False
+
+    def can_see(self, request_event):
+        if self.tenant_id is not None and request_event.get('company_id') != self.tenant_id:
+            return False
+        if self.is_admin:
+            return True
+        return self.user_id in (request_event.get('assigned_user_id'), request_event.get('technician_id'),
+                                request_event.get('allocated_to_id'))
+
+class Broker:
+    """Fans events out to the streams open in this process and keeps a short replay buffer.
+
+    Event ids are '<epoch>-<sequence>', numbered in the order this broker
+    receives events. Local commits and NOTIFYs from other processes arrive in
+    any order relative to when they were flushed, so only receive order is
+    safe for Last-Event-ID replay. The epoch identifies this broker: an id
+    from another process or an earlier run cannot be compared and forces a resync.
+    """
+
+    def __init__(self, history=500):
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self.recent = deque(maxlen=history)
+        self.epoch = uuid.uuid4().hex[:8]
+        self._sequence = 0
+
+    def subscribe(self, subscriber, limit):
+        with self._lock:
+            if len(self._subscribers) >= limit:
+                return False
+            self._subscribers.add(subscriber)
+        return True
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def publish(self, request_event):
+        """Number the event and hand it to every subscriber; returns the numbered event"""
+        with self._lock:
+            self._sequence += 1
+            request_event = dict(request_event, id=f'{self.epoch}-{self._sequence}')
+            self.recent.append((self._sequence, request_event))
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            try:
+                subscriber.queue.put_nowait(request_event)
+            except queue.Full:
+                # A stalled client; it gets a resync instead of a partial picture
+                subscriber.overflowed = True
+        return request_event
+
+    def _sequence_of(self, last_id):
+        epoch, _, sequence = (last_id or '').partition('-')
+        if epoch != self.epoch or not sequence.isdigit():
+            return None
+        return int(sequence)
+
+    def since(self, last_id):
+        """Buffered events after last_id, or None when some may have been missed"""
+        position = self._sequence_of(last_id)
+        with self._lock:
+            if position is None or position > self._sequence:
+                return None
+            events = list(self.recent)
+        if events and events[0][0] > position + 1:
+            return None
+        return [request_event for sequence, request_event in events if sequence > position]
+
+    def __len__(self):
+        return len(self._subscribers)
+
+broker = Broker()
+
+def format_event(request_event):
+    return f"id: {request_event['id']}\nevent: {request_event['type']}\ndata: {json.dumps(request_event)}\n\n"
+
+def stream(subscriber, last_id, max_seconds, heartbeat_seconds):
+    """SSE body for one subscriber; ends after max_seconds so sync workers are released"""
+    try:
+        yield 'retry: 3000\n\n'
+        if last_id is not None:
+            backlog = broker.since(last_id)
+            if backlog is None:
+                yield 'event: resync\ndata: {}\n\n'
+                return
+            for request_event in backlog:
+                if subscriber.can_see(request_event):
+                    yield format_event(request_event)
+        deadline = time.monotonic() + max_seconds
+        while time.monotonic() < deadline:
+            try:
+                request_event = subscriber.queue.get(timeout=heartbeat_seconds)
+            except queue.Empty:
+                yield ': keepalive\n\n'
+                continue
+            if subscriber.overflowed:
+                yield 'event: resync\ndata: {}\n\n'
+                return
+            if subscriber.can_see(request_event):
+                yield format_event(request_event)
+    finally:
+        broker.unsubscribe(subscriber)
+
+def _on_remote_event(payload):
+    payload.pop('origin', None)
+    broker.publish(payload)
+
+def init_app(app):
+    """Receive request events committed by other worker processes"""
+    if app.config['CACHE_BUS_ENABLED']:
+        cache_bus.listen(CHANNEL, _on_remote_event)
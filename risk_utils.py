@@ -0,0 +1,198 @@
+"""
+Failure-risk scoring for GearGuard
+Scores the whole equipment fleet in one vectorized NumPy pass and writes the results back in bulk
+"""
+
+from datetime import datetime, date, timedelta, time
+import numpy as np
+from sqlalchemy import func, case, bindparam
+from sqlalchemy.dialects.postgresql import insert
+from cache_utils import bump_versions
+from models import (
+    db, MaintenanceEquipment, MaintenanceRequest, EquipmentHealthRollup, allocate_request_names,
+    request_history
+)
+
+# Weights of each normalised risk factor; they add up to 1
+RISK_WEIGHTS = {
+    'health': 0.30,
+    'failures': 0.25,
+    'category': 0.15,
+    'age': 0.10,
+    'trend': 0.10,
+    'recency': 0.10,
+}
+HISTORY_DAYS = 365
+TREND_DAYS = 30
+
+def compute_risk_scores(health, age_days, failures, category_rate, trend, days_since_failure):
+    """Risk score 0-100 per asset from equally sized arrays.
+
+    health is the current health percentage, failures the corrective requests
+    in the last year, category_rate the average yearly failures per asset of
+    the same category, trend the health change per day over the trend window
+    and days_since_failure NaN when the asset never failed.
+    """
+    health = np.asarray(health, dtype=float)
+    factors = {
+        'health': (100.0 - np.clip(health, 0, 100)) / 100.0,
+        'failures': 1.0 - np.exp(-np.asarray(failures, dtype=float) / 3.0),
+        'category': 1.0 - np.exp(-np.asarray(category_rate, dtype=float) / 3.0),
+        'age': 1.0 - np.exp(-np.nan_to_num(np.asarray(age_days, dtype=float)) / 3650.0),
+        'trend': np.clip(-np.asarray(trend, dtype=float), 0, 2) / 2.0,
+        'recency': np.nan_to_num(np.exp(-np.asarray(days_since_failure, dtype=float) / 90.0)),
+    }
+    score = sum(RISK_WEIGHTS[name] * values for name, values in factors.items())
+    return np.round(score * 100.0, 1)
+
+def _fleet_features(today):
+    """Load every active asset and its request and health history into arrays"""
+    rows = db.session.query(
+        MaintenanceEquipment.id,
+        MaintenanceEquipment.category_id,
+        MaintenanceEquipment.purchase_date,
+        MaintenanceEquipment.health_percentage
+    ).filter(MaintenanceEquipment.scrap == False).order_by(MaintenanceEquipment.id).all()
+    if not rows:
+        return None
+
+    ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+    categories = np.fromiter((row[1] or 0 for row in rows), dtype=np.int64, count=len(rows))
+    age_days = np.array([(today - row[2]).days if row[2] else np.nan for row in rows], dtype=float)
+    health = np.array([row[3] if row[3] is not None else 100 for row in rows], dtype=float)
+    position = {equipment_id: index for index, equipment_id in enumerate(ids.tolist())}
+
+    # Corrective request history per asset in one GROUP BY
+    since = datetime.combine(today - timedelta(days=HISTORY_DAYS), time.min)
+    failures = np.zeros(len(rows))
+    days_since_failure = np.full(len(rows), np.nan)
+    requests = request_history.c  # archived failures still count
+    history = db.session.query(
+        requests.equipment_id,
+        func.sum(case((requests.created_at >= since, 1), else_=0)),
+        func.max(requests.created_at)
+    ).filter(
+        requests.request_type == 'corrective'
+    ).group_by(requests.equipment_id).all()
+    for equipment_id, recent, last_failure in history:
+        index = position.get(equipment_id)
+        if index is None:
+            continue
+        failures[index] = recent or 0
+        if last_failure:
+            days_since_failure[index] = max((today - last_failure.date()).days, 0)
+
+    # Category failure rate: average yearly failures per asset of the same category
+    codes, inverse = np.unique(categories, return_inverse=True)
+    per_category = np.bincount(inverse, weights=failures) / np.bincount(inverse)
+    category_rate = np.where(codes[inverse] == 0, failures, per_category[inverse])
+
+    # Health trend: change per day since the first rolled-up bucket of the window
+    trend = np.zeros(len(rows))
+    window_start = datetime.combine(today - timedelta(days=TREND_DAYS), time.min)
+    earliest = db.session.query(
+        EquipmentHealthRollup.equipment_id,
+        EquipmentHealthRollup.bucket,
+        EquipmentHealthRollup.avg_value
+    ).filter(
+        EquipmentHealthRollup.resolution == 'minute',
+        EquipmentHealthRollup.bucket >= window_start
+    ).order_by(
+        EquipmentHealthRollup.equipment_id, EquipmentHealthRollup.bucket
+    ).distinct(EquipmentHealthRollup.equipment_id).all()
+    for equipment_id, bucket, avg_value in earliest:
+        index = position.get(equipment_id)
+        if index is None:
+            continue
+        elapsed = max((datetime.combine(today, time.min) - bucket).total_seconds() / 86400.0, 1.0)
+        trend[index] = (health[index] - avg_value) / elapsed
+
+    return ids, health, age_days, failures, category_rate, trend, days_since_failure
+
+def refresh_risk_scores(today=None):
+    """Score the active fleet and write all scores back with one executemany UPDATE.
+
+    updated_at is left untouched because a new score is not an edit of the
+    equipment. Returns the number of assets scored.
+    """
+    today = today or date.today()
+    features = _fleet_features(today)
+    if features is None:
+        return 0
+    ids, health, age_days, failures, category_rate, trend, days_since_failure = features
+    scores = compute_risk_scores(health, age_days, failures, category_rate, trend, days_since_failure)
+
+    now = datetime.utcnow()
+    table = MaintenanceEquipment.__table__
+    stmt = table.update().where(table.c.id == bindparam('b_id')).values(
+        risk_score=bindparam('b_score'),
+        risk_scored_at=bindparam('b_scored_at'),
+        updated_at=table.c.updated_at
+    )
+    db.session.execute(stmt, [
+        {'b_id': equipment_id, 'b_score': score, 'b_scored_at': now}
+        for equipment_id, score in zip(ids.tolist(), scores.tolist())
+    ])
+    db.session.commit()
+    # Core executemany is invisible to the session's change tracking
+    bump_versions(['maintenance_equipment'])
+    return len(ids)
+
+def schedule_risk_inspections(threshold, today=None):
+    """Create a preventive inspection for high-risk assets without an open preventive request.
+
+    Returns the number of requests created.
+    """
+    today = today or date.today()
+    open_preventive = db.session.query(MaintenanceRequest.equipment_id).filter(
+        MaintenanceRequest.request_type == 'preventive',
+        MaintenanceRequest.stage.in_(['new', 'in_progress'])
+    )
+    targets = db.session.query(
+        MaintenanceEquipment.id,
+        MaintenanceEquipment.category_id,
+        MaintenanceEquipment.team_id,
+        MaintenanceEquipment.technician_id,
+        MaintenanceEquipment.work_center_id,
+        MaintenanceEquipment.risk_score
+    ).filter(
+        MaintenanceEquipment.scrap == False,
+        MaintenanceEquipment.risk_score >= threshold,
+        ~MaintenanceEquipment.id.in_(open_preventive)
+    ).order_by(MaintenanceEquipment.risk_score.desc()).all()
+    if not targets:
+        return 0
+
+    scheduled_at = datetime.combine(today + timedelta(days=1), time(8, 0))
+    names = allocate_request_names(len(targets))
+    db.session.execute(insert(MaintenanceRequest.__table__), [{
+        'name': name,
+        'subject': f'Risk inspection (score {row[5]:.0f})',
+        'request_type': 'preventive',
+        'stage': 'new',
+        'equipment_id': row[0],
+        'category_id': row[1],
+        'team_id': row[2],
+        'technician_id': row[3],
+        'assigned_user_id': row[3],
+        'work_center_id': row[4],
+        'scheduled_date': scheduled_at,
+    } for row, name in zip(targets, names)])
+    db.session.commit()
+    bump_versions(['maintenance_request'])
+    return len(targets)
+
+def run_nightly_risk_scoring(threshold=None):
+    """Refresh scores, then schedule inspections for assets above the configured threshold"""
+    from flask import current_app
+    threshold = threshold if threshold is not None else current_app.config['RISK_INSPECTION_THRESHOLD']
+    scored = refresh_risk_scores()
+    created = schedule_risk_inspections(threshold) if threshold else 0
+    return {'scored': scored, 'inspections_created': created}
+
+if __name__ == '__main__':
+    from app import app
+    with app.app_context():
+        result = run_nightly_risk_scoring()
+        print(f"[OK] Risk scores refreshed for {result['scored']} assets, "
+              f"{result['inspections_created']} inspection(s) scheduled")
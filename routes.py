@@ -5,20 +5,35 @@ All application routes and views
 
 from flask import render_template, request, redirect, url_for, flash, jsonify, session
 from flask_login import login_required, current_user, login_user, logout_user
-from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime, date, timedelta
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
 from app import app
 from models import (
     db, User, Department, MaintenanceCategory, MaintenanceTeam,
     MaintenanceEquipment, MaintenanceRequest, Company, WorkCenter, OTP
 )
-from decorators import admin_required
+from decorators import admin_required, api_token_required, json_login_required
+from db_routing import replica_reads
+from db_utils import violated_constraint
+from rate_limiter import rate_limit
+from password_utils import hash_password, verify_and_upgrade, HashingBusy
+from cache_utils import reference_data
+from http_cache_utils import conditional_page, conditional_json, version_tag
+from workflow_utils import STAGES, BOARD_PAGE_SIZE, change_stage, card_data, stage_counts, board_query, board_page
 from email_utils import (
     send_login_notification, send_otp_email, verify_otp, create_otp,
     send_work_allocation_email, send_work_response_email, send_deadline_response_email
 )
 
 # Authentication Routes
+@app.errorhandler(HashingBusy)
+def handle_hashing_busy(error):
+    """Password hashing queue is saturated; ask the user to retry instead of failing"""
+    app.logger.warning(f'Password hashing rejected: {str(error)}')
+    flash('The server is busy. Please try again in a moment.', 'error')
+    return redirect(request.url)
+
 @app.route('/')
 def index():
     """Home page - redirect based on role"""
@@ -30,6 +45,7 @@ def index():
     return redirect(url_for('login'))
 
 @app.route('/login', methods=['GET', 'POST'])
+@rate_limit('login', per_ip=(20, 60), per_email=(5, 60))
 def login():
     """User login with email - redirects based on role"""
     if request.method == 'POST':
@@ -42,7 +58,9 @@ def login():
         
         user = User.query.filter_by(email=email).first()
         
-        if user and check_password_hash(user.password_hash, password):
+        if user and verify_and_upgrade(user, password):
+            # Persist a hash upgraded to the current parameters
+            db.session.commit()
             if not user.is_active:
                 flash('Account is deactivated. Please contact administrator.', 'error')
                 return render_template('login.html')
@@ -99,6 +117,7 @@ def logout():
     return redirect(url_for('login'))
 
 @app.route('/forgot-password', methods=['GET', 'POST'])
+@rate_limit('forgot_password', per_ip=(5, 300), per_email=(3, 600))
 def forgot_password():
     """Forgot password - send OTP via email"""
     if request.method == 'POST':
@@ -130,6 +149,7 @@ def forgot_password():
     return render_template('forgot_password.html')
 
 @app.route('/reset-password', methods=['GET', 'POST'])
+@rate_limit('reset_password', per_ip=(10, 300), per_email=(5, 600), email_session_key='reset_email')
 def reset_password():
     """Reset password using OTP"""
     email = session.get('reset_email')
@@ -159,7 +179,7 @@ def reset_password():
         # Update password
         user = User.query.filter_by(email=email).first()
         if user:
-            user.password_hash = generate_password_hash(new_password)
+            user.password_hash = hash_password(new_password)
             db.session.commit()
             session.pop('reset_email', None)
             flash('Password reset successfully! Please login with your new password.', 'success')
@@ -185,7 +205,7 @@ def profile():
             if len(new_password) < 8:
                 flash('Password must be at least 8 characters long.', 'error')
                 return render_template('profile.html')
-            current_user.password_hash = generate_password_hash(new_password)
+            current_user.password_hash = hash_password(new_password)
         
         db.session.commit()
         flash('Profile updated successfully!', 'success')
@@ -194,6 +214,7 @@ def profile():
     return render_template('profile.html')
 
 @app.route('/register', methods=['GET', 'POST'])
+@rate_limit('register', per_ip=(5, 600), per_email=(3, 600))
 def register():
     """Portal user registration with password validation"""
     if request.method == 'POST':
@@ -233,26 +254,35 @@ def register():
                 flash(error, 'error')
             return render_template('register.html', name=name, email=email)
         
-        # Generate username from email
-        username = email.split('@')[0]
-        # Ensure username is unique
-        base_username = username
-        counter = 1
-        while User.query.filter_by(username=username).first():
-            username = f"{base_username}{counter}"
-            counter += 1
-        
-        user = User(
-            username=username,
-            email=email.strip(),
-            password_hash=generate_password_hash(password),
-            full_name=name.strip(),
-            is_portal_user=True,
-            is_admin=False,
-            email_verified=False
-        )
-        db.session.add(user)
-        db.session.commit()
+        # Generate a unique username from email; retry if a concurrent sign-up takes it first
+        base_username = email.split('@')[0]
+        password_hash = hash_password(password)
+        for attempt in range(3):
+            user = User(
+                username=User.allocate_username(base_username),
+                email=email.strip(),
+                password_hash=password_hash,
+                full_name=name.strip(),
+                is_portal_user=True,
+                is_admin=False,
+                email_verified=False
+            )
+            db.session.add(user)
+            try:
+                db.session.commit()
+                break
+            except IntegrityError as e:
+                db.session.rollback()
+                constraint = violated_constraint(e)
+                if constraint == User.EMAIL_CONSTRAINT:
+                    # Registered concurrently with the same email; retrying cannot succeed
+                    flash('Email already exists in database', 'error')
+                    return render_template('register.html', name=name, email=email)
+                if constraint != User.USERNAME_CONSTRAINT:
+                    raise
+        else:
+            flash('Could not create your account. Please try again.', 'error')
+            return render_template('register.html', name=name, email=email)
         
         otp_code = create_otp(email, 'email_verification')
         session['verify_email'] = email
@@ -275,6 +305,7 @@ def register():
     return render_template('register.html')
 
 @app.route('/verify-email', methods=['GET', 'POST'])
+@rate_limit('verify_email', per_ip=(10, 300), per_email=(5, 600), email_session_key='verify_email')
 def verify_email():
     """Email verification with OTP"""
     email = session.get('verify_email')
@@ -304,6 +335,7 @@ def verify_email():
     return render_template('verify_email.html', email=email)
 
 @app.route('/resend-otp', methods=['POST'])
+@rate_limit('resend_otp', per_ip=(5, 300), per_email=(3, 600), fallback_endpoint='verify_email')
 def resend_otp():
     """Resend OTP for email verification"""
     email = session.get('verify_email')
@@ -355,7 +387,19 @@ def equipment_detail(id):
     """Equipment detail view - redirects based on role"""
     equipment = MaintenanceEquipment.query.get_or_404(id)
     if current_user.is_admin:
-        return render_template('equipment/detail.html', equipment=equipment)
+        from downtime_utils import equipment_availability
+        request_count, requests_updated = db.session.query(
+            func.count(MaintenanceRequest.id), func.max(MaintenanceRequest.updated_at)
+        ).filter(MaintenanceRequest.equipment_id == equipment.id).one()
+        
+        def render():
+            now = datetime.utcnow()
+            availability = equipment_availability(equipment.id, now - timedelta(days=30), now)
+            return render_template('equipment/detail.html', equipment=equipment, availability=availability)
+        
+        parts = ('equipment', equipment.id, equipment.updated_at, request_count, requests_updated,
+                 version_tag('maintenance_category', 'maintenance_team', 'company', 'work_center', 'department', 'user'))
+        return conditional_page(parts, max(filter(None, [equipment.updated_at, requests_updated]), default=None), render)
     else:
         return redirect(url_for('user_equipment_detail', id=id))
 
@@ -401,17 +445,9 @@ def equipment_new():
         flash('Equipment created successfully!', 'success')
         return redirect(url_for('equipment_detail', id=equipment.id))
     
-    categories = MaintenanceCategory.query.all()
-    teams = MaintenanceTeam.query.all()
-    users = User.query.filter_by(is_active=True).all()
-    departments = Department.query.all()
-    companies = Company.query.all()
-    work_centers = WorkCenter.query.all()
+    refs = reference_data('categories', 'teams', 'users', 'companies', 'work_centers')
     
-    return render_template('equipment/form.html', 
-                         categories=categories, teams=teams, 
-                         users=users, departments=departments,
-                         companies=companies, work_centers=work_centers)
+    return render_template('equipment/form.html', **refs)
 
 @app.route('/equipment/<int:id>/edit', methods=['GET', 'POST'])
 @login_required
@@ -447,17 +483,9 @@ def equipment_edit(id):
         flash('Equipment updated successfully!', 'success')
         return redirect(url_for('equipment_detail', id=equipment.id))
     
-    categories = MaintenanceCategory.query.all()
-    teams = MaintenanceTeam.query.all()
-    users = User.query.filter_by(is_active=True).all()
-    departments = Department.query.all()
-    companies = Company.query.all()
-    work_centers = WorkCenter.query.all()
+    refs = reference_data('categories', 'teams', 'users', 'companies', 'work_centers')
     
-    return render_template('equipment/form.html', equipment=equipment,
-                         categories=categories, teams=teams, 
-                         users=users, departments=departments,
-                         companies=companies, work_centers=work_centers)
+    return render_template('equipment/form.html', equipment=equipment, **refs)
 
 # Maintenance Request Routes
 @app.route('/requests')
@@ -471,6 +499,7 @@ def request_list():
 
 @app.route('/requests/calendar')
 @login_required
+@replica_reads()
 def request_calendar():
     """Calendar view for preventive maintenance"""
     # Show all requests with scheduled dates, but highlight preventive ones
@@ -485,7 +514,10 @@ def request_detail(id):
     """Request detail view - redirects based on role"""
     request_obj = MaintenanceRequest.query.get_or_404(id)
     if current_user.is_admin:
-        return render_template('requests/detail.html', request_obj=request_obj)
+        parts = ('request', request_obj.id, request_obj.updated_at,
+                 version_tag('maintenance_equipment', 'maintenance_category', 'maintenance_team', 'work_center', 'user'))
+        return conditional_page(parts, request_obj.updated_at,
+                                lambda: render_template('requests/detail.html', request_obj=request_obj))
     else:
         # Check if user has access
         if request_obj.assigned_user_id != current_user.id and request_obj.technician_id != current_user.id:
@@ -524,12 +556,8 @@ def request_new():
         flash('Maintenance request created successfully!', 'success')
         return redirect(url_for('request_detail', id=request_obj.id))
     
-    equipment = MaintenanceEquipment.query.filter_by(scrap=False).all()
-    teams = MaintenanceTeam.query.all()
-    users = User.query.all()
-    work_centers = WorkCenter.query.all()
-    
-    return render_template('requests/form.html', equipment=equipment, teams=teams, users=users, work_centers=work_centers)
+    refs = reference_data('teams', 'work_centers')
+    return render_template('requests/form.html', **refs)
 
 @app.route('/requests/<int:id>/update_stage', methods=['POST'])
 @login_required
@@ -539,13 +567,72 @@ def request_update_stage(id):
     request_obj = MaintenanceRequest.query.get_or_404(id)
     new_stage = request.form.get('stage')
     
-    if new_stage in ['new', 'in_progress', 'repaired', 'scrap']:
-        request_obj.update_stage(new_stage)
+    if new_stage in STAGES:
+        change_stage(request_obj, new_stage)
         db.session.commit()
         flash(f'Request moved to {new_stage.replace("_", " ").title()}', 'success')
     
     return redirect(url_for('request_detail', id=id))
 
+@app.route('/api/requests/<int:id>/stage', methods=['POST'])
+@json_login_required(admin=True)
+def api_request_update_stage(id):
+    """Kanban drag-and-drop: move a request and return its card plus the board's column counts"""
+    request_obj = MaintenanceRequest.query.get(id)
+    if not request_obj:
+        return jsonify({'error': 'Request not found'}), 404
+    data = request.get_json(silent=True) or request.form
+    try:
+        change_stage(request_obj, data.get('stage'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    db.session.commit()
+    
+    return jsonify({
+        'request': card_data(request_obj),
+        'counts': stage_counts(board_query(data.get('search', '').strip(), _board_owner(data)))
+    })
+
+def _board_owner(args):
+    # Admins see every request on the admin board; the user board and workers see their own
+    return None if current_user.is_admin and args.get('board') != 'user' else current_user.id
+
+@app.route('/api/requests/board/<stage>')
+@json_login_required()
+@replica_reads()
+def api_request_board(stage):
+    """One page of a kanban column as compact parallel arrays for client-side rendering"""
+    try:
+        page = board_page(board_query(request.args.get('search', '').strip(), _board_owner(request.args)), stage,
+                          request.args.get('limit', BOARD_PAGE_SIZE, type=int), request.args.get('cursor'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return conditional_json(page)
+
+@app.route('/events/requests')
+@login_required
+def request_events_stream():
+    """Server-Sent Events stream of request changes the current user may see"""
+    from request_events import Subscriber, broker, stream
+    from tenant_utils import current_tenant
+    subscriber = Subscriber(current_user.id, current_user.is_admin, current_tenant())
+    if not broker.subscribe(subscriber, app.config['SSE_MAX_SUBSCRIBERS']):
+        response = app.response_class('Too many live connections', status=503, mimetype='text/plain')
+        response.headers['Retry-After'] = '30'
+        return response
+    # Browsers send Last-Event-ID on their own reconnects; our reconnect code passes last_id
+    last_id = request.headers.get('Last-Event-ID') or request.args.get('last_id')
+    # Not wrapped in stream_with_context: the request's session and connection are released
+    # before streaming, so an open stream holds no database connection
+    response = app.response_class(
+        stream(subscriber, last_id, app.config['SSE_STREAM_SECONDS'], app.config['SSE_HEARTBEAT_SECONDS']),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+    # The generator's own cleanup never runs if its body is never iterated (HEAD, early disconnect)
+    response.call_on_close(lambda: broker.unsubscribe(subscriber))
+    return response
+
 @app.route('/requests/<int:id>/edit', methods=['GET', 'POST'])
 @login_required
 @admin_required
@@ -558,7 +645,7 @@ def request_edit(id):
         request_obj.request_type = request.form.get('request_type')
         request_obj.equipment_id = request.form.get('equipment_id')
         request_obj.team_id = request.form.get('team_id')
-        request_obj.assigned_user_id = request.form.get('assigned_user_id')
+        request_obj.assigned_user_id = request.form.get('assigned_user_id') or None
         request_obj.technician_id = request.form.get('technician_id')
         request_obj.maintenance_for_id = request.form.get('maintenance_for_id') or None
         request_obj.work_center_id = request.form.get('work_center_id') or None
@@ -570,13 +657,8 @@ def request_edit(id):
         flash('Request updated successfully!', 'success')
         return redirect(url_for('request_detail', id=request_obj.id))
     
-    equipment = MaintenanceEquipment.query.all()
-    teams = MaintenanceTeam.query.all()
-    users = User.query.all()
-    work_centers = WorkCenter.query.all()
-    
-    return render_template('requests/form.html', request_obj=request_obj,
-                         equipment=equipment, teams=teams, users=users, work_centers=work_centers)
+    refs = reference_data('teams', 'work_centers')
+    return render_template('requests/form.html', request_obj=request_obj, **refs)
 
 @app.route('/requests/<int:id>/delete', methods=['POST'])
 @login_required
@@ -649,9 +731,9 @@ def team_new():
         flash('Team saved successfully!', 'success')
         return redirect(url_for('team_detail', id=team.id))
     
-    users = User.query.filter_by(is_active=True).all()
-    companies = Company.query.all()
-    return render_template('teams/form.html', team=team, users=users, companies=companies)
+    refs = reference_data('users', 'companies')
+    member_ids = {member.id for member in team.members} if team else set()
+    return render_template('teams/form.html', team=team, member_ids=member_ids, **refs)
 
 # Category Routes
 @app.route('/categories')
@@ -690,30 +772,117 @@ def category_new():
         flash('Category saved successfully!', 'success')
         return redirect(url_for('category_list'))
     
-    users = User.query.filter_by(is_active=True).all()
-    companies = Company.query.all()
-    return render_template('categories/form.html', category=category, users=users, companies=companies)
+    refs = reference_data('users', 'companies')
+    return render_template('categories/form.html', category=category, **refs)
 
 # API Routes for AJAX
 @app.route('/api/equipment/<int:id>/requests')
 @login_required
 def api_equipment_requests(id):
-    """Get requests for equipment (for smart button)"""
+    """Get requests for equipment (for smart button); paginated version at /api/v1"""
     equipment = MaintenanceEquipment.query.get_or_404(id)
+    rows = db.session.query(
+        MaintenanceRequest.id, MaintenanceRequest.name, MaintenanceRequest.subject, MaintenanceRequest.stage
+    ).filter(MaintenanceRequest.equipment_id == equipment.id).order_by(MaintenanceRequest.id.desc())
     requests = [{
-        'id': r.id,
-        'name': r.name,
-        'subject': r.subject,
-        'stage': r.stage
-    } for r in equipment.requests]
-    return jsonify(requests)
+        'id': row[0],
+        'name': row[1],
+        'subject': row[2],
+        'stage': row[3]
+    } for row in rows]
+    return conditional_json(requests)
+
+@app.route('/api/availability')
+@login_required
+@admin_required
+@replica_reads()
+def api_availability():
+    """Availability report per equipment, work center or category"""
+    from downtime_utils import availability_report
+    group_by = request.args.get('group_by', 'equipment')
+    try:
+        end = datetime.strptime(request.args['end'], '%Y-%m-%d') if request.args.get('end') else datetime.utcnow()
+        start = datetime.strptime(request.args['start'], '%Y-%m-%d') if request.args.get('start') else end - timedelta(days=30)
+        report = availability_report(start, end, group_by=group_by)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return conditional_json({
+        'group_by': group_by,
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'results': report
+    })
+
+@app.route('/api/lookup/equipment')
+@login_required
+def api_lookup_equipment():
+    """Typeahead search over equipment name and serial number"""
+    from lookup_utils import search_equipment
+    results = search_equipment(
+        request.args.get('q', ''),
+        limit=request.args.get('limit', 20, type=int),
+        include_scrap=request.args.get('include_scrap') == '1'
+    )
+    return conditional_json(results)
+
+@app.route('/api/lookup/users')
+@login_required
+def api_lookup_users():
+    """Typeahead search over user name, username and employee ID"""
+    from lookup_utils import search_users
+    results = search_users(request.args.get('q', ''), limit=request.args.get('limit', 20, type=int))
+    return conditional_json(results)
+
+@app.route('/api/equipment/<int:id>/health-history')
+@login_required
+def api_equipment_health_history(id):
+    """Health trend for charts; the rollup level is picked from the requested range"""
+    from health_history_utils import health_history
+    equipment = MaintenanceEquipment.query.get_or_404(id)
+    try:
+        end = datetime.fromisoformat(request.args['end']) if request.args.get('end') else datetime.utcnow()
+        start = datetime.fromisoformat(request.args['start']) if request.args.get('start') else end - timedelta(days=int(request.args.get('days', 30)))
+        resolution, points = health_history(equipment.id, start, end, request.args.get('resolution'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return conditional_json({
+        'equipment_id': equipment.id,
+        'current': equipment.health_percentage,
+        'resolution': resolution,
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'points': points
+    })
+
+@app.route('/api/meter-readings', methods=['POST'])
+@api_token_required('METER_API_TOKEN')
+def api_meter_readings():
+    """Batch ingest of meter readings; raises requests when thresholds are crossed"""
+    from meter_utils import parse_readings, ingest_readings
+    payload = request.get_json(silent=True)
+    if payload is None:
+        return jsonify({'error': 'Expected a JSON body'}), 400
+    try:
+        rows, errors = parse_readings(payload, app.config['METER_INGEST_MAX_BATCH'])
+        created = ingest_readings(rows) if rows else []
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        app.logger.error(f'Meter ingest failed: {str(e)}')
+        return jsonify({'error': 'Failed to store readings'}), 500
+    return jsonify({
+        'accepted': len(rows),
+        'rejected': errors,
+        'requests_created': [request_obj.name for request_obj in created]
+    })
 
 @app.route('/api/equipment/<int:id>')
 @login_required
 def api_equipment_detail(id):
-    """Get equipment details for auto-fill"""
+    """Get equipment details for auto-fill; use /api/v1/equipment?ids= for several at once"""
     equipment = MaintenanceEquipment.query.get_or_404(id)
-    return jsonify({
+    return conditional_json({
         'category_id': equipment.category_id,
         'team_id': equipment.team_id,
         'technician_id': equipment.technician_id
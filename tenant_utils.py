@@ -0,0 +1,91 @@
+"""
+Tenant scoping for GearGuard
+Restricts ORM queries to the signed-in user's company when TENANT_SCOPING is enabled
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from flask import g, has_request_context
+from flask_login import current_user
+from sqlalchemy import event, or_, select
+from sqlalchemy.orm import with_loader_criteria
+from db_routing import RoutingSession
+from models import (
+    User, Department, MaintenanceCategory, MaintenanceTeam, WorkCenter,
+    MaintenanceEquipment, PreventiveSchedule, MaintenanceRequest
+)
+
+# Models carrying their own company_id; requests belong to their equipment's company
+TENANT_MODELS = (Department, MaintenanceCategory, MaintenanceTeam, WorkCenter, MaintenanceEquipment, PreventiveSchedule)
+
+_unscoped = ContextVar('tenant_unscoped', default=False)
+
+def current_tenant():
+    """Company id queries are currently scoped to, or None"""
+    if _unscoped.get() or not has_request_context():
+        return None
+    return g.get('tenant_id')
+
+@contextmanager
+def unscoped():
+    """Run queries across all companies, e.g. for cross-plant maintenance jobs"""
+    token = _unscoped.set(True)
+    try:
+        yield
+    finally:
+        _unscoped.reset(token)
+
+def tenant_criteria(tenant_id):
+    """Loader options adding company_id filters to every tenant model in a statement.
+
+    The options also reach relationship and lazy loads, so a scoped user
+    cannot walk from one company's rows into another's.
+    """
+    options = [
+        with_loader_criteria(model, lambda cls: cls.company_id == tenant_id, include_aliases=True)
+        for model in TENANT_MODELS
+    ]
+    # Vendors (third-party users) serve every plant, so they stay visible
+    options.append(with_loader_criteria(
+        User, lambda cls: or_(cls.company_id == tenant_id, cls.is_third_party == True), include_aliases=True
+    ))
+    options.append(with_loader_criteria(
+        MaintenanceRequest,
+        lambda cls: cls.equipment_id.in_(
+            select(MaintenanceEquipment.id).where(MaintenanceEquipment.company_id == tenant_id)
+        ),
+        include_aliases=True
+    ))
+    return options
+
+@event.listens_for(RoutingSession, 'do_orm_execute')
+def _scope_to_tenant(orm_execute_state):
+    if orm_execute_state.is_column_load or orm_execute_state.is_relationship_load:
+        # Already covered by the options propagated from the parent query
+        return
+    if not (orm_execute_state.is_select or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    tenant_id = current_tenant()
+    if tenant_id is not None:
+        orm_execute_state.statement = orm_execute_state.statement.options(*tenant_criteria(tenant_id))
+
+@event.listens_for(RoutingSession, 'before_flush')
+def _stamp_tenant(session, flush_context, instances):
+    # New rows created without a company belong to the creator's plant
+    tenant_id = current_tenant()
+    if tenant_id is None:
+        return
+    for obj in session.new:
+        if isinstance(obj, TENANT_MODELS + (User,)) and obj.company_id is None:
+            obj.company_id = tenant_id
+
+def init_app(app):
+    """Resolve the tenant from the signed-in user at the start of each request"""
+    if not app.config['TENANT_SCOPING']:
+        return
+
+    @app.before_request
+    def resolve_tenant():
+        # Loading current_user here runs unscoped, since g.tenant_id is not set yet
+        if current_user.is_authenticated:
+            g.tenant_id = current_user.company_id
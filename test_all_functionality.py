@@ -181,6 +181,13 @@ def test_otp_functionality():
                 print("[FAIL] OTP verification failed")
                 return False
             
+            # OTP can only be consumed once
+            if not verify_otp('test@example.com', otp_code, 'password_reset'):
+                print("[OK] Used OTP correctly rejected")
+            else:
+                print("[FAIL] OTP was accepted twice")
+                return False
+            
             # Test invalid OTP
             is_invalid = verify_otp('test@example.com', '000000', 'password_reset')
             if not is_invalid:
@@ -258,6 +265,1023 @@ def test_data_integrity():
         traceback.print_exc()
         return False
 
+def test_downtime_merging():
+    """Test interval merging for downtime and availability"""
+    print("\n=== Testing Downtime Merging ===")
+    try:
+        import numpy as np
+        from downtime_utils import merge_intervals, merged_downtime
+        
+        merged = merge_intervals([(0, 10), (5, 15), (20, 30), (30, 35)])
+        if merged == [(0, 15), (20, 35)]:
+            print("[OK] Overlapping intervals merged")
+        else:
+            print(f"[FAIL] Unexpected merge result: {merged}")
+            return False
+        
+        # Two equipment, overlapping requests on the first one
+        eq_ids = np.array([1, 1, 2, 1])
+        starts = np.array([0.0, 5.0, 0.0, 50.0])
+        ends = np.array([10.0, 15.0, 100.0, 60.0])
+        ids, downtime = merged_downtime(eq_ids, starts, ends, 100.0)
+        if ids.tolist() == [1, 2] and downtime.tolist() == [25.0, 100.0]:
+            print("[OK] Fleet downtime computed without double counting")
+        else:
+            print(f"[FAIL] Unexpected fleet downtime: {ids.tolist()} {downtime.tolist()}")
+            return False
+        
+        return True
+    except Exception as e:
+        print(f"[FAIL] Downtime merging test failed: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_meter_thresholds():
+    """Test incremental meter threshold evaluation"""
+    print("\n=== Testing Meter Thresholds ===")
+    try:
+        from models import MeterThreshold, MeterThresholdState
+        from meter_utils import _crossed, _recorded_at, parse_readings
+        
+        limit = MeterThreshold(meter='temperature', limit_type='above', limit_value=80)
+        state = MeterThresholdState(triggered=False)
+        fired = [_crossed(limit, state, value) for value in [70, 85, 90, 75, 95]]
+        if fired == [False, True, False, False, True]:
+            print("[OK] Limit fires once per crossing and re-arms")
+        else:
+            print(f"[FAIL] Unexpected limit triggers: {fired}")
+            return False
+        
+        usage = MeterThreshold(meter='runtime_hours', limit_type='usage', limit_value=100)
+        state = MeterThresholdState(triggered=False)
+        fired = [_crossed(usage, state, value) for value in [10, 90, 110, 150, 5, 105]]
+        if fired == [False, False, True, False, False, True]:
+            print("[OK] Usage interval fires every 100 units and survives counter reset")
+        else:
+            print(f"[FAIL] Unexpected usage triggers: {fired}")
+            return False
+        
+        now = datetime(2026, 1, 1)
+        stamps = [_recorded_at(value, now) for value in
+                  ['2026-03-01T10:00:00+02:00', '2026-03-01T10:00:00+00:00', '2026-03-01T10:00:00', None]]
+        if stamps == [datetime(2026, 3, 1, 8, 0), datetime(2026, 3, 1, 10, 0), datetime(2026, 3, 1, 10, 0), now]:
+            print("[OK] Reading timestamps with offsets are stored in UTC")
+        else:
+            print(f"[FAIL] Unexpected reading timestamps: {stamps}")
+            return False
+        
+        rows, errors = parse_readings([{'equipment_id': 1, 'meter': 'temperature', 'value': value}
+                                       for value in ('nan', 'inf', '-inf')], 10)
+        if rows == [] and [error['index'] for error in errors] == [0, 1, 2]:
+            print("[OK] Non-finite reading values rejected per reading")
+        else:
+            print(f"[FAIL] Non-finite readings accepted: {rows}, {errors}")
+            return False
+        
+        return True
+    except Exception as e:
+        print(f"[FAIL] Meter threshold test failed: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_health_history_levels():
+    """Test rollup level selection for health trend charts"""
+    print("\n=== Testing Health History Levels ===")
+    try:
+        from datetime import datetime, timedelta
+        from health_history_utils import choose_resolution, bucket_start
+        
+        now = datetime(2024, 6, 15, 12, 30, 45)
+        picks = [choose_resolution(now - timedelta(days=days), now, now=now) for days in (1, 7, 30, 365, 1000)]
+        if picks == ['raw', 'hour', 'hour', 'day', 'day']:
+            print("[OK] Zoom ranges map to raw, hour and day levels")
+        else:
+            print(f"[FAIL] Unexpected levels: {picks}")
+            return False
+        
+        if bucket_start(now, 'hour') == datetime(2024, 6, 15, 12, 0):
+            print("[OK] Bucket boundaries computed")
+        else:
+            print(f"[FAIL] Unexpected bucket: {bucket_start(now, 'hour')}")
+            return False
+        
+        return True
+    except Exception as e:
+        print(f"[FAIL] Health history test failed: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_risk_scoring():
+    """Test vectorized failure-risk scoring"""
+    print("\n=== Testing Risk Scoring ===")
+    try:
+        import numpy as np
+        from risk_utils import compute_risk_scores
+        
+        # Healthy new asset, worn asset with recent failures, asset without purchase date
+        scores = compute_risk_scores(
+            health=[100, 20, 60],
+            age_days=[30, 3000, np.nan],
+            failures=[0, 5, 1],
+            category_rate=[0.5, 3, 1],
+            trend=[0, -1.5, 0],
+            days_since_failure=[np.nan, 5, 200]
+        )
+        if scores[0] < scores[2] < scores[1] and 0 <= scores.min() and scores.max() <= 100:
+            print(f"[OK] Fleet scored in one pass: {scores.tolist()}")
+        else:
+            print(f"[FAIL] Unexpected risk ordering: {scores.tolist()}")
+            return False
+        
+        return True
+    except Exception as e:
+        print(f"[FAIL] Risk scoring test failed: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_work_center_oee():
+    """Test work center OEE arithmetic and month bucketing"""
+    print("\n=== Testing Work Center OEE ===")
+    try:
+        from datetime import date
+        from decimal import Decimal
+        from work_center_utils import compute_oee, month_start, next_month, previous_month
+        
+        performance, quality, oee = compute_oee(90.0, Decimal('80.00'), 3, 1)
+        if round(performance, 2) == 80.0 and round(quality, 2) == 75.0 and round(oee, 2) == 54.0:
+            print("[OK] OEE is availability x performance x quality")
+        else:
+            print(f"[FAIL] Unexpected OEE: {performance}, {quality}, {oee}")
+            return False
+        
+        performance, quality, oee = compute_oee(100.0, None, 0, 0)
+        if (performance, quality, oee) == (100.0, 100.0, 100.0):
+            print("[OK] Missing efficiency and no closed requests count as 100%")
+        else:
+            print("[FAIL] OEE defaults incorrect")
+            return False
+        
+        if month_start(datetime(2024, 3, 31, 23, 59)) == date(2024, 3, 1) and next_month(date(2024, 12, 1)) == date(2025, 1, 1) \
+                and next_month(date(2024, 1, 1)) == date(2024, 2, 1) and previous_month(date(2024, 1, 1)) == date(2023, 12, 1) \
+                and previous_month(date(2024, 3, 1)) == date(2024, 2, 1):
+            print("[OK] Month buckets and year rollover")
+        else:
+            print("[FAIL] Month bucketing incorrect")
+            return False
+        
+        from models import MaintenanceRequest, MaintenanceEquipment, WorkCenter
+        press = MaintenanceEquipment(name='Press', work_center=WorkCenter(name='Line A', cost_per_hour=Decimal('40.00')))
+        request_obj = MaintenanceRequest(subject='Jam', duration=2.5, equipment=press,
+                                         work_center=WorkCenter(name='Line B', cost_per_hour=Decimal('10.00')))
+        if request_obj.labor_cost == 100.0:
+            print("[OK] Request labor cost uses the equipment's work center, like the rollup")
+        else:
+            print(f"[FAIL] Unexpected request labor cost: {request_obj.labor_cost}")
+            return False
+        
+        return True
+    except Exception as e:
+        print(f"[FAIL] Work center OEE test failed: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_preventive_scheduling():
+    """Test recurrence expansion for preventive maintenance"""
+    print("\n=== Testing Preventive Scheduling ===")
+    try:
+        from datetime import date
+        from pm_scheduler import first_due, plan_occurrences
+        
+        start = date(2024, 1, 1)  # a Monday
+        weekly = (start, 7, frozenset())
+        if first_due(weekly, date(2024, 1, 3)) == date(2024, 1, 8) and first_due(weekly, date(2024, 1, 8)) == date(2024, 1, 8) \
+                and first_due(weekly, date(2023, 12, 1)) == start:
+            print("[OK] Interval rules anchored on the start date")
+        else:
+            print("[FAIL] Interval due dates incorrect")
+            return False
+        
+        tue_thu = (start, 0, frozenset({1, 3}))
+        if first_due(tue_thu, date(2024, 1, 5)) == date(2024, 1, 9) and first_due((start, 0, frozenset()), start) is None:
+            print("[OK] Weekday rules and empty rules")
+        else:
+            print("[FAIL] Weekday due dates incorrect")
+            return False
+        
+        rows = {1: [(10, None, None, None, None), (11, None, None, None, None)], 2: [(20, None, None, None, None)]}
+        rules = {1: weekly, 2: tue_thu}
+        today, horizon_end = date(2024, 1, 1), date(2024, 1, 14)
+        plan = list(plan_occurrences(rows, rules, today, horizon_end))
+        dates = [scheduled_at for scheduled_at, _, _, _ in plan]
+        if dates == sorted(dates) and len(plan) == 8 and not any(exists for *_, exists in plan):
+            print("[OK] Occurrences come out in date order")
+        else:
+            print(f"[FAIL] Occurrence plan incorrect: {plan}")
+            return False
+        
+        existing = {(schedule_id, row[0], scheduled_at) for scheduled_at, schedule_id, row, _ in plan}
+        replanned = list(plan_occurrences(rows, rules, today, horizon_end, existing))
+        if len(replanned) == len(plan) and all(exists for *_, exists in replanned):
+            print("[OK] Regeneration finds every occurrence already present")
+        else:
+            print("[FAIL] Regeneration would duplicate occurrences")
+            return False
+        
+        return True
+    except Exception as e:
+        print(f"[FAIL] Preventive scheduling test failed: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_username_allocation():
+    """Test registration username suffixes and constraint classification"""
+    print("\n=== Testing Username Allocation ===")
+    try:
+        from types import SimpleNamespace
+        from sqlalchemy.exc import IntegrityError
+        from db_utils import violated_constraint
+        
+        if User.first_free_username('jdoe', set()) == 'jdoe' and User.first_free_username('jdoe', {'', '1', '2', '4'}) == 'jdoe3' \
+                and User.first_free_username('jdoe', {'', '2'}) == 'jdoe1':
+            print("[OK] Lowest free suffix picked")
+        else:
+            print("[FAIL] Username suffix incorrect")
+            return False
+        
+        def integrity_error(constraint):
+            return IntegrityError('INSERT', {}, SimpleNamespace(diag=SimpleNamespace(constraint_name=constraint)))
+        if violated_constraint(integrity_error(User.EMAIL_CONSTRAINT)) == 'user_email_key' \
+                and violated_constraint(IntegrityError('INSERT', {}, Exception())) is None:
+            print("[OK] Email and username conflicts told apart")
+        else:
+            print("[FAIL] Constraint classification incorrect")
+            return False
+        
+        return True
+    except Exception as e:
+        print(f"[FAIL] Username allocation test failed: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_background_tasks():
+    """Test background task registration and one-off runs"""
+    print("\n=== Testing Background Tasks ===")
+    try:
+        import background_tasks
+        
+        calls = []
+        saved = list(background_tasks._tasks)
+        try:
+            background_tasks._tasks[:] = []
+            background_tasks.register_task('probe', 3600, lambda: calls.append('first'))
+            background_tasks.register_task('probe', 3600, lambda: calls.append('second'))
+            ran = background_tasks.run_once(app)
+            background_tasks.run_once(app)
+        finally:
+            background_tasks._tasks[:] = saved
+        if ran == ['probe'] and calls == ['second', 'second']:
+            print("[OK] Re-registering replaces a task and --once runs every task")
+        else:
+            print(f"[FAIL] Unexpected task runs: {ran}, {calls}")
+            return False
+        
+        return True
+    except Exception as e:
+        print(f"[FAIL] Background tasks test failed: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_rate_limiter():
+    """Test token bucket rate limiting"""
+    print("\n=== Testing Rate Limiter ===")
+    try:
+        from rate_limiter import MemoryStore, refill
+        
+        store = MemoryStore()
+        results = [store.consume('login:ip:203.0.113.5', 3, 60)[0] for _ in range(4)]
+        if results == [True, True, True, False]:
+            print("[OK] Bucket empties after its capacity")
+        else:
+            print(f"[FAIL] Unexpected bucket results: {results}")
+            return False
+        
+        if store.consume('login:ip:203.0.113.6', 3, 60)[0] and refill(0, 0, 30, 3, 60) == 1.5:
+            print("[OK] Buckets are independent and refill over time")
+        else:
+            print("[FAIL] Bucket refill or isolation broken")
+            return False
+        
+        from flask import session
+        from rate_limiter import rate_limit
+        check_otp = rate_limit('otp_check_test', per_ip=(100, 60), per_email=(2, 60),
+                               email_session_key='reset_email')(lambda: 'checked')
+        outcomes = []
+        for _ in range(3):
+            with app.test_request_context('/reset-password', method='POST', data={'otp': '000000'}):
+                session['verify_email'] = 'other@example.com'
+                session['reset_email'] = 'Victim@Example.com'
+                outcomes.append(check_otp())
+        if outcomes[:2] == ['checked', 'checked'] and outcomes[2].status_code == 302 \
+                and outcomes[2].headers.get('Retry-After'):
+            print("[OK] OTP checks throttled per session email")
+        else:
+            print(f"[FAIL] OTP check throttling incorrect: {outcomes}")
+            return False
+        
+        return True
+    except Exception as e:
+        print(f"[FAIL] Rate limiter test failed: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_password_hashing():
+    """Test pooled password hashing and rehash detection"""
+    print("\n=== Testing Password Hashing ===")
+    try:
+        with app.app_context():
+            from werkzeug.security import generate_password_hash
+            from password_utils import hash_password, verify_password, needs_rehash, pool_stats
+            
+            password_hash = hash_password('Secret#123')
+            if verify_password(password_hash, 'Secret#123') and not verify_password(password_hash, 'wrong'):
+                print("[OK] Password hashed and verified on the pool")
+            else:
+                print("[FAIL] Pooled password verification failed")
+                return False
+            
+            old_hash = generate_password_hash('Secret#123', method='pbkdf2:sha256:1000')
+            if needs_rehash(old_hash) and not needs_rehash(password_hash):
+                print("[OK] Outdated hash parameters detected for rehash")
+            else:
+                print("[FAIL] Rehash detection incorrect")
+                return False
+            
+            print(f"[OK] Pool stats: {pool_stats()}")
+            return True
+    except Exception as e:
+        print(f"[FAIL] Password hashing test failed: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_reference_cache():
+    """Test entity versioning behind the reference-data cache"""
+    print("\n=== Testing Reference Cache ===")
+    try:
+        from cache_utils import entity_version, bump_versions, REFERENCE_LOADERS
+        
+        before = entity_version('maintenance_team')
+        bump_versions({'maintenance_team'})
+        if entity_version('maintenance_team') == before + 1 and entity_version('no_such_table') == 0:
+            print("[OK] Entity versions bump on change")
+        else:
+            print("[FAIL] Entity version registry incorrect")
+            return False
+        
+        expected = {'categories', 'teams', 'users', 'departments', 'companies', 'work_centers'}
+        if expected <= set(REFERENCE_LOADERS):
+            print("[OK] Loaders registered for all dropdown entities")
+        else:
+            print(f"[FAIL] Missing loaders: {expected - set(REFERENCE_LOADERS)}")
+            return False
+        
+        return True
+    except Exception as e:
+        print(f"[FAIL] Reference cache test failed: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_typeahead_lookups():
+    """Test typeahead prefix patterns and result cache"""
+    print("\n=== Testing Typeahead Lookups ===")
+    try:
+        import time
+        from lookup_utils import _prefix_pattern
+        from cache_utils import TTLCache
+        
+        if _prefix_pattern('CNC_5%') == 'cnc\\_5\\%%':
+            print("[OK] Search text escaped into a prefix pattern")
+        else:
+            print(f"[FAIL] Unexpected pattern: {_prefix_pattern('CNC_5%')}")
+            return False
+        
+        cache = TTLCache(ttl=0.05, maxsize=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.set('c', 3)
+        hit = cache.get('c')
+        time.sleep(0.06)
+        if hit == 3 and cache.get('a') is None and cache.get('c') is None:
+            print("[OK] Results cache is bounded and expires")
+        else:
+            print("[FAIL] Results cache did not evict or expire entries")
+            return False
+        
+        return True
+    except Exception as e:
+        print(f"[FAIL] Typeahead lookup test failed: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_read_api_helpers():
+    """Test v1 API field projection, cursors and limits"""
+    print("\n=== Testing Read API Helpers ===")
+    try:
+        from api_utils import (parse_fields, parse_limit, parse_ids, encode_cursor, decode_cursor,
+                               REQUEST_FIELDS, DEFAULT_REQUEST_FIELDS, MAX_LIMIT, MAX_BATCH_IDS)
+        
+        if parse_fields('stage,name,stage', REQUEST_FIELDS, DEFAULT_REQUEST_FIELDS) == ['id', 'stage', 'name']:
+            print("[OK] Requested fields projected with id first")
+        else:
+            print("[FAIL] Field projection incorrect")
+            return False
+        
+        try:
+            parse_fields('password_hash', REQUEST_FIELDS, DEFAULT_REQUEST_FIELDS)
+            print("[FAIL] Unknown field accepted")
+            return False
+        except ValueError:
+            print("[OK] Unknown fields rejected")
+        
+        if decode_cursor(encode_cursor(12345)) == 12345 and parse_limit('100000') == MAX_LIMIT:
+            print("[OK] Cursor round-trips and limit is bounded")
+        else:
+            print("[FAIL] Cursor or limit handling incorrect")
+            return False
+        
+        try:
+            parse_ids(','.join(str(i) for i in range(MAX_BATCH_IDS + 1)))
+            print("[FAIL] Oversized batch accepted")
+            return False
+        except ValueError:
+            print("[OK] Batch lookups are capped")
+        
+        return True
+    except Exception as e:
+        print(f"[FAIL] Read API helper test failed: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_conditional_get():
+    """Test ETag revalidation for pages and JSON APIs"""
+    print("\n=== Testing Conditional GET ===")
+    try:
+        from http_cache_utils import conditional_page, conditional_json, make_etag
+        
+        rendered = []
+        def render():
+            rendered.append(True)
+            return 'page'
+        
+        etag = make_etag(None, 'equipment', 1, datetime(2024, 1, 1))
+        with app.test_request_context(headers={'If-None-Match': f'"{etag}"'}):
+            response = conditional_page(('equipment', 1, datetime(2024, 1, 1)), datetime(2024, 1, 1), render)
+        if response.status_code == 304 and not rendered:
+            print("[OK] Matching ETag answered with 304 without rendering")
+        else:
+            print(f"[FAIL] Expected 304, got {response.status_code}")
+            return False
+        
+        with app.test_request_context():
+            first = conditional_json({'id': 1})
+        with app.test_request_context(headers={'If-None-Match': first.headers['ETag']}):
+            second = conditional_json({'id': 1})
+        with app.test_request_context(headers={'If-None-Match': first.headers['ETag']}):
+            changed = conditional_json({'id': 2})
+        if first.status_code == 200 and second.status_code == 304 and changed.status_code == 200:
+            print("[OK] JSON responses revalidate against their body ETag")
+        else:
+            print("[FAIL] JSON conditional responses incorrect")
+            return False
+        
+        return True
+    except Exception as e:
+        print(f"[FAIL] Conditional GET test failed: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_streaming_exports():
+    """Test CSV and XLSX export streams"""
+    print("\n=== Testing Streaming Exports ===")
+    try:
+        import io
+        import zipfile
+        from export_utils import stream_csv, stream_xlsx
+        
+        headers = ['Name', 'Health %', 'Created At']
+        rows = [('=SUM(A1)', 80, datetime(2024, 1, 2, 3, 4, 5)), ('Pump <A&B>', None, None)]
+        
+        text = ''.join(stream_csv(headers, iter(rows)))
+        if "'=SUM(A1),80,2024-01-02 03:04:05" in text:
+            print("[OK] CSV rows written with formulas neutralised")
+        else:
+            print("[FAIL] Unexpected CSV output")
+            return False
+        
+        workbook = zipfile.ZipFile(io.BytesIO(b''.join(stream_xlsx(headers, iter(rows)))))
+        sheet = workbook.read('xl/worksheets/sheet1.xml').decode()
+        if 'xl/workbook.xml' in workbook.namelist() and 'Pump &lt;A&amp;B&gt;' in sheet and '<v>80</v>' in sheet:
+            print("[OK] XLSX workbook streamed with escaped inline strings")
+        else:
+            print("[FAIL] XLSX workbook incomplete")
+            return False
+        
+        return True
+    except Exception as e:
+        print(f"[FAIL] Streaming export test failed: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_bulk_import_parsing():
+    """Test bulk import row validation and reference lookups"""
+    print("\n=== Testing Bulk Import Parsing ===")
+    try:
+        from import_utils import EquipmentImporter, WorkerImporter, UNUSABLE_PASSWORD
+        
+        importer = EquipmentImporter()
+        importer.lookups = {'categories': {'pumps': 3}, 'teams': {'mechanics': 2}, 'companies': {},
+                            'departments': {}, 'work_centers': {}, 'users': {'jdoe': 7}}
+        values = importer.parse({'name': 'Pump 1', 'serial_number': 'P-001', 'team': 'Mechanics',
+                                 'category': 'pumps', 'technician': 'JDoe', 'health_percentage': '85'})
+        row = dict(zip(importer.columns, values))
+        if row['team_id'] == 2 and row['category_id'] == 3 and row['technician_id'] == 7 and row['health_percentage'] == 85:
+            print("[OK] Names resolved to IDs through lookup maps")
+        else:
+            print(f"[FAIL] Unexpected parsed row: {row}")
+            return False
+        
+        for bad in ({'name': 'Pump 2', 'serial_number': 'P-002', 'team': 'Unknown'},
+                    {'name': 'Pump 3', 'serial_number': 'P-003', 'team': 'mechanics', 'purchase_date': '03/01/2024'}):
+            try:
+                importer.parse(bad)
+                print(f"[FAIL] Invalid row accepted: {bad}")
+                return False
+            except ValueError:
+                pass
+        print("[OK] Invalid rows rejected with a message")
+        
+        long_name = 'Centrifugal pump ' * 9  # 153 characters; the column allows 200
+        values = dict(zip(importer.columns, importer.parse({'name': long_name, 'serial_number': 'P-004', 'team': 'mechanics'})))
+        try:
+            importer.parse({'name': 'x' * 201, 'serial_number': 'P-005', 'team': 'mechanics'})
+            too_long_accepted = True
+        except ValueError:
+            too_long_accepted = False
+        if values['name'] == long_name.strip() and not too_long_accepted:
+            print("[OK] Text limits follow the column lengths")
+        else:
+            print("[FAIL] Text length limits incorrect")
+            return False
+        
+        worker = WorkerImporter()
+        worker.lookups = {'companies': {}, 'departments': {}}
+        values = dict(zip(worker.columns, worker.parse({'email': 'tech@example.com'})))
+        if values['username'] == 'tech@example.com' and values['password_hash'] == UNUSABLE_PASSWORD \
+                and not check_password_hash(values['password_hash'], ''):
+            print("[OK] Imported workers get an unusable password")
+        else:
+            print("[FAIL] Worker defaults incorrect")
+            return False
+        
+        long_email = 'a' * 90 + '@example.com'
+        try:
+            worker.parse({'email': long_email})
+            derived_accepted = True
+        except ValueError:
+            derived_accepted = False
+        values = dict(zip(worker.columns, worker.parse({'email': long_email, 'username': 'a.tech'})))
+        if not derived_accepted and values['username'] == 'a.tech':
+            print("[OK] Emails too long for a username are rejected per row")
+        else:
+            print("[FAIL] Derived username length not checked")
+            return False
+        
+        return True
+    except Exception as e:
+        print(f"[FAIL] Bulk import parsing test failed: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_replica_routing():
+    """Test read replica selection and primary fallbacks"""
+    print("\n=== Testing Replica Routing ===")
+    try:
+        from sqlalchemy import select
+        from db_routing import ReplicaSet, replica_reads
+        
+        replicas = ReplicaSet(['postgresql://gg@replica-a/gearguard', 'postgresql://gg@replica-b/gearguard'], {}, 5, 60)
+        lags = {0: 30.0, 1: 0.5}
+        replicas._measure_lag = lambda index: lags[index]
+        app.extensions['db_replicas'] = replicas
+        try:
+            with app.test_request_context():
+                statement = select(MaintenanceEquipment)
+                outside = db.session.get_bind(clause=statement)
+                with replica_reads():
+                    hosts = {db.session.get_bind(clause=statement).url.host for _ in range(4)}
+                    locked = db.session.get_bind(clause=statement.with_for_update())
+                    db.session.info['wrote'] = True
+                    after_write = db.session.get_bind(clause=statement)
+                    db.session.info.pop('wrote')
+        finally:
+            app.extensions.pop('db_replicas', None)
+        
+        if hosts == {'replica-b'}:
+            print("[OK] Reads go to the replica within the lag limit")
+        else:
+            print(f"[FAIL] Unexpected replica choice: {hosts}")
+            return False
+        
+        if all(engine.url.host not in ('replica-a', 'replica-b') for engine in (outside, locked, after_write)):
+            print("[OK] Unmarked reads, locking reads and reads after a write use the primary")
+        else:
+            print("[FAIL] Primary-only query was routed to a replica")
+            return False
+        
+        return True
+    except Exception as e:
+        print(f"[FAIL] Replica routing test failed: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_pool_telemetry():
+    """Test connection pool checkout metrics and idle pings"""
+    print("\n=== Testing Pool Telemetry ===")
+    try:
+        import sqlite3
+        from sqlalchemy import exc
+        import db_pool
+        
+        pool = db_pool.InstrumentedQueuePool(lambda: sqlite3.connect(':memory:'), pool_size=1, max_overflow=0, timeout=0.05)
+        first = pool.connect()
+        try:
+            pool.connect()
+            print("[FAIL] Exhausted pool handed out a connection")
+            return False
+        except exc.TimeoutError:
+            pass
+        first.close()
+        
+        saved = dict(db_pool._settings)
+        db_pool._settings.update(ping='idle', ping_idle_seconds=0)
+        try:
+            pool.connect().close()
+        finally:
+            db_pool._settings.update(saved)
+        
+        stats = pool.metrics.snapshot()
+        if stats['checkouts'] == 2 and stats['timeouts'] == 1 and stats['pings'] == 1 \
+                and sum(stats['checkout_histogram'].values()) == 2:
+            print("[OK] Checkouts, timeouts and idle pings recorded")
+        else:
+            print(f"[FAIL] Unexpected pool metrics: {stats}")
+            return False
+        
+        options = db_pool.engine_options(dict(app.config, DB_PGBOUNCER=True))
+        if options == {'poolclass': db_pool.InstrumentedNullPool}:
+            print("[OK] PgBouncer mode leaves pooling to PgBouncer")
+        else:
+            print(f"[FAIL] Unexpected PgBouncer options: {options}")
+            return False
+        
+        return True
+    except Exception as e:
+        print(f"[FAIL] Pool telemetry test failed: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_request_archival():
+    """Test archive table and history view definitions"""
+    print("\n=== Testing Request Archival ===")
+    try:
+        from models import maintenance_request_archive, request_history
+        from archive_utils import history_view_sql
+        
+        live_columns = [column.name for column in MaintenanceRequest.__table__.columns]
+        archive_columns = [column.name for column in maintenance_request_archive.columns]
+        if archive_columns == live_columns + ['archived_at'] and not maintenance_request_archive.foreign_keys:
+            print("[OK] Archive table mirrors maintenance_request without foreign keys")
+        else:
+            print("[FAIL] Archive table columns out of sync")
+            return False
+        
+        sql = history_view_sql()
+        if 'UNION ALL' in sql and 'maintenance_request_history' not in db.metadata.tables \
+                and [column.name for column in request_history.columns] == live_columns + ['archived']:
+            print("[OK] History view covers live and archived requests")
+        else:
+            print("[FAIL] History view definition incorrect")
+            return False
+        
+        return True
+    except Exception as e:
+        print(f"[FAIL] Request archival test failed: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_tenant_scoping():
+    """Test company scoping criteria and tenant-leading indexes"""
+    print("\n=== Testing Tenant Scoping ===")
+    try:
+        from flask import g
+        from sqlalchemy import select
+        from sqlalchemy.dialects import postgresql
+        from tenant_utils import current_tenant, unscoped, tenant_criteria
+        from models import TENANT_INDEXES
+        
+        with app.test_request_context():
+            g.tenant_id = 7
+            with unscoped():
+                inner = current_tenant()
+            if current_tenant() == 7 and inner is None:
+                print("[OK] Tenant resolves per request and can be lifted")
+            else:
+                print("[FAIL] Tenant resolution incorrect")
+                return False
+        
+        statement = select(MaintenanceRequest.id).options(*tenant_criteria(7))
+        sql = str(statement.compile(dialect=postgresql.dialect(), compile_kwargs={'literal_binds': True}))
+        if 'maintenance_equipment.company_id = 7' in sql:
+            print("[OK] Requests scoped through their equipment's company")
+        else:
+            print("[FAIL] Request scoping missing")
+            return False
+        
+        if all(index.expressions[0].name == 'company_id' for index in TENANT_INDEXES):
+            print("[OK] Tenant indexes lead with company_id")
+        else:
+            print("[FAIL] Tenant index column order incorrect")
+            return False
+        
+        return True
+    except Exception as e:
+        print(f"[FAIL] Tenant scoping test failed: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_fragment_cache():
+    """Test fragment cache stores and the {% cache %} template tag"""
+    print("\n=== Testing Fragment Cache ===")
+    try:
+        import tempfile
+        from fragment_cache import MemoryStore, FileStore
+        
+        store = MemoryStore(maxsize=2)
+        store.set('a', '<p>a</p>', 60)
+        store.set('b', '<p>b</p>', 60)
+        store.get('a')
+        store.set('c', '<p>c</p>', 60)
+        if store.get('a') == '<p>a</p>' and store.get('b') is None and len(store) == 2:
+            print("[OK] LRU evicts the least recently used fragment")
+        else:
+            print("[FAIL] LRU eviction incorrect")
+            return False
+        
+        with tempfile.TemporaryDirectory() as directory:
+            files = FileStore(directory)
+            files.set('k', '<p>shared</p>', 60)
+            files.set('old', '<p>old</p>', -1)
+            if files.get('k') == '<p>shared</p>' and files.get('old') is None and files.purge() == 1:
+                print("[OK] File store shares fragments and drops expired ones")
+            else:
+                print("[FAIL] File store incorrect")
+                return False
+        
+        calls = []
+        def load():
+            calls.append(1)
+            return 'loaded'
+        template = app.jinja_env.from_string("{% cache 'test-fragment', depends=('maintenance_team',), vary=(1,) %}{{ load() }}{% endcache %}")
+        with app.test_request_context():
+            first = template.render(load=load)
+            second = template.render(load=load)
+        if first == second == 'loaded' and len(calls) == 1:
+            print("[OK] Cached block skips its loader on a hit")
+        else:
+            print(f"[FAIL] Cached block rendered {len(calls)} times")
+            return False
+        
+        return True
+    except Exception as e:
+        print(f"[FAIL] Fragment cache test failed: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_cache_bus():
+    """Test invalidation messages from other worker processes"""
+    print("\n=== Testing Cache Bus ===")
+    try:
+        import json
+        from cache_bus import Listener, CHANNEL, origin
+        from cache_utils import entity_version
+        
+        listener = Listener(app)
+        before = entity_version('maintenance_team')
+        listener._dispatch(CHANNEL, json.dumps({'origin': origin(), 'tables': ['maintenance_team']}))
+        if entity_version('maintenance_team') == before:
+            print("[OK] Own messages are ignored")
+        else:
+            print("[FAIL] Own message bumped versions twice")
+            return False
+        
+        listener._dispatch(CHANNEL, json.dumps({'origin': 'other-host:1', 'tables': ['maintenance_team']}))
+        listener._dispatch(CHANNEL, 'not json')
+        if entity_version('maintenance_team') == before + 1 and listener.received == 1:
+            print("[OK] Messages from other processes invalidate cached entities")
+        else:
+            print("[FAIL] Foreign message not applied")
+            return False
+        
+        return True
+    except Exception as e:
+        print(f"[FAIL] Cache bus test failed: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_request_event_stream():
+    """Test live request event visibility, replay and stream framing"""
+    print("\n=== Testing Request Event Stream ===")
+    try:
+        from request_events import Subscriber, Broker, format_event
+        
+        request_event = {'type': 'stage_changed', 'id': 5, 'request_id': 1, 'company_id': 2,
+                         'assigned_user_id': 10, 'technician_id': 11, 'allocated_to_id': None}
+        if Subscriber(1, True, None).can_see(request_event) and Subscriber(11, False, None).can_see(request_event) \
+                and not Subscriber(12, False, None).can_see(request_event) and not Subscriber(1, True, 3).can_see(request_event):
+            print("[OK] Events filtered by role, involvement and tenant")
+        else:
+            print("[FAIL] Event visibility incorrect")
+            return False
+        
+        broker = Broker(history=2)
+        subscriber = Subscriber(1, True, None, maxsize=1)
+        broker.subscribe(subscriber, limit=1)
+        full = not broker.subscribe(Subscriber(2, True, None), limit=1)
+        ids = [broker.publish(request_event)['id'] for _ in range(3)]
+        if full and subscriber.overflowed and [e['id'] for e in broker.since(ids[1])] == [ids[2]] \
+                and broker.since(f'{broker.epoch}-0') is None:
+            print("[OK] Subscriber cap, overflow and replay buffer")
+        else:
+            print("[FAIL] Broker bookkeeping incorrect")
+            return False
+        
+        if ids == [f'{broker.epoch}-{n}' for n in (1, 2, 3)] and broker.since(ids[2]) == [] \
+                and broker.since('0badbeef-2') is None and broker.since('17') is None:
+            print("[OK] Event ids follow receive order; ids from another broker force a resync")
+        else:
+            print(f"[FAIL] Unexpected event ids or replay: {ids}")
+            return False
+        
+        frame = format_event(request_event)
+        if frame.startswith('id: 5\nevent: stage_changed\ndata: {') and frame.endswith('\n\n'):
+            print("[OK] Events framed as SSE messages")
+        else:
+            print("[FAIL] SSE framing incorrect")
+            return False
+        
+        from request_events import broker as live_broker
+        with app.test_request_context('/events/requests', method='HEAD'):
+            login_user(User(id=999, username='viewer', email='viewer@example.com', is_admin=True, is_active=True))
+            before = len(live_broker)
+            response = app.view_functions['request_events_stream']()
+            opened = len(live_broker) == before + 1
+            response.close()
+        if opened and len(live_broker) == before:
+            print("[OK] Stream slot released when the body is never read")
+        else:
+            print("[FAIL] Unread stream leaked its subscriber slot")
+            return False
+        
+        return True
+    except Exception as e:
+        print(f"[FAIL] Request event stream test failed: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_request_workflow():
+    """Test the workflow actions behind the JSON kanban endpoints"""
+    print("\n=== Testing Request Workflow ===")
+    try:
+        from workflow_utils import change_stage, record_worker_response, card_data
+        
+        request_obj = MaintenanceRequest(name='REQ-1', subject='Leak', stage='new', start_date=datetime.utcnow() - timedelta(hours=2))
+        change_stage(request_obj, 'repaired')
+        try:
+            change_stage(request_obj, 'done')
+            rejected = False
+        except ValueError:
+            rejected = True
+        if rejected and request_obj.stage == 'repaired' and request_obj.end_date and round(request_obj.duration) == 2:
+            print("[OK] Stage changes validated and timed")
+        else:
+            print("[FAIL] Stage change incorrect")
+            return False
+        
+        record_worker_response(request_obj, 'accept', 'ok', '2030-01-02T09:30')
+        proposed = request_obj.worker_response == 'deadline_proposed' and request_obj.deadline_status == 'pending'
+        record_worker_response(request_obj, 'reject', 'busy')
+        if proposed and request_obj.allocation_status == 'rejected' and request_obj.worker_response_reason == 'busy':
+            print("[OK] Worker responses recorded")
+        else:
+            print("[FAIL] Worker response incorrect")
+            return False
+        
+        card = card_data(request_obj)
+        if card['name'] == 'REQ-1' and card['stage'] == 'repaired' and card['equipment'] is None:
+            print("[OK] Card data built from request")
+        else:
+            print("[FAIL] Card data incorrect")
+            return False
+        
+        with app.test_request_context('/api/requests/1/stage', method='POST', json={'stage': 'new'}):
+            response, status = app.view_functions['api_request_update_stage'](id=1)
+            if status == 401 and response.get_json().get('error'):
+                print("[OK] JSON endpoints answer anonymous users with JSON")
+            else:
+                print(f"[FAIL] Anonymous JSON call returned {status}")
+                return False
+        
+        with app.test_request_context('/api/requests/1/stage', method='POST', json={'stage': 'scrap'}):
+            login_user(User(id=999, username='worker', email='worker@example.com', is_admin=False, is_active=True))
+            response, status = app.view_functions['api_request_update_stage'](id=1)
+            if status == 403:
+                print("[OK] Only administrators can move requests between stages")
+            else:
+                print(f"[FAIL] Non-admin stage change returned {status}")
+                return False
+        
+        return True
+    except Exception as e:
+        print(f"[FAIL] Request workflow test failed: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_board_payload():
+    """Test the compact kanban column payload"""
+    print("\n=== Testing Board Payload ===")
+    try:
+        from workflow_utils import board_page, board_query, card_flags, OVERDUE, ALLOCATABLE
+        
+        now = datetime.utcnow()
+        past = now - timedelta(days=1)
+        if card_flags('new', past, 'pending', None, now) == OVERDUE | ALLOCATABLE \
+                and card_flags('repaired', past, 'allocated', 5, now) == 0 \
+                and card_flags('in_progress', now + timedelta(days=1), 'accepted', 5, now) == 0:
+            print("[OK] Card flags encode overdue and allocatable")
+        else:
+            print("[FAIL] Card flags incorrect")
+            return False
+        
+        with app.app_context():
+            try:
+                board_page(board_query(), 'done')
+                rejected = False
+            except ValueError:
+                rejected = True
+        if rejected:
+            print("[OK] Unknown columns rejected")
+        else:
+            print("[FAIL] Unknown column accepted")
+            return False
+        
+        with app.test_request_context('/api/requests/board/new'):
+            response, status = app.view_functions['api_request_board'](stage='new')
+            if status == 401:
+                print("[OK] Board pages require a login")
+            else:
+                print(f"[FAIL] Anonymous board call returned {status}")
+                return False
+        
+        return True
+    except Exception as e:
+        print(f"[FAIL] Board payload test failed: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return False
+
 def main():
     """Run all tests"""
     print("=" * 60)
@@ -275,6 +1299,31 @@ def main():
     results.append(("OTP Functionality", test_otp_functionality()))
     results.append(("Relationships", test_relationships()))
     results.append(("Data Integrity", test_data_integrity()))
+    results.append(("Downtime Merging", test_downtime_merging()))
+    results.append(("Meter Thresholds", test_meter_thresholds()))
+    results.append(("Health History Levels", test_health_history_levels()))
+    results.append(("Risk Scoring", test_risk_scoring()))
+    results.append(("Work Center OEE", test_work_center_oee()))
+    results.append(("Preventive Scheduling", test_preventive_scheduling()))
+    results.append(("Username Allocation", test_username_allocation()))
+    results.append(("Background Tasks", test_background_tasks()))
+    results.append(("Rate Limiter", test_rate_limiter()))
+    results.append(("Password Hashing", test_password_hashing()))
+    results.append(("Reference Cache", test_reference_cache()))
+    results.append(("Typeahead Lookups", test_typeahead_lookups()))
+    results.append(("Read API Helpers", test_read_api_helpers()))
+    results.append(("Conditional GET", test_conditional_get()))
+    results.append(("Streaming Exports", test_streaming_exports()))
+    results.append(("Bulk Import Parsing", test_bulk_import_parsing()))
+    results.append(("Replica Routing", test_replica_routing()))
+    results.append(("Pool Telemetry", test_pool_telemetry()))
+    results.append(("Request Archival", test_request_archival()))
+    results.append(("Tenant Scoping", test_tenant_scoping()))
+    results.append(("Fragment Cache", test_fragment_cache()))
+    results.append(("Cache Bus", test_cache_bus()))
+    results.append(("Request Event Stream", test_request_event_stream()))
+    results.append(("Request Workflow", test_request_workflow()))
+    results.append(("Board Payload", test_board_payload()))
     
     print("\n" + "=" * 60)
     print("Test Summary")
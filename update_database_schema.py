@@ -90,6 +90,100 @@ def update_schema():
                     except Exception as e:
                         print(f"[INFO] Foreign key constraint may already exist: {e}")
                 
+                # Create tables added since the initial schema (preventive schedules, rollups, ...)
+                db.create_all()
+                
+                # Check and add preventive schedule link to maintenance_request
+                result = conn.execute(text("""
+                    SELECT column_name 
+                    FROM information_schema.columns 
+                    WHERE table_name='maintenance_request' AND column_name='pm_schedule_id'
+                """))
+                if not result.fetchone():
+                    conn.execute(text("ALTER TABLE maintenance_request ADD COLUMN pm_schedule_id INTEGER REFERENCES preventive_schedule(id)"))
+                    conn.commit()
+                    print("[OK] Added pm_schedule_id column to maintenance_request")
+                
+                conn.execute(text("""
+                    CREATE UNIQUE INDEX IF NOT EXISTS uq_request_pm_occurrence
+                    ON maintenance_request (pm_schedule_id, equipment_id, scheduled_date)
+                """))
+                conn.commit()
+                
+                # Check and add failure risk fields to maintenance_equipment
+                risk_fields = [
+                    ('risk_score', 'DOUBLE PRECISION'),
+                    ('risk_scored_at', 'TIMESTAMP')
+                ]
+                
+                for field_name, field_type in risk_fields:
+                    result = conn.execute(text(f"""
+                        SELECT column_name 
+                        FROM information_schema.columns 
+                        WHERE table_name='maintenance_equipment' AND column_name='{field_name}'
+                    """))
+                    if not result.fetchone():
+                        conn.execute(text(f"ALTER TABLE maintenance_equipment ADD COLUMN {field_name} {field_type}"))
+                        conn.commit()
+                        print(f"[OK] Added {field_name} column to maintenance_equipment")
+                
+                # Composite OTP indexes (replace the single-column email index)
+                conn.execute(text("CREATE INDEX IF NOT EXISTS ix_otp_email_purpose_used ON otp (email, purpose, used)"))
+                conn.execute(text("CREATE INDEX IF NOT EXISTS ix_otp_expires_at ON otp (expires_at)"))
+                conn.execute(text("DROP INDEX IF EXISTS ix_otp_email"))
+                conn.commit()
+                
+                # Prefix index for username allocation
+                conn.execute(text("CREATE INDEX IF NOT EXISTS ix_user_username_pattern ON \"user\" (username varchar_pattern_ops)"))
+                conn.commit()
+                
+                # Case-insensitive prefix indexes for typeahead lookups
+                prefix_indexes = [
+                    ('ix_user_full_name_prefix', '"user"', 'full_name'),
+                    ('ix_user_username_prefix', '"user"', 'username'),
+                    ('ix_user_employee_id_prefix', '"user"', 'employee_id'),
+                    ('ix_equipment_name_prefix', 'maintenance_equipment', 'name'),
+                    ('ix_equipment_serial_prefix', 'maintenance_equipment', 'serial_number')
+                ]
+                for index_name, table_name, column_name in prefix_indexes:
+                    conn.execute(text(f"CREATE INDEX IF NOT EXISTS {index_name} ON {table_name} (lower({column_name}) text_pattern_ops)"))
+                conn.commit()
+                
+                # Keyset pagination index for the /api/v1 request listings
+                conn.execute(text("CREATE INDEX IF NOT EXISTS ix_request_equipment_id_desc ON maintenance_request (equipment_id, id DESC)"))
+                conn.commit()
+                
+                # Archive of closed requests, the history view over both tables, and the open-work index
+                from models import maintenance_request_archive
+                from archive_utils import history_view_sql
+                maintenance_request_archive.create(bind=conn, checkfirst=True)
+                for index in maintenance_request_archive.indexes:
+                    index.create(bind=conn, checkfirst=True)
+                conn.execute(text(history_view_sql()))
+                conn.execute(text("CREATE INDEX IF NOT EXISTS ix_request_open_stage_created ON maintenance_request (stage, created_at) WHERE stage IN ('new', 'in_progress')"))
+                conn.commit()
+                
+                # Request name sequence, started after the highest MR number in use
+                from models import REQUEST_NAME_SEQ_SYNC_SQL
+                conn.execute(text("CREATE SEQUENCE IF NOT EXISTS request_name_seq"))
+                conn.execute(text(REQUEST_NAME_SEQ_SYNC_SQL))
+                conn.commit()
+                
+                # Kanban column pages
+                conn.execute(text("CREATE INDEX IF NOT EXISTS ix_request_stage_id_desc ON maintenance_request (stage, id DESC)"))
+                conn.commit()
+                
+                # Company-leading indexes for tenant-scoped queries
+                from models import TENANT_INDEXES
+                for index in TENANT_INDEXES:
+                    index.create(bind=conn, checkfirst=True)
+                conn.commit()
+                
+                # Shared store for the template fragment cache
+                from models import FragmentCacheEntry
+                FragmentCacheEntry.__table__.create(bind=conn, checkfirst=True)
+                conn.commit()
+                
                 print("\n[OK] Database schema updated successfully!")
         except Exception as e:
             print(f"[ERROR] Error updating schema: {str(e)}")
@@ -89,37 +89,9 @@ def user_request_detail(id):
 @login_required
 @user_or_admin_required
 def user_requests():
-    """User can view their own requests with search"""
+    """User can view their own requests with search; the cards load from api_request_board"""
     search_query = request.args.get('search', '').strip()
-    
-    # Base query
-    query = MaintenanceRequest.query.filter(
-        (MaintenanceRequest.assigned_user_id == current_user.id) |
-        (MaintenanceRequest.technician_id == current_user.id)
-    )
-    
-    # Apply search filter
-    if search_query:
-        query = query.join(MaintenanceEquipment).filter(
-            or_(
-                MaintenanceRequest.name.ilike(f'%{search_query}%'),
-                MaintenanceRequest.subject.ilike(f'%{search_query}%'),
-                MaintenanceRequest.request_type.ilike(f'%{search_query}%'),
-                MaintenanceEquipment.name.ilike(f'%{search_query}%'),
-                MaintenanceEquipment.serial_number.ilike(f'%{search_query}%')
-            )
-        )
-    
-    requests = query.order_by(MaintenanceRequest.created_at.desc()).all()
-    
-    requests_by_stage = {
-        'new': [r for r in requests if r.stage == 'new'],
-        'in_progress': [r for r in requests if r.stage == 'in_progress'],
-        'repaired': [r for r in requests if r.stage == 'repaired'],
-        'scrap': [r for r in requests if r.stage == 'scrap']
-    }
-    
-    return render_template('user/requests.html', requests_by_stage=requests_by_stage, search_query=search_query)
+    return render_template('user/requests.html', search_query=search_query)
 
 # User - View Equipment (Read-only)
 @app.route('/user/equipment')
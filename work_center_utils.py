@@ -0,0 +1,226 @@
+"""
+Work center analytics for GearGuard
+Labor cost and OEE per work center, aggregated in SQL and cached in a monthly rollup table
+"""
+
+from datetime import datetime, date
+from decimal import Decimal
+from sqlalchemy import func, case
+from sqlalchemy.dialects.postgresql import insert
+from models import db, WorkCenter, WorkCenterCostRollup, MaintenanceEquipment, request_history
+from downtime_utils import availability_report
+
+def month_start(value):
+    """First day of the month for a date or datetime"""
+    return date(value.year, value.month, 1)
+
+def previous_month(value):
+    """First day of the preceding month"""
+    if value.month == 1:
+        return date(value.year - 1, 12, 1)
+    return date(value.year, value.month - 1, 1)
+
+def next_month(value):
+    """First day of the following month"""
+    if value.month == 12:
+        return date(value.year + 1, 1, 1)
+    return date(value.year, value.month + 1, 1)
+
+def _percent(value):
+    return Decimal(str(round(value, 2)))
+
+def compute_oee(availability, capacity_time_efficiency, repaired_count, scrap_count):
+    """Actual OEE percentage as availability x performance x quality.
+
+    Performance comes from the work center capacity time efficiency and quality
+    is the share of closed requests that ended repaired rather than scrapped.
+    """
+    performance = float(capacity_time_efficiency if capacity_time_efficiency is not None else 100) / 100.0
+    closed = (repaired_count or 0) + (scrap_count or 0)
+    quality = (repaired_count / closed) if closed else 1.0
+    oee = (availability / 100.0) * performance * quality * 100.0
+    return performance * 100.0, quality * 100.0, oee
+
+def refresh_work_center_rollup(since=None):
+    """Recompute the monthly rollup from request history.
+
+    A request counts towards the work center its equipment belongs to
+    (MaintenanceEquipment.work_center_id), not the work center recorded on the
+    request. Downtime is grouped the same way, so each row's costs and
+    availability describe the same set of assets.
+
+    Costs, hours and counts are aggregated in one GROUP BY query; availability
+    comes from merged downtime intervals once per month. Rows are upserted,
+    so the refresh can be re-run for any range, and rows in the range that no
+    longer have any requests are deleted. Returns the number of rows written.
+    """
+    # Includes archived requests so past months keep their costs after archival
+    history = request_history.c
+    bucket = func.coalesce(history.end_date, history.start_date, history.created_at)
+    month_col = func.date_trunc('month', bucket).label('month')
+    work_center_col = MaintenanceEquipment.work_center_id
+    query = db.session.query(
+        work_center_col,
+        month_col,
+        func.count(history.id),
+        func.sum(case((history.stage == 'repaired', 1), else_=0)),
+        func.sum(case((history.stage == 'scrap', 1), else_=0)),
+        func.coalesce(func.sum(history.duration), 0),
+        func.coalesce(func.sum(history.duration * WorkCenter.cost_per_hour), 0)
+    ).select_from(request_history).join(
+        MaintenanceEquipment, history.equipment_id == MaintenanceEquipment.id
+    ).join(
+        WorkCenter, work_center_col == WorkCenter.id
+    ).group_by(work_center_col, month_col)
+    if since:
+        query = query.filter(bucket >= month_start(since))
+    aggregates = query.all()
+    now = datetime.utcnow()
+    if not aggregates:
+        _delete_stale_rollups(since, now)
+        db.session.commit()
+        return 0
+
+    work_centers = {
+        wc.id: wc for wc in WorkCenter.query.filter(
+            WorkCenter.id.in_({row[0] for row in aggregates})
+        ).all()
+    }
+
+    # Merged downtime per work center, one vectorized pass per month
+    availability_by_month = {}
+    for month in sorted({month_start(row[1]) for row in aggregates}):
+        window_start = datetime.combine(month, datetime.min.time())
+        window_end = min(datetime.combine(next_month(month), datetime.min.time()), datetime.utcnow())
+        if window_end <= window_start:
+            continue
+        availability_by_month[month] = {
+            row['id']: row for row in availability_report(window_start, window_end, group_by='work_center')
+        }
+
+    values = []
+    for work_center_id, month_value, count, repaired, scrap, hours, cost in aggregates:
+        month = month_start(month_value)
+        wc = work_centers[work_center_id]
+        downtime = availability_by_month.get(month, {}).get(work_center_id)
+        availability = downtime['availability'] if downtime else 100.0
+        performance, quality, oee = compute_oee(availability, wc.capacity_time_efficiency, repaired, scrap)
+        values.append({
+            'work_center_id': work_center_id,
+            'month': month,
+            'request_count': count,
+            'repaired_count': repaired,
+            'scrap_count': scrap,
+            'labor_hours': float(hours),
+            'labor_cost': Decimal(str(cost)).quantize(Decimal('0.01')),
+            'downtime_hours': downtime['downtime_hours'] if downtime else 0.0,
+            'availability': _percent(availability),
+            'performance': _percent(performance),
+            'quality': _percent(quality),
+            'oee': _percent(oee),
+            'oee_target': wc.oee_target,
+            'refreshed_at': now
+        })
+
+    stmt = insert(WorkCenterCostRollup).values(values)
+    stmt = stmt.on_conflict_do_update(
+        constraint='uq_work_center_cost_rollup_month',
+        set_={column: stmt.excluded[column] for column in values[0] if column not in ('work_center_id', 'month')}
+    )
+    db.session.execute(stmt)
+    _delete_stale_rollups(since, now)
+    db.session.commit()
+    return len(values)
+
+def _delete_stale_rollups(since, refreshed_at):
+    # Every row still backed by requests was just upserted with refreshed_at
+    stale = WorkCenterCostRollup.query.filter(WorkCenterCostRollup.refreshed_at < refreshed_at)
+    if since:
+        stale = stale.filter(WorkCenterCostRollup.month >= month_start(since))
+    stale.delete(synchronize_session=False)
+
+def refresh_recent_work_center_rollup(today=None):
+    """Background job: refresh the previous and current month only.
+
+    The previous month is included so requests closed just before the month
+    boundary are picked up on the next run.
+    """
+    today = today or date.today()
+    return refresh_work_center_rollup(since=previous_month(month_start(today)))
+
+def work_center_cost_report(start_month=None, end_month=None, work_center_id=None, group_by='month'):
+    """Labor cost and OEE from the rollup table.
+
+    group_by='month' returns one row per work center and month;
+    group_by='work_center' totals each work center over the range.
+    """
+    query = db.session.query(WorkCenterCostRollup, WorkCenter.name).join(
+        WorkCenter, WorkCenterCostRollup.work_center_id == WorkCenter.id
+    )
+    filters = []
+    if start_month:
+        filters.append(WorkCenterCostRollup.month >= month_start(start_month))
+    if end_month:
+        filters.append(WorkCenterCostRollup.month <= month_start(end_month))
+    if work_center_id:
+        filters.append(WorkCenterCostRollup.work_center_id == work_center_id)
+
+    if group_by == 'work_center':
+        totals = db.session.query(
+            WorkCenter.id,
+            WorkCenter.name,
+            WorkCenter.oee_target,
+            func.sum(WorkCenterCostRollup.request_count),
+            func.sum(WorkCenterCostRollup.labor_hours),
+            func.sum(WorkCenterCostRollup.labor_cost),
+            func.sum(WorkCenterCostRollup.downtime_hours),
+            func.avg(WorkCenterCostRollup.oee)
+        ).join(
+            WorkCenterCostRollup, WorkCenterCostRollup.work_center_id == WorkCenter.id
+        ).filter(*filters).group_by(WorkCenter.id, WorkCenter.name, WorkCenter.oee_target).order_by(WorkCenter.name).all()
+        return [{
+            'work_center_id': row[0],
+            'work_center': row[1],
+            'oee_target': float(row[2]) if row[2] is not None else None,
+            'request_count': int(row[3] or 0),
+            'labor_hours': round(float(row[4] or 0), 2),
+            'labor_cost': float(row[5] or 0),
+            'downtime_hours': round(float(row[6] or 0), 2),
+            'oee': round(float(row[7]), 2) if row[7] is not None else None
+        } for row in totals]
+
+    if group_by != 'month':
+        raise ValueError("group_by must be 'month' or 'work_center'")
+
+    rows = query.filter(*filters).order_by(WorkCenterCostRollup.month, WorkCenter.name).all()
+    return [{
+        'work_center_id': rollup.work_center_id,
+        'work_center': name,
+        'month': rollup.month.strftime('%Y-%m'),
+        'request_count': rollup.request_count,
+        'labor_hours': round(rollup.labor_hours or 0, 2),
+        'labor_cost': float(rollup.labor_cost or 0),
+        'downtime_hours': rollup.downtime_hours,
+        'availability': float(rollup.availability) if rollup.availability is not None else None,
+        'oee': float(rollup.oee) if rollup.oee is not None else None,
+        'oee_target': float(rollup.oee_target) if rollup.oee_target is not None else None
+    } for rollup, name in rows]
+
+def latest_oee_by_work_center():
+    """Most recent rollup row per work center, keyed by work center id"""
+    latest = db.session.query(
+        WorkCenterCostRollup.work_center_id,
+        func.max(WorkCenterCostRollup.month).label('month')
+    ).group_by(WorkCenterCostRollup.work_center_id).subquery()
+    rows = WorkCenterCostRollup.query.join(
+        latest,
+        (WorkCenterCostRollup.work_center_id == latest.c.work_center_id) &
+        (WorkCenterCostRollup.month == latest.c.month)
+    ).all()
+    return {row.work_center_id: row for row in rows}
+
+if __name__ == '__main__':
+    from app import app
+    with app.app_context():
+        written = refresh_work_center_rollup()
+        print(f"[OK] Work center rollup refreshed ({written} rows)")
@@ -3,12 +3,13 @@ Worker Routes for GearGuard
 Routes for workers to view and respond to allocated work
 """
 
-from flask import render_template, request, redirect, url_for, flash
+from flask import render_template, request, redirect, url_for, flash, jsonify
 from flask_login import login_required, current_user
 from datetime import datetime
 from app import app
 from models import db, MaintenanceRequest, User
-from decorators import user_or_admin_required
+from decorators import user_or_admin_required, json_login_required
+from workflow_utils import record_worker_response, card_data, allocation_counts
 from email_utils import send_work_response_email
 
 # Worker Dashboard
@@ -84,42 +85,40 @@ def worker_respond_request(id):
         return redirect(url_for('worker_dashboard'))
     
     response = request.form.get('response')  # accept or reject
-    reason = request.form.get('reason', '')
-    proposed_deadline_str = request.form.get('proposed_deadline')
-    
-    if response == 'accept':
-        request_obj.allocation_status = 'accepted'
-        request_obj.worker_response = 'accepted'
-        request_obj.worker_response_at = datetime.utcnow()
-        request_obj.worker_response_reason = reason
-        
-        # If deadline is proposed
-        if proposed_deadline_str:
-            try:
-                proposed_deadline = datetime.strptime(proposed_deadline_str, '%Y-%m-%dT%H:%M')
-                request_obj.proposed_deadline = proposed_deadline
-                request_obj.deadline_status = 'pending'
-                request_obj.worker_response = 'deadline_proposed'
-            except:
-                pass
-    else:
-        request_obj.allocation_status = 'rejected'
-        request_obj.worker_response = 'rejected'
-        request_obj.worker_response_at = datetime.utcnow()
-        request_obj.worker_response_reason = reason
+    record_worker_response(request_obj, response, request.form.get('reason', ''),
+                           request.form.get('proposed_deadline'))
+    db.session.commit()
+    _notify_admins(request_obj)
     
+    flash(f'Request {response}ed successfully!', 'success')
+    return redirect(url_for('worker_request_detail', id=id))
+
+@app.route('/api/worker/requests/<int:id>/respond', methods=['POST'])
+@json_login_required()
+def api_worker_respond_request(id):
+    """Accept or reject without a page reload; returns the card and the worker's status counts"""
+    request_obj = MaintenanceRequest.query.get(id)
+    if not request_obj:
+        return jsonify({'error': 'Request not found'}), 404
+    if request_obj.allocated_to_id != current_user.id:
+        return jsonify({'error': 'This request is not allocated to you'}), 403
+    data = request.get_json(silent=True) or request.form
+    response = data.get('response')
+    if response not in ('accept', 'reject'):
+        return jsonify({'error': 'response must be accept or reject'}), 400
+    record_worker_response(request_obj, response, data.get('reason', ''), data.get('proposed_deadline'))
     db.session.commit()
+    _notify_admins(request_obj)
     
-    # Send email to admin
+    return jsonify({'request': card_data(request_obj), 'counts': allocation_counts(current_user.id)})
+
+def _notify_admins(request_obj):
     admin_users = User.query.filter_by(is_admin=True).all()
     for admin in admin_users:
         try:
             send_work_response_email(request_obj, admin, request_obj.worker_response)
         except Exception as e:
             app.logger.error(f"Failed to send work response email: {str(e)}")
-    
-    flash(f'Request {response}ed successfully!', 'success')
-    return redirect(url_for('worker_request_detail', id=id))
 
 # Worker - Update Request Status
 @app.route('/worker/requests/<int:id>/update-status', methods=['POST'])
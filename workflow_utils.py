@@ -0,0 +1,186 @@
+"""
+Request workflow actions for GearGuard
+Stage, allocation and worker-response changes shared by the page forms and their JSON variants
+"""
+
+from datetime import datetime
+from sqlalchemy import func, or_
+from models import db, MaintenanceRequest, MaintenanceEquipment, User
+from api_utils import encode_cursor, decode_cursor
+
+STAGES = ('new', 'in_progress', 'repaired', 'scrap')
+BOARD_PAGE_SIZE = 1000
+MAX_BOARD_PAGE_SIZE = 5000
+
+# Card flag bits in board pages
+OVERDUE = 1
+ALLOCATABLE = 2
+
+def search_criteria(search_query):
+    """Search criteria for request lists; they reference MaintenanceEquipment, so join it"""
+    if not search_query:
+        return []
+    return [or_(
+        MaintenanceRequest.name.ilike(f'%{search_query}%'),
+        MaintenanceRequest.subject.ilike(f'%{search_query}%'),
+        MaintenanceRequest.request_type.ilike(f'%{search_query}%'),
+        MaintenanceEquipment.name.ilike(f'%{search_query}%'),
+        MaintenanceEquipment.serial_number.ilike(f'%{search_query}%')
+    )]
+
+def board_query(search_query='', owner_id=None):
+    """Requests on a kanban board: everything, or only those assigned to owner_id"""
+    query = MaintenanceRequest.query
+    if owner_id is not None:
+        query = query.filter(or_(MaintenanceRequest.assigned_user_id == owner_id,
+                                 MaintenanceRequest.technician_id == owner_id))
+    criteria = search_criteria(search_query)
+    if criteria:
+        query = query.join(MaintenanceEquipment).filter(*criteria)
+    return query
+
+def change_stage(request_obj, stage):
+    """Move a request to another kanban stage; ValueError for unknown stages"""
+    if stage not in STAGES:
+        raise ValueError(f"stage must be one of: {', '.join(STAGES)}")
+    request_obj.update_stage(stage)
+
+def allocate(request_obj, worker_id):
+    """Allocate a request to a (non-admin) worker and return the worker"""
+    if not worker_id:
+        raise ValueError('Please select a worker')
+    worker = User.query.get(worker_id)
+    if not worker or worker.is_admin:
+        raise ValueError('Invalid worker selected')
+    request_obj.allocation_status = 'allocated'
+    request_obj.allocated_to_id = worker.id
+    request_obj.allocated_at = datetime.utcnow()
+    request_obj.technician_id = worker.id
+    request_obj.assigned_user_id = worker.id
+    return worker
+
+def record_worker_response(request_obj, response, reason='', proposed_deadline=None):
+    """Worker accepts (optionally proposing a deadline) or rejects an allocated request"""
+    now = datetime.utcnow()
+    request_obj.worker_response_at = now
+    request_obj.worker_response_reason = reason
+    if response == 'accept':
+        request_obj.allocation_status = 'accepted'
+        request_obj.worker_response = 'accepted'
+        if proposed_deadline:
+            try:
+                request_obj.proposed_deadline = datetime.strptime(proposed_deadline, '%Y-%m-%dT%H:%M')
+                request_obj.deadline_status = 'pending'
+                request_obj.worker_response = 'deadline_proposed'
+            except ValueError:
+                pass
+    else:
+        request_obj.allocation_status = 'rejected'
+        request_obj.worker_response = 'rejected'
+
+def _user_name(user):
+    return (user.full_name or user.username) if user else None
+
+def card_data(request_obj):
+    """What a kanban card shows, for updating it in place"""
+    return {
+        'id': request_obj.id,
+        'name': request_obj.name,
+        'subject': request_obj.subject,
+        'stage': request_obj.stage,
+        'is_overdue': request_obj.is_overdue,
+        'equipment': request_obj.equipment.name if request_obj.equipment else None,
+        'assigned_user': _user_name(request_obj.assigned_user),
+        'technician': _user_name(request_obj.technician),
+        'allocation_status': request_obj.allocation_status,
+        'allocated_to_id': request_obj.allocated_to_id,
+        'worker_response': request_obj.worker_response,
+        'duration': request_obj.duration
+    }
+
+def stage_counts(query):
+    """Cards per kanban column of a board_query() in one GROUP BY"""
+    rows = query.with_entities(MaintenanceRequest.stage, func.count(MaintenanceRequest.id)) \
+        .group_by(MaintenanceRequest.stage).order_by(None).all()
+    counts = dict.fromkeys(STAGES, 0)
+    counts.update({stage: count for stage, count in rows if stage in counts})
+    return counts
+
+def allocation_counts(worker_id):
+    """The worker dashboard's stats for one worker in one GROUP BY"""
+    rows = db.session.query(MaintenanceRequest.allocation_status, func.count(MaintenanceRequest.id)) \
+        .filter(MaintenanceRequest.allocated_to_id == worker_id) \
+        .group_by(MaintenanceRequest.allocation_status).all()
+    by_status = dict(rows)
+    counts = {
+        'pending': by_status.get('allocated', 0),
+        'accepted': by_status.get('accepted', 0),
+        'in_progress': by_status.get('in_progress', 0),
+        'completed': by_status.get('completed', 0)
+    }
+    counts['total'] = sum(by_status.values())
+    return counts
+
+def _names(model, label, ids):
+    ids = {i for i in ids if i is not None}
+    if not ids:
+        return {}
+    rows = db.session.query(model.id, label).filter(model.id.in_(ids)).all()
+    return {row_id: name for row_id, name in rows}
+
+def card_flags(stage, scheduled_date, allocation_status, allocated_to_id, now):
+    """OVERDUE/ALLOCATABLE bits for one board card, as the server-rendered cards decided them"""
+    flags = 0
+    if stage not in ('repaired', 'scrap') and scheduled_date and now > scheduled_date:
+        flags |= OVERDUE
+    if allocation_status == 'pending' or not allocated_to_id:
+        flags |= ALLOCATABLE
+    return flags
+
+def board_page(query, stage, limit=BOARD_PAGE_SIZE, cursor=None):
+    """One page of a kanban column as parallel arrays, newest first, keyed on id.
+
+    Equipment and people are sent as ids with a lookups table of their names,
+    so a name repeated on thousands of cards is sent once per page. The first
+    page also carries the column's total count, which the browser needs to
+    size its virtual scroll area before the other pages arrive.
+    """
+    if stage not in STAGES:
+        raise ValueError(f"stage must be one of: {', '.join(STAGES)}")
+    limit = max(1, min(limit, MAX_BOARD_PAGE_SIZE))
+    column = query.filter(MaintenanceRequest.stage == stage)
+    page = column.with_entities(
+        MaintenanceRequest.id, MaintenanceRequest.name, MaintenanceRequest.subject,
+        MaintenanceRequest.equipment_id, MaintenanceRequest.assigned_user_id, MaintenanceRequest.technician_id,
+        MaintenanceRequest.scheduled_date, MaintenanceRequest.allocation_status,
+        MaintenanceRequest.allocated_to_id, MaintenanceRequest.duration
+    )
+    if cursor:
+        page = page.filter(MaintenanceRequest.id < decode_cursor(cursor))
+    # One extra row tells us whether another page exists without a COUNT
+    rows = page.order_by(MaintenanceRequest.id.desc()).limit(limit + 1).all()
+    more = len(rows) > limit
+    rows = rows[:limit]
+    
+    now = datetime.utcnow()
+    payload = {
+        'stage': stage,
+        'ids': [row.id for row in rows],
+        'names': [row.name for row in rows],
+        'subjects': [row.subject for row in rows],
+        'equipment': [row.equipment_id for row in rows],
+        'assigned': [row.assigned_user_id for row in rows],
+        'technicians': [row.technician_id for row in rows],
+        'flags': [card_flags(stage, row.scheduled_date, row.allocation_status, row.allocated_to_id, now) for row in rows],
+        'lookups': {
+            'equipment': _names(MaintenanceEquipment, MaintenanceEquipment.name, [row.equipment_id for row in rows]),
+            'users': _names(User, func.coalesce(func.nullif(User.full_name, ''), User.username),
+                            [row.assigned_user_id for row in rows] + [row.technician_id for row in rows])
+        },
+        'next': encode_cursor(rows[-1].id) if more else None
+    }
+    if stage == 'repaired':
+        payload['durations'] = [row.duration for row in rows]
+    if not cursor:
+        payload['count'] = column.order_by(None).count()
+    return payload